@@ -24,15 +24,21 @@ echo "⚙️  Configurando servicios con la ruta local..."
 # Copiar templates a archivos temporales para editar
 cp deployment/cerebro.service /tmp/cerebro.service
 cp deployment/sentinel_web.service /tmp/sentinel_web.service
+cp deployment/colector.service /tmp/colector.service
+cp deployment/celery_forecasting.service /tmp/celery_forecasting.service
 
 # Reemplazar ruta hardcodeada /opt/sentinelnexus por la real
 sed -i "s|/opt/sentinelnexus|$PROJECT_DIR|g" /tmp/cerebro.service
 sed -i "s|/opt/sentinelnexus|$PROJECT_DIR|g" /tmp/sentinel_web.service
+sed -i "s|/home/django_user/apps/sentinel_nexus|$PROJECT_DIR|g" /tmp/colector.service
+sed -i "s|/home/django_user/apps/sentinel_nexus|$PROJECT_DIR|g" /tmp/celery_forecasting.service
 
 # 4. Instalar servicios en Systemd
 echo "🚀 Instalando servicios en /etc/systemd/system/..."
 cp /tmp/cerebro.service /etc/systemd/system/cerebro.service
 cp /tmp/sentinel_web.service /etc/systemd/system/sentinel_web.service
+cp /tmp/colector.service /etc/systemd/system/colector.service
+cp /tmp/celery_forecasting.service /etc/systemd/system/celery_forecasting.service
 
 # 5. Recargar y Activar
 systemctl daemon-reload
@@ -42,6 +48,14 @@ systemctl enable cerebro
 systemctl restart cerebro
 echo "🧠 Agente CEREBRO: Activado y Corriendo."
 
+systemctl enable colector
+systemctl restart colector
+echo "📡 COLECTOR Proxmox: Activado y Corriendo."
+
+systemctl enable celery_forecasting
+systemctl restart celery_forecasting
+echo "📈 Worker de PREDICCIÓN (cola forecasting): Activado y Corriendo."
+
 systemctl enable sentinel_web
 systemctl restart sentinel_web
 echo "🌐 Servidor WEB: Activado y Corriendo."
@@ -3,6 +3,13 @@ ASGI config for sentinelnexus project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Se sirve con Gunicorn + UvicornWorker (deployment/sentinel_web.service): la
+vista async live_events (/api/live/) mantiene conexiones SSE abiertas sin
+ocupar un worker por cliente, y las APIs de solo lectura del dashboard
+(api_metrics, get_server_vms, api_get_nodes_multi, api_node_status,
+api_vm_metrics_new) esperan a Proxmox con httpx (utils.proxmox_async) en el
+bucle de eventos en lugar de bloquear un hilo por llamada.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 """
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 # Establecer la variable de entorno para configuraciones
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sentinelnexus.settings')
@@ -13,6 +14,12 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Descubrir tareas automáticamente
 app.autodiscover_tasks()
 
+@worker_process_shutdown.connect
+def flush_write_buffers(**kwargs):
+    """Vuelca las métricas pendientes del buffer de escritura al parar el worker"""
+    from utils.write_buffer import flush_all
+    flush_all()
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
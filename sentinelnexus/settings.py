@@ -160,6 +160,12 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutos como límite para tareas
 CELERY_RESULT_EXTENDED = True  # Almacenar más detalles en los resultados
 
+# Las predicciones se ejecutan en su propia cola y worker (deployment/celery_forecasting.service)
+CELERY_TASK_ROUTES = {
+    'submodulos.tasks.schedule_forecasts': {'queue': 'forecasting'},
+    'submodulos.tasks.forecast_shard': {'queue': 'forecasting'},
+}
+
 # Configuración de Redis para cache
 CACHES = {
     'default': {
@@ -171,6 +177,13 @@ CACHES = {
     }
 }
 
+# Eventos en vivo de los dashboards (utils.live): canal pub/sub de Redis; por defecto el Redis de la caché
+LIVE_EVENTS_CHANNEL = os.environ.get('LIVE_EVENTS_CHANNEL', 'sentinel:live')
+LIVE_EVENTS_REDIS_URL = os.environ.get('LIVE_EVENTS_REDIS_URL') or None
+
+# Respuestas incrementales de /api/metrics/ y /api/server/<id>/vms/ (utils.delta): vida de cada versión base
+DELTA_BASE_TTL = int(os.environ.get('DELTA_BASE_TTL', 600))
+
 # Configuración de sesiones con Redis
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_CACHE_ALIAS = 'default'
@@ -201,6 +214,102 @@ PROXMOX = {
     'verify_ssl': PROXMOX_VERIFY_SSL
 }
 
+# Registro de conexiones compartidas (utils.proxmox_manager.connection_registry)
+# Los tickets PVE duran 2h: se renuevan antes con el propio ticket, sin nuevo login
+PROXMOX_TICKET_RENEW_SECONDS = int(os.environ.get('PROXMOX_TICKET_RENEW_SECONDS', 3600))
+# Tamaño del pool keep-alive HTTPS por servidor (hilos de gunicorn/Celery)
+PROXMOX_POOL_MAXSIZE = int(os.environ.get('PROXMOX_POOL_MAXSIZE', 20))
+
+# Consultas multi-servidor en paralelo (utils.fanout)
+FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 16))
+# Plazo máximo (s) de espera por servidor antes de marcarlo offline
+FANOUT_DEADLINE = float(os.environ.get('FANOUT_DEADLINE', 12))
+
+# Caché compartida de lecturas Proxmox (utils.proxmox_cache)
+# TTL (s) por tipo de recurso; pasado el TTL se sirve el dato anterior mientras se refresca
+PROXMOX_CACHE_TTLS = {
+    'snapshot': int(os.environ.get('PROXMOX_CACHE_SNAPSHOT_TTL', 5)),
+    'node_status': int(os.environ.get('PROXMOX_CACHE_STATUS_TTL', 5)),
+    'rrd': int(os.environ.get('PROXMOX_CACHE_RRD_TTL', 30)),
+    'guest_ip': int(os.environ.get('PROXMOX_CACHE_GUEST_IP_TTL', 300)),
+}
+# Tiempo máximo (s) que se sigue sirviendo un dato caducado si Proxmox no responde
+PROXMOX_CACHE_STALE_SECONDS = int(os.environ.get('PROXMOX_CACHE_STALE_SECONDS', 60))
+# TTL (s) de los fallos de carga por tipo (p.ej. VM sin guest agent): no se reintenta antes
+PROXMOX_CACHE_FAILURE_TTLS = {
+    'guest_ip': int(os.environ.get('PROXMOX_CACHE_GUEST_IP_FAILURE_TTL', 60)),
+}
+
+# Colector de métricas (python manage.py iniciar_colector)
+COLLECTOR_INTERVAL = int(os.environ.get('COLLECTOR_INTERVAL', 15))
+# Cada cuánto (s) se guardan los snapshots en ServerMetric/VMMetric
+COLLECTOR_PERSIST_INTERVAL = int(os.environ.get('COLLECTOR_PERSIST_INTERVAL', 60))
+
+# Buffer de escritura de métricas (utils.write_buffer): vuelca cada N filas o T ms
+WRITE_BUFFER_MAX_ROWS = int(os.environ.get('WRITE_BUFFER_MAX_ROWS', 500))
+WRITE_BUFFER_MAX_DELAY_MS = int(os.environ.get('WRITE_BUFFER_MAX_DELAY_MS', 1000))
+# Filas pendientes máximas antes de aplicar contrapresión a los productores
+WRITE_BUFFER_MAX_PENDING = int(os.environ.get('WRITE_BUFFER_MAX_PENDING', 10000))
+
+# Particionado y retención de métricas (submodulos.partitioning)
+METRICS_PARTITION_INTERVAL = os.environ.get('METRICS_PARTITION_INTERVAL', 'day')  # 'day' o 'week'
+METRICS_PARTITION_PREMAKE = int(os.environ.get('METRICS_PARTITION_PREMAKE', 7))
+# Días de retención por modelo
+METRICS_RETENTION_DAYS = {
+    'servermetric': int(os.environ.get('RETENTION_SERVERMETRIC_DAYS', 90)),
+    'vmmetric': int(os.environ.get('RETENTION_VMMETRIC_DAYS', 30)),
+    'localmetric': int(os.environ.get('RETENTION_LOCALMETRIC_DAYS', 30)),
+    'agentlog': int(os.environ.get('RETENTION_AGENTLOG_DAYS', 90)),
+}
+# 'drop' borra las particiones caducadas; 'detach' las separa para archivarlas
+METRICS_RETENTION_MODE = os.environ.get('METRICS_RETENTION_MODE', 'drop')
+
+# Rollups de métricas (submodulos.logic.rollups)
+# Segundos de margen antes de cerrar un minuto (muestras que llegan con retraso)
+ROLLUP_LAG_SECONDS = int(os.environ.get('ROLLUP_LAG_SECONDS', 120))
+# Días que se conservan los rollups de 1 minuto
+ROLLUP_1M_RETENTION_DAYS = int(os.environ.get('ROLLUP_1M_RETENTION_DAYS', 7))
+
+# Motor de predicción (submodulos.logic.forecast_engine)
+# Procesos del pool de ajuste SARIMA (0 = en el proceso actual, vacío = núcleos disponibles)
+FORECAST_WORKERS = int(os.environ['FORECAST_WORKERS']) if os.environ.get('FORECAST_WORKERS') else None
+# Método de arranque de los procesos ('spawn' no hereda conexiones de BD ni hilos)
+FORECAST_MP_CONTEXT = os.environ.get('FORECAST_MP_CONTEXT', 'spawn')
+# Horas que se reutilizan los parámetros SARIMA guardados antes de reajustar
+FORECAST_REFIT_HOURS = int(os.environ.get('FORECAST_REFIT_HOURS', 24))
+# Reajuste anticipado si el error reciente supera este múltiplo del error de referencia
+FORECAST_DRIFT_FACTOR = float(os.environ.get('FORECAST_DRIFT_FACTOR', 1.5))
+# Backend de predicción por tipo de entidad: 'sarima', 'holt_winters' o 'ewma'
+FORECAST_BACKENDS = {
+    'server': os.environ.get('FORECAST_BACKEND_SERVER', 'sarima'),
+    'vm': os.environ.get('FORECAST_BACKEND_VM', 'holt_winters'),
+}
+# Segundos que vive en caché el documento JSON de predicción de cada servidor/VM
+FORECAST_DOCUMENT_TTL = int(os.environ.get('FORECAST_DOCUMENT_TTL', 2 * 3600))
+# Tareas de Celery de predicción: VMs por fragmento y límites de tiempo por fragmento
+FORECAST_VM_SHARD_SIZE = int(os.environ.get('FORECAST_VM_SHARD_SIZE', 200))
+FORECAST_TASK_SOFT_TIME_LIMIT = int(os.environ.get('FORECAST_TASK_SOFT_TIME_LIMIT', 15 * 60))
+FORECAST_TASK_TIME_LIMIT = int(os.environ.get('FORECAST_TASK_TIME_LIMIT', 20 * 60))
+
+# Detector de anomalías en línea del CerebroAgent (submodulos.logic.online_detector)
+ANOMALY_EWMA_ALPHA = float(os.environ.get('ANOMALY_EWMA_ALPHA', 0.05))
+ANOMALY_Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', 4.0))
+ANOMALY_WARMUP = int(os.environ.get('ANOMALY_WARMUP', 30))          # muestras antes de evaluar
+ANOMALY_MIN_STD = float(os.environ.get('ANOMALY_MIN_STD', 2.0))     # puntos % de desviación mínima
+ANOMALY_COOLDOWN_SECONDS = int(os.environ.get('ANOMALY_COOLDOWN_SECONDS', 300))
+ANOMALY_CHECKPOINT_SECONDS = int(os.environ.get('ANOMALY_CHECKPOINT_SECONDS', 300))
+
+# Planificación de capacidad por nodo (submodulos.logic.capacity_planner)
+CAPACITY_LEVEL_ALPHA = float(os.environ.get('CAPACITY_LEVEL_ALPHA', 0.3))
+CAPACITY_TREND_BETA = float(os.environ.get('CAPACITY_TREND_BETA', 0.1))
+CAPACITY_MIN_INTERVAL_SECONDS = int(os.environ.get('CAPACITY_MIN_INTERVAL_SECONDS', 300))
+CAPACITY_MAX_DAYS = int(os.environ.get('CAPACITY_MAX_DAYS', 365))
+CAPACITY_OVERCOMMIT = {
+    'CPU': float(os.environ.get('CAPACITY_OVERCOMMIT_CPU', 4.0)),
+    'RAM': float(os.environ.get('CAPACITY_OVERCOMMIT_RAM', 1.0)),
+    'Almacenamiento': float(os.environ.get('CAPACITY_OVERCOMMIT_STORAGE', 1.0)),
+}
+
 # Configuración de múltiples nodos (Compatibilidad con proxmox_manager)
 PROXMOX_NODES = {}
 
@@ -242,6 +351,21 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'submodulos.tasks.monitor_all_proxmox_servers',
         'schedule': crontab(minute='*'),
     },
+    # Rollups de métricas (1m / 1h / 1d) - Cada 5 minutos
+    'rollup-metrics-every-5-minutes': {
+        'task': 'submodulos.tasks.rollup_metrics',
+        'schedule': crontab(minute='*/5'),
+    },
+    # Particiones de métricas (crear futuras / caducar antiguas) - Cada 6 horas
+    'maintain-metric-partitions': {
+        'task': 'submodulos.tasks.maintain_metric_partitions',
+        'schedule': crontab(minute=5, hour='*/6'),
+    },
+    # Predicción SARIMA / Holt-Winters en la cola 'forecasting' - Cada hora
+    'schedule-forecasts-hourly': {
+        'task': 'submodulos.tasks.schedule_forecasts',
+        'schedule': crontab(minute=10),
+    },
     # Sincronización de inventario de VMs - Cada 5 minutos (Opcional, si se desea)
     # 'sync-proxmox-inventory': {
     #    'task': 'submodulos.tasks.sync_infrastructure',
@@ -0,0 +1,34 @@
+// SentinelNexus - Eventos en vivo (Server-Sent Events)
+//
+// Una sola conexión EventSource a /api/live/ por página. Cada evento del
+// servidor ('snapshot', 'agent_log') se reemite en document como
+// "sentinel:<evento>" con el JSON ya parseado en event.detail.
+// Si el navegador no soporta EventSource, SentinelLive.supported es false y
+// las páginas siguen con su sondeo habitual.
+
+const SentinelLive = (function () {
+  const EVENTS = ["snapshot", "agent_log"];
+  const supported = typeof window.EventSource !== "undefined";
+  let source = null;
+
+  function connect() {
+    if (!supported || source) return;
+    source = new EventSource("/api/live/");
+    EVENTS.forEach((name) => {
+      source.addEventListener(name, (event) => {
+        let detail;
+        try { detail = JSON.parse(event.data); } catch (e) { return; }
+        document.dispatchEvent(new CustomEvent(`sentinel:${name}`, { detail: detail }));
+      });
+    });
+    // EventSource reconecta solo (retry indicado por el servidor)
+    source.onerror = () => console.warn("Eventos en vivo: conexión interrumpida, reintentando...");
+  }
+
+  function on(name, callback) {
+    document.addEventListener(`sentinel:${name}`, (event) => callback(event.detail));
+    connect();
+  }
+
+  return { supported: supported, on: on };
+})();
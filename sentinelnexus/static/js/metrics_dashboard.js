@@ -4,6 +4,9 @@
 let charts = {};
 let vmCache = {};
 let expandedServers = {};
+let serverSlots = {}; // id del servidor -> { num, node } (para los eventos en vivo)
+let metricsState = null; // Última respuesta de /api/metrics/ ya aplicada: { version, servers }
+let vmVersions = {};     // serverNum -> versión de /api/server/<n>/vms/ en vmCache
 
 const chartConfig = {
   type: "line",
@@ -106,14 +109,14 @@ async function loadServerMetrics() {
   try {
     // Cargar Métricas y Predicciones en paralelo
     const [metricsRes, ...predictionsRes] = await Promise.all([
-        fetch("/api/metrics/"),
+        fetch(metricsState ? `/api/metrics/?since=${encodeURIComponent(metricsState.version)}` : "/api/metrics/"),
         // Fetch predictions for server 1, 2, 3 (assuming max 3 servers for now or dynamic)
         fetch("/api/predictions/1/"),
         fetch("/api/predictions/2/"),
         fetch("/api/predictions/3/")
     ]);
 
-    const data = await metricsRes.json();
+    const data = applyMetricsResponse(await metricsRes.json());
     const predictions = [];
     
     // Procesar respuestas de predicción
@@ -128,6 +131,7 @@ async function loadServerMetrics() {
       data.servers.forEach((server, index) => {
         const serverNum = index + 1;
         const predData = predictions[index];
+        serverSlots[String(server.id)] = { num: serverNum, node: server.node };
 
         // Actualizar UI básica
         updateServerUI(server, serverNum);
@@ -194,6 +198,67 @@ function updateServerUI(server, serverNum) {
     if (netMbpsText) netMbpsText.textContent = `${(server.metrics.network?.out_mbps || 0).toFixed(1)} Mbps`;
 }
 
+// --- Respuestas incrementales (?since=<version>) ---
+
+// Aplica un diff de claves: objetos anidados se combinan, null elimina la clave
+function mergeChanges(target, changes) {
+  const result = { ...target };
+  for (const [key, value] of Object.entries(changes)) {
+    if (value === null) delete result[key];
+    else if (typeof value === "object" && !Array.isArray(value) && result[key] && typeof result[key] === "object" && !Array.isArray(result[key]))
+      result[key] = mergeChanges(result[key], value);
+    else result[key] = value;
+  }
+  return result;
+}
+
+// Descarta `drop` puntos del final, añade los nuevos y conserva los últimos `size`
+function applySeriesDelta(series, seriesDelta) {
+  const result = {};
+  for (const [name, values] of Object.entries(seriesDelta.append)) {
+    const kept = (series?.[name] || []).slice(0, Math.max((series?.[name] || []).length - seriesDelta.drop, 0));
+    result[name] = kept.concat(values).slice(-seriesDelta.size);
+  }
+  return result;
+}
+
+function applyMetricsResponse(data) {
+  if (!data.success) return data;
+  let servers = data.servers;
+  if (data.delta && metricsState) {
+    servers = metricsState.servers.map((server, index) => {
+      const { history_delta, ...changes } = data.servers[index] || {};
+      const merged = mergeChanges(server, changes);
+      if (history_delta) merged.history = applySeriesDelta(server.history, history_delta);
+      return merged;
+    });
+  }
+  metricsState = { version: data.version, servers: servers };
+  return { ...data, servers: servers };
+}
+
+function applyVMsResponse(serverNum, data) {
+  if (!data.success || !data.delta) return data;
+  const byId = new Map((vmCache[serverNum] || []).map((vm) => [vm.id, vm]));
+  data.removed.forEach((id) => byId.delete(id));
+  data.changed.forEach((changes) => byId.set(changes.id, mergeChanges(byId.get(changes.id) || {}, changes)));
+  const vms = data.order ? data.order.map((id) => byId.get(id)).filter(Boolean) : Array.from(byId.values());
+  return { ...data, vms: vms };
+}
+
+// Snapshot del colector: actualiza los indicadores sin esperar al siguiente sondeo
+function applyLiveSnapshot(snapshot) {
+    const slot = serverSlots[String(snapshot.server)];
+    if (!slot) return;
+    const node = snapshot.nodes.find((n) => n.name === slot.node);
+    if (!node) return;
+    updateCircularProgress(`cpu-circle-${slot.num}`, node.cpu || 0);
+    updateCircularProgress(`mem-circle-${slot.num}`, node.mem || 0);
+    updateCircularProgress(`disk-circle-${slot.num}`, node.disk || 0);
+    const elVms = document.getElementById(`vms-${slot.num}`);
+    if (elVms) elVms.textContent = snapshot.vms.filter((vm) => vm.node === slot.node && vm.status === "running").length;
+}
+
 function updateChartWithPrediction(chartId, histLabels, histData, predObj) {
     if (!charts[chartId]) return;
     
@@ -237,10 +302,12 @@ function toggleVMs(serverNum, event) {
 async function loadVMsForServer(serverNum) {
   try {
     if (vmCache[serverNum]) renderVMs(serverNum, vmCache[serverNum]);
-    const response = await fetch(`/api/server/${serverNum}/vms/`);
-    const data = await response.json();
+    const since = vmCache[serverNum] && vmVersions[serverNum] ? `?since=${encodeURIComponent(vmVersions[serverNum])}` : "";
+    const response = await fetch(`/api/server/${serverNum}/vms/${since}`);
+    const data = applyVMsResponse(serverNum, await response.json());
     if (data.success && data.vms) {
       vmCache[serverNum] = data.vms;
+      vmVersions[serverNum] = data.version;
       renderVMs(serverNum, data.vms);
     } else {
        renderVMs(serverNum, []);
@@ -297,5 +364,7 @@ function openVMConsole(vmid) { window.open(`/vm/${vmid}/console/`, "_blank", "wi
 document.addEventListener("DOMContentLoaded", function () {
   initCharts();
   loadServerMetrics();
+  // Historial y predicciones siguen por sondeo; los indicadores llegan en vivo
   setInterval(() => { loadServerMetrics(); }, 30000);
+  if (typeof SentinelLive !== "undefined") SentinelLive.on("snapshot", applyLiveSnapshot);
 });
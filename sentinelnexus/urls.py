@@ -103,8 +103,12 @@ urlpatterns = [
     path('metrics/', views.metrics_dashboard, name='metrics'),
     path('predictions/', views.predictions_dashboard, name='predictions_dashboard'),
     path('api/predictions/<int:server_id>/', views.get_metrics_predictions, name='metrics_predictions'),
+    path('api/predictions/stats/', views.forecast_stats_api, name='forecast_stats_api'),
+    path('api/predictions/vm/<int:vm_id>/', views.get_vm_predictions, name='vm_predictions'),
+    path('api/capacity/', views.capacity_api, name='capacity_api'),
     path('api/server/<int:server_id>/vms/', views.get_server_vms, name='server_vms'),
 
     path('api/vms/metrics/', views.vms_metrics_api, name='vms_metrics_api'),
+    path('api/live/', views.live_events, name='live_events'),
     
 ]
\ No newline at end of file
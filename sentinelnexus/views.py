@@ -29,9 +29,13 @@ import requests
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
-from utils.proxmox_manager import proxmox_manager
+from utils.proxmox_manager import proxmox_manager, connection_registry
+from submodulos.logic.cluster_snapshot import collect_cluster_snapshot, get_cached_snapshot
+from utils.proxmox_cache import cached_read
+from utils.fanout import fan_out
+from utils import delta
 
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_GET, require_http_methods
 from django.db.models import Avg
 from django.db.models import Avg, Max, Q, Count
 from datetime import timedelta
@@ -43,7 +47,8 @@ logger = logging.getLogger(__name__)
 
 def get_proxmox_connection():
     """
-    Establece una conexión con el servidor Proxmox usando la configuración de la Base de Datos.
+    Obtiene la conexión con el servidor Proxmox usando la configuración de la Base de Datos.
+    La conexión es compartida (registro del proceso), por lo que no hay login por petición.
     """
     try:
         # Intentar conectar con el Servidor Principal o el primero activo disponible
@@ -55,37 +60,10 @@ def get_proxmox_connection():
             logger.error("No se encontraron servidores Proxmox activos en la configuración")
             # Fallback a variables de entorno si existen (por compatibilidad)
             if hasattr(settings, 'PROXMOX'):
-                return ProxmoxAPI(
-                    settings.PROXMOX['host'],
-                    user=settings.PROXMOX['user'],
-                    password=settings.PROXMOX['password'],
-                    verify_ssl=settings.PROXMOX.get('verify_ssl', False)
-                )
+                return connection_registry.get('settings', settings.PROXMOX, timeout=10)
             raise Exception("No active Proxmox server configured in database")
 
-        # Asegurar formato de usuario
-        user = server.username
-        if '@' not in user:
-            user = f"{user}@pam"
-        
-        # Asegurar formato de host con puerto
-        host = server.hostname
-        if ':' not in host:
-            host = f"{host}:8006"
-            
-        logger.info(f"Conectando a Proxmox: {host} usuario {user}")
-        
-        proxmox = ProxmoxAPI(
-            host,
-            user=user,
-            password=server.password,
-            verify_ssl=server.verify_ssl,
-            timeout=10
-        )
-        
-        # Verificar conexión
-        proxmox.version.get()
-        return proxmox
+        return proxmox_manager.get_server_connection(server, timeout=10)
         
     except Exception as e:
         logger.error(f"Error al conectar con Proxmox: {str(e)}")
@@ -101,12 +79,7 @@ class ProxmoxSynchronizer:
         if proxmox_server_id:
             try:
                 server = ProxmoxServer.objects.get(id=proxmox_server_id)
-                self.proxmox = ProxmoxAPI(
-                    server.hostname,
-                    user=server.username,
-                    password=server.password,
-                    verify_ssl=server.verify_ssl
-                )
+                self.proxmox = proxmox_manager.get_server_connection(server)
                 self.server = server
             except ProxmoxServer.DoesNotExist:
                 raise ValueError(f"Servidor Proxmox con ID {proxmox_server_id} no encontrado")
@@ -134,6 +107,11 @@ class ProxmoxSynchronizer:
         self.sync_nodes()
         self.sync_resource_types()
         self.sync_vms()
+
+        # Proyección de capacidad con la muestra recién sincronizada
+        from submodulos.logic.capacity_planner import refresh_after_sync
+        server = self.server
+        transaction.on_commit(lambda: refresh_after_sync(server))
         return {
             'status': 'success',
             'message': 'Sincronización completada correctamente'
@@ -501,9 +479,9 @@ def dashboard(request):
     try:
         proxmox = get_proxmox_connection()
         
-        # Obtener todos los nodos
+        # Obtener nodos, VMs y contenedores en una sola llamada (/cluster/resources)
         try:
-            nodes = proxmox.nodes.get()
+            snapshot = collect_cluster_snapshot(proxmox, 'default')
         except Exception as e:
             logger.error(f"Error al obtener los nodos: {str(e)}")
             messages.error(request, f"Error al obtener los nodos: {str(e)}")
@@ -515,175 +493,57 @@ def dashboard(request):
                 'running_vms': 0
             })
         
-        # Obtener todas las VMs
-        vms = []
-        for node in nodes:
-            node_name = node['node']
-            
-            # Obtener información detallada del nodo
-            try:
-                node_status = proxmox.nodes(node_name).status.get()
-                node['cpu'] = node_status.get('cpu', 0) * 100  # Convertir a porcentaje
-                node['mem'] = node_status.get('memory', {}).get('used', 0) / node_status.get('memory', {}).get('total', 1) * 100
-                node['disk_used'] = round(node_status.get('rootfs', {}).get('used', 0) / (1024 ** 3), 2)  # GB
-                node['disk_total'] = round(node_status.get('rootfs', {}).get('total', 1) / (1024 ** 3), 2)  # GB
-                
+        nodes = []
+        for node_snap in snapshot.nodes:
+            online = node_snap.online
+            nodes.append({
+                'node': node_snap.name,
+                'status': node_snap.status if online else 'offline',
+                'cpu': node_snap.cpu,
+                'mem': node_snap.mem_percent,
+                'disk_used': round(node_snap.disk / (1024 ** 3), 2),  # GB
+                'disk_total': round(node_snap.maxdisk / (1024 ** 3), 2),  # GB
+                'maxcpu': node_snap.maxcpu,
+                'uptime': node_snap.uptime,
                 # Simular tiempo de respuesta (en producción, esto sería un ping real)
-                node['ping'] = 15  # ms
-            except Exception as e:
-                logger.warning(f"Error al obtener detalles del nodo {node_name}: {str(e)}")
-                node['cpu'] = 0
-                node['mem'] = 0
-                node['disk_used'] = 0
-                node['disk_total'] = 0
-                node['ping'] = 'N/A'
-                node['status'] = 'offline'
-            
-            # Obtener VMs (QEMU)
-            try:
-                qemu_vms = proxmox.nodes(node_name).qemu.get()
-                for vm in qemu_vms:
-                    vm['node'] = node_name
-                    vm['type'] = 'qemu'
-                    
-                    # Obtener métricas adicionales si la VM está en ejecución
-                    if vm.get('status') == 'running':
-                        try:
-                            vm_status = proxmox.nodes(node_name).qemu(vm['vmid']).status.current.get()
-                            
-                            vm['cpu'] = vm_status.get('cpu', 0) * 100
-                            vm['mem'] = vm_status.get('mem', 0) / vm_status.get('maxmem', 1) * 100
-                            vm['mem_used'] = round(vm_status.get('mem', 0) / (1024 ** 2), 2)  # MB
-                            vm['mem_total'] = round(vm_status.get('maxmem', 0) / (1024 ** 2), 2)  # MB
-                            vm['disk_read'] = round(vm_status.get('diskread', 0) / (1024 ** 2), 2)  # MB/s
-                            vm['disk_write'] = round(vm_status.get('diskwrite', 0) / (1024 ** 2), 2)  # MB/s
-                            vm['net_in'] = round(vm_status.get('netin', 0) / (1024 ** 2), 2)  # Mbps
-                            vm['net_out'] = round(vm_status.get('netout', 0) / (1024 ** 2), 2)  # Mbps
-                            vm['ping'] = 10  # ms (simulado)
-                            
-                            # Cálculos de uso de disco
-                            try:
-                                # Intenta obtener datos de RRD para estadísticas
-                                disk_info = proxmox.nodes(node_name).qemu(vm['vmid']).rrddata.get(timeframe='hour')
-                                if disk_info and len(disk_info) > 0:
-                                    last_data = disk_info[-1]
-                                    vm['disk_used'] = round(last_data.get('disk', 0) / (1024 ** 3), 2)  # GB
-                                else:
-                                    vm['disk_used'] = 0
-                            except Exception as disk_error:
-                                logger.warning(f"Error al obtener datos de disco para VM {vm['vmid']}: {str(disk_error)}")
-                                vm['disk_used'] = 0
-                            
-                            # Asignar un valor por defecto para el total del disco
-                            vm['disk_total'] = 10  # GB (valor por defecto)
-                            
-                            # Intenta obtener el tamaño del disco desde la configuración
-                            try:
-                                vm_config = proxmox.nodes(node_name).qemu(vm['vmid']).config.get()
-                                
-                                for key, value in vm_config.items():
-                                    if isinstance(value, str) and 'size=' in value:
-                                        try:
-                                            size_str = value.split('size=')[1].split(',')[0]
-                                            if 'G' in size_str:
-                                                vm['disk_total'] = float(size_str.replace('G', ''))
-                                            elif 'M' in size_str:
-                                                vm['disk_total'] = float(size_str.replace('M', '')) / 1024
-                                            break
-                                        except (ValueError, IndexError) as e:
-                                            logger.warning(f"Error al parsear tamaño de disco: {str(e)}")
-                            except Exception as config_error:
-                                logger.warning(f"Error al obtener configuración para VM {vm['vmid']}: {str(config_error)}")
-                            
-                        except Exception as vm_error:
-                            logger.warning(f"Error al obtener métricas de VM {vm['vmid']}: {str(vm_error)}")
-                            vm['cpu'] = 0
-                            vm['mem'] = 0
-                            vm['mem_used'] = 0
-                            vm['mem_total'] = 0
-                            vm['disk_read'] = 0
-                            vm['disk_write'] = 0
-                            vm['net_in'] = 0
-                            vm['net_out'] = 0
-                            vm['ping'] = 'N/A'
-                            vm['disk_used'] = 0
-                            vm['disk_total'] = 0
-                    else:
-                        # Valores por defecto para VMs apagadas
-                        vm['cpu'] = 0
-                        vm['mem'] = 0
-                        vm['mem_used'] = 0
-                        vm['mem_total'] = 0
-                        vm['disk_read'] = 0
-                        vm['disk_write'] = 0
-                        vm['net_in'] = 0
-                        vm['net_out'] = 0
-                        vm['ping'] = 'N/A'
-                        vm['disk_used'] = 0
-                        vm['disk_total'] = 0
-                    
-                    vms.append(vm)
-            except Exception as e:
-                logger.warning(f"Error al obtener VMs QEMU del nodo {node_name}: {str(e)}")
-            
-            # Obtener LXC containers
-            try:
-                lxc_containers = proxmox.nodes(node_name).lxc.get()
-                for container in lxc_containers:
-                    container['node'] = node_name
-                    container['type'] = 'lxc'
-                    
-                    # Obtener métricas adicionales si el contenedor está en ejecución
-                    if container.get('status') == 'running':
-                        try:
-                            container_status = proxmox.nodes(node_name).lxc(container['vmid']).status.current.get()
-                            
-                            container['cpu'] = container_status.get('cpu', 0) * 100
-                            container['mem'] = container_status.get('mem', 0) / container_status.get('maxmem', 1) * 100
-                            container['mem_used'] = round(container_status.get('mem', 0) / (1024 ** 2), 2)  # MB
-                            container['mem_total'] = round(container_status.get('maxmem', 0) / (1024 ** 2), 2)  # MB
-                            container['disk_read'] = round(container_status.get('diskread', 0) / (1024 ** 2), 2)  # MB/s
-                            container['disk_write'] = round(container_status.get('diskwrite', 0) / (1024 ** 2), 2)  # MB/s
-                            container['net_in'] = round(container_status.get('netin', 0) / (1024 ** 2), 2)  # Mbps
-                            container['net_out'] = round(container_status.get('netout', 0) / (1024 ** 2), 2)  # Mbps
-                            container['ping'] = 8  # ms (simulado)
-                            
-                            # Calcular uso de disco
-                            container['disk_used'] = round(container_status.get('disk', 0) / (1024 ** 3), 2)  # GB
-                            container['disk_total'] = round(container_status.get('maxdisk', 0) / (1024 ** 3), 2)  # GB
-                            if container['disk_total'] <= 0:
-                                container['disk_total'] = 10  # Valor por defecto si no hay información
-                            
-                        except Exception as e:
-                            logger.warning(f"Error al obtener métricas de LXC {container['vmid']}: {str(e)}")
-                            container['cpu'] = 0
-                            container['mem'] = 0
-                            container['mem_used'] = 0
-                            container['mem_total'] = 0
-                            container['disk_read'] = 0
-                            container['disk_write'] = 0
-                            container['net_in'] = 0
-                            container['net_out'] = 0
-                            container['ping'] = 'N/A'
-                            container['disk_used'] = 0
-                            container['disk_total'] = 0
-                    else:
-                        # Valores por defecto para contenedores apagados
-                        container['cpu'] = 0
-                        container['mem'] = 0
-                        container['mem_used'] = 0
-                        container['mem_total'] = 0
-                        container['disk_read'] = 0
-                        container['disk_write'] = 0
-                        container['net_in'] = 0
-                        container['net_out'] = 0
-                        container['ping'] = 'N/A'
-                        container['disk_used'] = 0
-                        container['disk_total'] = 0
-                    
-                    vms.append(container)
-            except Exception as e:
-                logger.warning(f"Error al obtener contenedores LXC del nodo {node_name}: {str(e)}")
+                'ping': 15 if online else 'N/A',  # ms
+            })
+        
+        vms = []
+        for guest in snapshot.guests:
+            vm = {
+                'vmid': guest.vmid,
+                'name': guest.name,
+                'status': guest.status,
+                'template': guest.template,
+                'uptime': guest.uptime,
+                'node': guest.node,
+                'type': guest.type,
+            }
+            if guest.running:
+                vm.update({
+                    'cpu': guest.cpu,
+                    'mem': guest.mem_percent,
+                    'mem_used': round(guest.mem / (1024 ** 2), 2),  # MB
+                    'mem_total': round(guest.maxmem / (1024 ** 2), 2),  # MB
+                    'disk_read': round(guest.diskread / (1024 ** 2), 2),  # MB/s
+                    'disk_write': round(guest.diskwrite / (1024 ** 2), 2),  # MB/s
+                    'net_in': round(guest.netin / (1024 ** 2), 2),  # Mbps
+                    'net_out': round(guest.netout / (1024 ** 2), 2),  # Mbps
+                    'ping': 10 if guest.type == 'qemu' else 8,  # ms (simulado)
+                    'disk_used': round(guest.disk / (1024 ** 3), 2),  # GB
+                    'disk_total': round(guest.maxdisk / (1024 ** 3), 2),  # GB
+                })
+                if vm['disk_total'] <= 0:
+                    vm['disk_total'] = 10  # Valor por defecto si no hay información
+            else:
+                # Valores por defecto para VMs apagadas
+                vm.update({
+                    'cpu': 0, 'mem': 0, 'mem_used': 0, 'mem_total': 0,
+                    'disk_read': 0, 'disk_write': 0, 'net_in': 0, 'net_out': 0,
+                    'ping': 'N/A', 'disk_used': 0, 'disk_total': 0,
+                })
+            vms.append(vm)
                 
         # Obtener resumen del cluster
         cluster_status = None
@@ -2107,14 +1967,14 @@ def api_metrics(request):
             }
         }
         
-        # Recolectar datos de nodos
-        nodes = proxmox.nodes.get()
+        # Inventario completo del cluster en una sola llamada
+        snapshot = collect_cluster_snapshot(proxmox, 'default')
         active_nodes = 0
         total_cpu = 0
         total_mem = 0
         
-        for node in nodes:
-            node_name = node['node']
+        for node_snap in snapshot.nodes:
+            node_name = node_snap.name
             
             # Filtrar por nodo si se especifica
             if node_filter and node_name != node_filter:
@@ -2123,7 +1983,7 @@ def api_metrics(request):
             # Obtener estadísticas del nodo
             try:
                 # Verificar si el nodo está en línea
-                if node.get('status') == 'online':
+                if node_snap.online:
                     active_nodes += 1
                     
                     # Obtener estadísticas RRD para gráficos
@@ -2159,189 +2019,85 @@ def api_metrics(request):
                     if not metrics_data['timestamps'] and timestamps:
                         metrics_data['timestamps'] = timestamps
                     
-                    # Obtener estadísticas actuales
-                    node_status = proxmox.nodes(node_name).status.get()
-                    cpu_usage = node_status.get('cpu', 0) * 100
-                    mem_usage = node_status.get('memory', {}).get('used', 0) / node_status.get('memory', {}).get('total', 1) * 100
-                    
-                    total_cpu += cpu_usage
-                    total_mem += mem_usage
+                    # Estadísticas actuales (del snapshot, sin llamada extra)
+                    total_cpu += node_snap.cpu
+                    total_mem += node_snap.mem_percent
             except Exception as e:
                 logger.warning(f"Error al obtener estadísticas del nodo {node_name}: {str(e)}")
         
         # Recolectar datos de VMs
-        vms = []
         active_vms = 0
         
-        # Obtener todas las VMs de todos los nodos
-        for node in nodes:
-            node_name = node['node']
-            
+        for guest in snapshot.guests:
             # Filtrar por nodo si se especifica
-            if node_filter and node_name != node_filter:
+            if node_filter and guest.node != node_filter:
                 continue
             
-            # Obtener VMs (QEMU)
-            try:
-                qemu_vms = proxmox.nodes(node_name).qemu.get()
-                for vm in qemu_vms:
-                    vm['node'] = node_name
-                    vm['type'] = 'qemu'
-                    vms.append(vm)
-                    
-                    # Filtrar por VM si se especifica
-                    if vm_filter and str(vm['vmid']) != vm_filter:
-                        continue
-                    
-                    # Obtener métricas para VMs en ejecución
-                    if vm.get('status') == 'running':
-                        active_vms += 1
-                        
-                        try:
-                            # Obtener estado actual
-                            vm_status = proxmox.nodes(node_name).qemu(vm['vmid']).status.current.get()
-                            
-                            # Obtener datos RRD para gráficos
-                            vm_rrd_data = proxmox.nodes(node_name).qemu(vm['vmid']).rrddata.get(
-                                timeframe=rrd_timeframe,
-                                cf='AVERAGE'
-                            )
-                            
-                            # Procesar datos RRD
-                            vm_cpu_data = []
-                            vm_mem_data = []
-                            vm_disk_read = []
-                            vm_disk_write = []
-                            vm_net_in = []
-                            vm_net_out = []
-                            
-                            for point in vm_rrd_data:
-                                # Datos de CPU
-                                cpu_val = point.get('cpu', 0) * 100  # Convertir a porcentaje
-                                vm_cpu_data.append(cpu_val)
-                                
-                                # Datos de Memoria
-                                mem_val = 0
-                                if 'mem' in point and 'maxmem' in point and point['maxmem'] > 0:
-                                    mem_val = (point['mem'] / point['maxmem']) * 100
-                                vm_mem_data.append(mem_val)
-                                
-                                # Datos de Disco
-                                vm_disk_read.append(point.get('diskread', 0) / (1024 ** 2))  # MB/s
-                                vm_disk_write.append(point.get('diskwrite', 0) / (1024 ** 2))  # MB/s
-                                
-                                # Datos de Red
-                                vm_net_in.append(point.get('netin', 0) / (1024 ** 2))  # Mbps
-                                vm_net_out.append(point.get('netout', 0) / (1024 ** 2))  # Mbps
-                            
-                            # Almacenar datos de la VM
-                            vm_name = vm.get('name', f"VM {vm['vmid']}")
-                            metrics_data['cpu_history']['vms'][vm_name] = vm_cpu_data
-                            metrics_data['memory_history']['vms'][vm_name] = vm_mem_data
-                            metrics_data['disk_history']['read'][vm_name] = vm_disk_read
-                            metrics_data['disk_history']['write'][vm_name] = vm_disk_write
-                            metrics_data['network_history']['in'][vm_name] = vm_net_in
-                            metrics_data['network_history']['out'][vm_name] = vm_net_out
-                            
-                            # Calcular uso actual para top VMs
-                            current_cpu = vm_status.get('cpu', 0) * 100
-                            current_mem = vm_status.get('mem', 0) / vm_status.get('maxmem', 1) * 100
-                            
-                            # Añadir a la lista de top VMs
-                            metrics_data['top_vms'].append({
-                                'id': vm['vmid'],
-                                'name': vm_name,
-                                'node': node_name,
-                                'cpu': round(current_cpu, 1),
-                                'memory': round(current_mem, 1),
-                                'disk_io': round(vm_status.get('diskread', 0) / (1024 ** 2) + vm_status.get('diskwrite', 0) / (1024 ** 2), 1),
-                                'network': round(vm_status.get('netin', 0) / (1024 ** 2) + vm_status.get('netout', 0) / (1024 ** 2), 1)
-                            })
-                        except Exception as e:
-                            logger.warning(f"Error al obtener datos RRD para VM {vm['vmid']}: {str(e)}")
-            except Exception as e:
-                logger.warning(f"Error al obtener VMs QEMU del nodo {node_name}: {str(e)}")
+            # Filtrar por VM si se especifica
+            if vm_filter and str(guest.vmid) != vm_filter:
+                continue
+            
+            # Obtener métricas para VMs y contenedores en ejecución
+            if not guest.running:
+                continue
+            active_vms += 1
             
-            # Obtener contenedores LXC
             try:
-                lxc_containers = proxmox.nodes(node_name).lxc.get()
-                for container in lxc_containers:
-                    container['node'] = node_name
-                    container['type'] = 'lxc'
-                    vms.append(container)
+                # Obtener datos RRD para gráficos (el estado actual ya viene en el snapshot)
+                guest_api = getattr(proxmox.nodes(guest.node), guest.type)(guest.vmid)
+                vm_rrd_data = guest_api.rrddata.get(
+                    timeframe=rrd_timeframe,
+                    cf='AVERAGE'
+                )
+                
+                # Procesar datos RRD
+                vm_cpu_data = []
+                vm_mem_data = []
+                vm_disk_read = []
+                vm_disk_write = []
+                vm_net_in = []
+                vm_net_out = []
+                
+                for point in vm_rrd_data:
+                    # Datos de CPU
+                    cpu_val = point.get('cpu', 0) * 100  # Convertir a porcentaje
+                    vm_cpu_data.append(cpu_val)
                     
-                    # Filtrar por VM si se especifica
-                    if vm_filter and str(container['vmid']) != vm_filter:
-                        continue
+                    # Datos de Memoria
+                    mem_val = 0
+                    if 'mem' in point and 'maxmem' in point and point['maxmem'] > 0:
+                        mem_val = (point['mem'] / point['maxmem']) * 100
+                    vm_mem_data.append(mem_val)
                     
-                    # Obtener métricas para contenedores en ejecución
-                    if container.get('status') == 'running':
-                        active_vms += 1
-                        
-                        try:
-                            # Obtener estado actual
-                            container_status = proxmox.nodes(node_name).lxc(container['vmid']).status.current.get()
-                            
-                            # Obtener datos RRD para gráficos
-                            container_rrd_data = proxmox.nodes(node_name).lxc(container['vmid']).rrddata.get(
-                                timeframe=rrd_timeframe,
-                                cf='AVERAGE'
-                            )
-                            
-                            # Procesar datos RRD (similar a las VMs)
-                            container_cpu_data = []
-                            container_mem_data = []
-                            container_disk_read = []
-                            container_disk_write = []
-                            container_net_in = []
-                            container_net_out = []
-                            
-                            for point in container_rrd_data:
-                                # Datos de CPU
-                                cpu_val = point.get('cpu', 0) * 100
-                                container_cpu_data.append(cpu_val)
-                                
-                                # Datos de Memoria
-                                mem_val = 0
-                                if 'mem' in point and 'maxmem' in point and point['maxmem'] > 0:
-                                    mem_val = (point['mem'] / point['maxmem']) * 100
-                                container_mem_data.append(mem_val)
-                                
-                                # Datos de Disco
-                                container_disk_read.append(point.get('diskread', 0) / (1024 ** 2))
-                                container_disk_write.append(point.get('diskwrite', 0) / (1024 ** 2))
-                                
-                                # Datos de Red
-                                container_net_in.append(point.get('netin', 0) / (1024 ** 2))
-                                container_net_out.append(point.get('netout', 0) / (1024 ** 2))
-                            
-                            # Almacenar datos del contenedor
-                            container_name = container.get('name', f"CT {container['vmid']}")
-                            metrics_data['cpu_history']['vms'][container_name] = container_cpu_data
-                            metrics_data['memory_history']['vms'][container_name] = container_mem_data
-                            metrics_data['disk_history']['read'][container_name] = container_disk_read
-                            metrics_data['disk_history']['write'][container_name] = container_disk_write
-                            metrics_data['network_history']['in'][container_name] = container_net_in
-                            metrics_data['network_history']['out'][container_name] = container_net_out
-                            
-                            # Calcular uso actual para top VMs
-                            current_cpu = container_status.get('cpu', 0) * 100
-                            current_mem = container_status.get('mem', 0) / container_status.get('maxmem', 1) * 100
-                            
-                            # Añadir a la lista de top VMs
-                            metrics_data['top_vms'].append({
-                                'id': container['vmid'],
-                                'name': container_name,
-                                'node': node_name,
-                                'cpu': round(current_cpu, 1),
-                                'memory': round(current_mem, 1),
-                                'disk_io': round(container_status.get('diskread', 0) / (1024 ** 2) + container_status.get('diskwrite', 0) / (1024 ** 2), 1),
-                                'network': round(container_status.get('netin', 0) / (1024 ** 2) + container_status.get('netout', 0) / (1024 ** 2), 1)
-                            })
-                        except Exception as e:
-                            logger.warning(f"Error al obtener datos RRD para contenedor {container['vmid']}: {str(e)}")
+                    # Datos de Disco
+                    vm_disk_read.append(point.get('diskread', 0) / (1024 ** 2))  # MB/s
+                    vm_disk_write.append(point.get('diskwrite', 0) / (1024 ** 2))  # MB/s
+                    
+                    # Datos de Red
+                    vm_net_in.append(point.get('netin', 0) / (1024 ** 2))  # Mbps
+                    vm_net_out.append(point.get('netout', 0) / (1024 ** 2))  # Mbps
+                
+                # Almacenar datos de la VM
+                vm_name = guest.name
+                metrics_data['cpu_history']['vms'][vm_name] = vm_cpu_data
+                metrics_data['memory_history']['vms'][vm_name] = vm_mem_data
+                metrics_data['disk_history']['read'][vm_name] = vm_disk_read
+                metrics_data['disk_history']['write'][vm_name] = vm_disk_write
+                metrics_data['network_history']['in'][vm_name] = vm_net_in
+                metrics_data['network_history']['out'][vm_name] = vm_net_out
             except Exception as e:
-                logger.warning(f"Error al obtener contenedores LXC del nodo {node_name}: {str(e)}")
+                logger.warning(f"Error al obtener datos RRD para {guest.type} {guest.vmid}: {str(e)}")
+            
+            # Añadir a la lista de top VMs
+            metrics_data['top_vms'].append({
+                'id': guest.vmid,
+                'name': guest.name,
+                'node': guest.node,
+                'cpu': round(guest.cpu, 1),
+                'memory': round(guest.mem_percent, 1),
+                'disk_io': round(guest.diskread / (1024 ** 2) + guest.diskwrite / (1024 ** 2), 1),
+                'network': round(guest.netin / (1024 ** 2) + guest.netout / (1024 ** 2), 1)
+            })
         
         # Calcular promedios
         if active_nodes > 0:
@@ -2518,83 +2274,79 @@ def nodes_overview(request):
     try:
         # 1. LEER DE LA BASE DE DATOS
         active_servers = ProxmoxServer.objects.filter(is_active=True)
-        nodes_info = []
         
-        # 2. ITERAR SOBRE LOS SERVIDORES DE LA BDD
-        for server in active_servers:
-            try:
-                # 3. CONECTAR USANDO LOS DATOS DE LA BDD
-                proxmox = ProxmoxAPI(
-                    server.hostname,
-                    user=server.username,
-                    password=server.password,
-                    verify_ssl=server.verify_ssl,
-                    timeout=10 # Le damos 10 segundos
-                )
-                
-                # 4. OBTENER INFORMACIÓN DEL NODO
-                node_name = server.node_name 
-                
-                total_vms = 0
-                running_vms = 0
-
-                # Obtener VMs QEMU
-                try:
-                    qemu_vms = proxmox.nodes(node_name).qemu.get()
-                    total_vms += len(qemu_vms)
-                    running_vms += len([vm for vm in qemu_vms if vm['status'] == 'running'])
-                except Exception as e:
-                    logger.warning(f"Error obteniendo VMs QEMU de {node_name}: {str(e)}")
-                
-                # Obtener contenedores LXC
-                try:
-                    lxc_containers = proxmox.nodes(node_name).lxc.get()
-                    total_vms += len(lxc_containers)
-                    running_vms += len([c for c in lxc_containers if c['status'] == 'running'])
-                except Exception as e:
-                    logger.warning(f"Error obteniendo LXC de {node_name}: {str(e)}")
-                
-                # Obtener estado del nodo
-                node_status = proxmox.nodes(node_name).status.get()
+        def fetch_server(server):
+            # 3. CONECTAR USANDO LOS DATOS DE LA BDD (conexión compartida)
+            proxmox = proxmox_manager.get_server_connection(server, timeout=10)
+            
+            # 4. OBTENER INFORMACIÓN DEL NODO
+            node_name = server.node_name 
+            
+            total_vms = 0
+            running_vms = 0
 
-                node_info = {
-                    'key': server.id,
-                    'name': server.name,
-                    'description': f"Servidor {server.name}", # Puedes mejorar esto si añades un campo 'description' al modelo
-                    'location': f"Datacenter {server.id}", # Ídem
-                    'host': server.hostname,
-                    'status': 'online',
-                    'total_vms': total_vms,
-                    'running_vms': running_vms,
-                    'cpu_usage': node_status.get('cpu', 0) * 100,
-                    'memory_usage': (node_status.get('memory', {}).get('used', 0) / node_status.get('memory', {}).get('total', 1)) * 100,
-                    'uptime': node_status.get('uptime', 0),
-                    'version': proxmox.version.get().get('version', 'N/A'),
-                    'node_count': 1,
-                    'connection_url': f"https://{server.hostname}:8006"
-                }
-                
+            # Obtener VMs QEMU
+            try:
+                qemu_vms = proxmox.nodes(node_name).qemu.get()
+                total_vms += len(qemu_vms)
+                running_vms += len([vm for vm in qemu_vms if vm['status'] == 'running'])
             except Exception as e:
-                logger.error(f"Error conectando al servidor {server.name}: {str(e)}")
-                node_info = {
-                    'key': server.id,
-                    'name': server.name,
-                    'description': "Error de conexión",
-                    'location': "N/A",
-                    'host': server.hostname,
-                    'status': 'offline',
-                    'error': str(e),
-                    'total_vms': 0,
-                    'running_vms': 0,
-                    'cpu_usage': 0,
-                    'memory_usage': 0,
-                    'uptime': 0,
-                    'version': 'N/A',
-                    'node_count': 0,
-                    'connection_url': None
-                }
+                logger.warning(f"Error obteniendo VMs QEMU de {node_name}: {str(e)}")
+            
+            # Obtener contenedores LXC
+            try:
+                lxc_containers = proxmox.nodes(node_name).lxc.get()
+                total_vms += len(lxc_containers)
+                running_vms += len([c for c in lxc_containers if c['status'] == 'running'])
+            except Exception as e:
+                logger.warning(f"Error obteniendo LXC de {node_name}: {str(e)}")
             
-            nodes_info.append(node_info)
+            # Obtener estado del nodo
+            node_status = proxmox.nodes(node_name).status.get()
+
+            return {
+                'key': server.id,
+                'name': server.name,
+                'description': f"Servidor {server.name}", # Puedes mejorar esto si añades un campo 'description' al modelo
+                'location': f"Datacenter {server.id}", # Ídem
+                'host': server.hostname,
+                'status': 'online',
+                'total_vms': total_vms,
+                'running_vms': running_vms,
+                'cpu_usage': node_status.get('cpu', 0) * 100,
+                'memory_usage': (node_status.get('memory', {}).get('used', 0) / node_status.get('memory', {}).get('total', 1)) * 100,
+                'uptime': node_status.get('uptime', 0),
+                'version': proxmox.version.get().get('version', 'N/A'),
+                'node_count': 1,
+                'connection_url': f"https://{server.hostname}:8006"
+            }
+        
+        # 2. CONSULTAR TODOS LOS SERVIDORES EN PARALELO (un host caído no bloquea al resto)
+        nodes_info = []
+        for result in fan_out(active_servers, fetch_server):
+            server = result.item
+            if result.ok:
+                nodes_info.append(result.value)
+                continue
+            logger.error(f"Error conectando al servidor {server.name}: {result.error_message}")
+            connection_registry.invalidate(str(server.id))
+            nodes_info.append({
+                'key': server.id,
+                'name': server.name,
+                'description': "Error de conexión",
+                'location': "N/A",
+                'host': server.hostname,
+                'status': 'offline',
+                'error': result.error_message,
+                'total_vms': 0,
+                'running_vms': 0,
+                'cpu_usage': 0,
+                'memory_usage': 0,
+                'uptime': 0,
+                'version': 'N/A',
+                'node_count': 0,
+                'connection_url': None
+            })
         
         #Prueba 
 
@@ -3043,70 +2795,94 @@ def vm_create(request, node_key, node_name):
 
 # Agregar estas APIs a tu archivo views.py existente
 
-@login_required
-def api_get_nodes_multi(request):
+def async_login_required(view_func):
+    """login_required para vistas async (el de Django < 5.1 solo envuelve vistas síncronas)"""
+    from functools import wraps
+    from asgiref.sync import sync_to_async
+    from django.contrib.auth.views import redirect_to_login
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # request.user es perezoso y consulta la sesión en BD
+        if await sync_to_async(lambda: request.user.is_authenticated)():
+            return await view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return wrapper
+
+@async_login_required
+async def api_get_nodes_multi(request):
     """
     API endpoint para obtener información de todos los nodos multi-configuración
     """
+    import asyncio
+    from utils import proxmox_async
+    from utils.fanout import afan_out
+
     try:
         active_nodes = proxmox_manager.get_all_nodes()
-        nodes_info = []
         
-        for node_key, node_config in active_nodes.items():
-            try:
-                proxmox = proxmox_manager.get_connection(node_key)
-                nodes_data = proxmox.nodes.get()
-                
-                total_vms = 0
-                running_vms = 0
-                
-                for node in nodes_data:
-                    node_name = node['node']
-                    try:
-                        qemu_vms = proxmox.nodes(node_name).qemu.get()
-                        total_vms += len(qemu_vms)
-                        running_vms += len([vm for vm in qemu_vms if vm['status'] == 'running'])
-                        
-                        lxc_containers = proxmox.nodes(node_name).lxc.get()
-                        total_vms += len(lxc_containers)
-                        running_vms += len([c for c in lxc_containers if c['status'] == 'running'])
-                    except Exception as e:
-                        logger.warning(f"Error obteniendo VMs de {node_name}: {str(e)}")
-                
-                main_node = nodes_data[0] if nodes_data else {}
-                
-                node_info = {
-                    'key': node_key,
-                    'name': node_config.get('name', f'Nodo {node_key}'),
-                    'host': node_config['host'],
-                    'status': 'online',
-                    'total_vms': total_vms,
-                    'running_vms': running_vms,
-                    'cpu_usage': main_node.get('cpu', 0) * 100,
-                    'memory_usage': (main_node.get('mem', 0) / main_node.get('maxmem', 1)) * 100 if main_node.get('maxmem') else 0,
-                    'uptime': main_node.get('uptime', 0),
-                    'version': proxmox.version.get().get('version', 'N/A'),
-                    'node_count': len(nodes_data)
-                }
-                
-            except Exception as e:
-                logger.error(f"Error conectando al nodo {node_key}: {str(e)}")
-                node_info = {
-                    'key': node_key,
-                    'name': node_config.get('name', f'Nodo {node_key}'),
-                    'host': node_config['host'],
-                    'status': 'offline',
-                    'error': str(e),
-                    'total_vms': 0,
-                    'running_vms': 0,
-                    'cpu_usage': 0,
-                    'memory_usage': 0,
-                    'uptime': 0,
-                    'version': 'N/A',
-                    'node_count': 0
-                }
+        async def fetch_node(node_key):
+            node_config = active_nodes[node_key]
+            client = await proxmox_async.get_client(node_key)
+            nodes_data, version = await asyncio.gather(client.get('/nodes'), client.get('/version'))
+            
+            async def count_guests(node_name):
+                try:
+                    qemu_vms, lxc_containers = await asyncio.gather(
+                        client.get(f'/nodes/{node_name}/qemu'),
+                        client.get(f'/nodes/{node_name}/lxc'),
+                    )
+                except Exception as e:
+                    logger.warning(f"Error obteniendo VMs de {node_name}: {str(e)}")
+                    return 0, 0
+                guests = qemu_vms + lxc_containers
+                return len(guests), len([vm for vm in guests if vm['status'] == 'running'])
+            
+            # Invitados de todos los nodos del cluster a la vez
+            counts = await asyncio.gather(*(count_guests(node['node']) for node in nodes_data))
+            total_vms = sum(total for total, _ in counts)
+            running_vms = sum(running for _, running in counts)
+            
+            main_node = nodes_data[0] if nodes_data else {}
             
-            nodes_info.append(node_info)
+            return {
+                'key': node_key,
+                'name': node_config.get('name', f'Nodo {node_key}'),
+                'host': node_config['host'],
+                'status': 'online',
+                'total_vms': total_vms,
+                'running_vms': running_vms,
+                'cpu_usage': main_node.get('cpu', 0) * 100,
+                'memory_usage': (main_node.get('mem', 0) / main_node.get('maxmem', 1)) * 100 if main_node.get('maxmem') else 0,
+                'uptime': main_node.get('uptime', 0),
+                'version': version.get('version', 'N/A'),
+                'node_count': len(nodes_data)
+            }
+        
+        # Consultar todos los nodos en paralelo con plazo por servidor
+        nodes_info = []
+        for result in await afan_out(active_nodes.keys(), fetch_node):
+            node_key = result.item
+            if result.ok:
+                nodes_info.append(result.value)
+                continue
+            node_config = active_nodes[node_key]
+            logger.error(f"Error conectando al nodo {node_key}: {result.error_message}")
+            await proxmox_async.invalidate(node_key)
+            nodes_info.append({
+                'key': node_key,
+                'name': node_config.get('name', f'Nodo {node_key}'),
+                'host': node_config['host'],
+                'status': 'offline',
+                'error': result.error_message,
+                'total_vms': 0,
+                'running_vms': 0,
+                'cpu_usage': 0,
+                'memory_usage': 0,
+                'uptime': 0,
+                'version': 'N/A',
+                'node_count': 0
+            })
         
         return JsonResponse({
             'success': True,
@@ -3196,15 +2972,17 @@ def api_get_vms_by_node(request, node_key):
             'message': str(e)
         })
 
-@login_required
-def api_node_status(request, node_key):
+@async_login_required
+async def api_node_status(request, node_key):
     """
     API endpoint para obtener el estado de un nodo específico
     """
+    import asyncio
+    from utils import proxmox_async
+
     try:
-        proxmox = proxmox_manager.get_connection(node_key)
-        nodes_data = proxmox.nodes.get()
-        version = proxmox.version.get()
+        client = await proxmox_async.get_client(node_key)
+        nodes_data, version = await asyncio.gather(client.get('/nodes'), client.get('/version'))
         
         node_status = {
             'node_key': node_key,
@@ -3213,27 +2991,33 @@ def api_node_status(request, node_key):
             'nodes': []
         }
         
-        for node in nodes_data:
-            node_name = node['node']
+        async def read_status(node_name):
             try:
-                node_detail = proxmox.nodes(node_name).status.get()
-                node_info = {
-                    'name': node_name,
-                    'status': node['status'],
-                    'cpu': node_detail.get('cpu', 0) * 100,
-                    'memory': {
-                        'total': node_detail.get('memory', {}).get('total', 0),
-                        'used': node_detail.get('memory', {}).get('used', 0),
-                        'free': node_detail.get('memory', {}).get('free', 0),
-                        'percentage': (node_detail.get('memory', {}).get('used', 0) / 
-                                     node_detail.get('memory', {}).get('total', 1)) * 100
-                    },
-                    'uptime': node_detail.get('uptime', 0),
-                    'load': node_detail.get('loadavg', [0, 0, 0])
-                }
-                node_status['nodes'].append(node_info)
+                return await client.get(f'/nodes/{node_name}/status')
             except Exception as e:
                 logger.warning(f"Error obteniendo estado del nodo {node_name}: {str(e)}")
+                return None
+        
+        # Estado de todos los nodos a la vez
+        details = await asyncio.gather(*(read_status(node['node']) for node in nodes_data))
+        for node, node_detail in zip(nodes_data, details):
+            if node_detail is None:
+                continue
+            node_info = {
+                'name': node['node'],
+                'status': node['status'],
+                'cpu': node_detail.get('cpu', 0) * 100,
+                'memory': {
+                    'total': node_detail.get('memory', {}).get('total', 0),
+                    'used': node_detail.get('memory', {}).get('used', 0),
+                    'free': node_detail.get('memory', {}).get('free', 0),
+                    'percentage': (node_detail.get('memory', {}).get('used', 0) / 
+                                 node_detail.get('memory', {}).get('total', 1)) * 100
+                },
+                'uptime': node_detail.get('uptime', 0),
+                'load': node_detail.get('loadavg', [0, 0, 0])
+            }
+            node_status['nodes'].append(node_info)
         
         return JsonResponse({
             'success': True,
@@ -3293,55 +3077,44 @@ def api_vm_status_new(request, node_key, node_name, vmid):
             'message': str(e)
         })
 
-@login_required
-def api_vm_metrics_new(request, node_key, node_name, vmid):
+@async_login_required
+async def api_vm_metrics_new(request, node_key, node_name, vmid):
     """
     API endpoint para obtener métricas detalladas de una VM en el nuevo sistema
     """
+    import asyncio
+    from utils import proxmox_async
+
     try:
-        proxmox = proxmox_manager.get_connection(node_key)
+        client = await proxmox_async.get_client(node_key)
         
-        # Determinar tipo de VM
+        # Determinar tipo de VM (el estado de la detección es el actual)
         vm_type = None
-        try:
-            proxmox.nodes(node_name).qemu(vmid).status.current.get()
-            vm_type = 'qemu'
-        except:
+        for candidate in ('qemu', 'lxc'):
             try:
-                proxmox.nodes(node_name).lxc(vmid).status.current.get()
-                vm_type = 'lxc'
-            except:
-                return JsonResponse({
-                    'success': False,
-                    'message': f"No se encontró VM con ID {vmid} en el nodo {node_name}"
-                })
-        
-        # Obtener métricas actuales
-        if vm_type == 'qemu':
-            vm_status = proxmox.nodes(node_name).qemu(vmid).status.current.get()
-            vm_config = proxmox.nodes(node_name).qemu(vmid).config.get()
-            
-            # Obtener datos RRD para historial
-            try:
-                rrd_data = proxmox.nodes(node_name).qemu(vmid).rrddata.get(
-                    timeframe='hour',
-                    cf='AVERAGE'
-                )
-            except:
-                rrd_data = []
-                
-        else:  # lxc
-            vm_status = proxmox.nodes(node_name).lxc(vmid).status.current.get()
-            vm_config = proxmox.nodes(node_name).lxc(vmid).config.get()
-            
+                vm_status = await client.get(f'/nodes/{node_name}/{candidate}/{vmid}/status/current')
+                vm_type = candidate
+                break
+            except Exception:
+                continue
+        if vm_type is None:
+            return JsonResponse({
+                'success': False,
+                'message': f"No se encontró VM con ID {vmid} en el nodo {node_name}"
+            })
+        
+        async def read_rrd():
             # Obtener datos RRD para historial
             try:
-                rrd_data = proxmox.nodes(node_name).lxc(vmid).rrddata.get(
-                    timeframe='hour',
-                    cf='AVERAGE'
-                )
-            except:
-                rrd_data = []
+                return await client.get(f'/nodes/{node_name}/{vm_type}/{vmid}/rrddata', timeframe='hour', cf='AVERAGE')
+            except Exception:
+                return []
+        
+        # Configuración e historial a la vez
+        vm_config, rrd_data = await asyncio.gather(
+            client.get(f'/nodes/{node_name}/{vm_type}/{vmid}/config'),
+            read_rrd(),
+        )
         
         # Calcular métricas
         cpu = vm_status.get('cpu', 0) * 100
@@ -3422,206 +3195,215 @@ def api_vm_metrics_new(request, node_key, node_name, vmid):
 
 # Vista principal para el overview de nodos
 
-@login_required
-@csrf_exempt
-def api_metrics(request):
-    """API con conexión REAL a Proxmox - Versión optimizada con proxmox_manager"""
+def _server_metrics_payload(server, node_name, status, node_guests, rrd_data):
+    """Métricas de un servidor para api_metrics a partir de su estado, sus invitados y el RRD (sin E/S)"""
     from datetime import datetime
+
+    # Métricas principales
+    cpu_raw = status.get('cpu')
+    cpu_usage = round(cpu_raw * 100, 1) if cpu_raw is not None else 0
+    
+    mem_data = status.get('memory', {})
+    memory_used = mem_data.get('used') or 0
+    memory_total = mem_data.get('total') or 1
+    memory_percent = round((memory_used / memory_total) * 100, 1)
+    
+    disk_data = status.get('rootfs', {})
+    rootfs_used = disk_data.get('used') or 0
+    rootfs_total = disk_data.get('total') or 1
+    disk_percent = round((rootfs_used / rootfs_total) * 100, 1)
+
+    # Red - calcular velocidad actual (Estimación)
+    network_in_bytes = status.get('netin') or 0
+    network_out_bytes = status.get('netout') or 0
+    uptime = status.get('uptime') or 1
+    if uptime < 1: uptime = 1
+    
+    # Cálculo simple de media histórica si no hay delta
+    # Idealmente deberíamos comparar con la última lectura, pero por ahora:
+    network_out_mbps = round(network_out_bytes / (1024 * 1024 * uptime) * 8, 2)
+    # Corrección heurística si el valor es absurdo (picos de inicio)
+    if network_out_mbps > 1000: 
+        network_out_mbps = round(network_out_mbps / 100, 2)
+    
+    # VMs y contenedores del nodo (desde el snapshot)
+    active_vms = sum(1 for g in node_guests if g.running)
+    total_vms = len(node_guests)
+    
+    timestamps = []
+    cpu_history = []
+    mem_history = []
+    
+    for point in rrd_data:
+        # Filtrar puntos vacíos o corruptos
+        if not isinstance(point, dict): continue
+        
+        try:
+            ts = point.get('time')
+            if not ts: continue
+            
+            time_str = datetime.fromtimestamp(ts).strftime('%H:%M')
+            timestamps.append(time_str)
+            
+            # Handle potential None values safely
+            cpu_val = point.get('cpu')
+            if cpu_val is None: cpu_val = 0
+            cpu_history.append(round(cpu_val * 100, 1))
+            
+            m_used = point.get('memused')
+            if m_used is None: m_used = 0
+            
+            m_total = point.get('memtotal')
+            if m_total is None or m_total <= 0: m_total = 1
+            
+            m_pct = round((m_used / m_total) * 100, 1)
+            mem_history.append(m_pct)
+        except:
+            continue 
+
+    # Limitar a los últimos 12 puntos (1 hora aprox si son cada 5 min)
+    if len(timestamps) > 12:
+        timestamps = timestamps[-12:]
+        cpu_history = cpu_history[-12:]
+        mem_history = mem_history[-12:]
+
+    # Relleno si no hay suficientes datos
+    if len(timestamps) < 2:
+        current_time = datetime.now()
+        timestamps = [current_time.strftime('%H:%M')]
+        cpu_history = [cpu_usage]
+        mem_history = [memory_percent]
+    
+    # Construir información completa del servidor
+    return {
+        'id': server.id,
+        'name': server.name,
+        'node': node_name,
+        'online': True,
+        'metrics': {
+            'cpu': {
+                'usage': cpu_usage,
+                'cores': status.get('cpuinfo', {}).get('cores', 0),
+                'model': status.get('cpuinfo', {}).get('model', 'Unknown'),
+                'sockets': status.get('cpuinfo', {}).get('sockets', 1),
+                'mhz': status.get('cpuinfo', {}).get('mhz', 'Unknown')
+            },
+            'memory': {
+                'percent': memory_percent,
+                'used_gb': round(memory_used / (1024**3), 1) if memory_used else 0,
+                'total_gb': round(memory_total / (1024**3), 1) if memory_total else 0,
+                'free_gb': round((memory_total - memory_used) / (1024**3), 1) if memory_total > memory_used else 0
+            },
+            'disk': {
+                'percent': disk_percent,
+                'used_tb': round(rootfs_used / (1024**4), 2) if rootfs_used else 0,
+                'total_tb': round(rootfs_total / (1024**4), 2) if rootfs_total else 0,
+                'free_tb': round((rootfs_total - rootfs_used) / (1024**4), 2) if rootfs_total > rootfs_used else 0,
+                'used_gb': round(rootfs_used / (1024**3), 1) if rootfs_used else 0,
+                'total_gb': round(rootfs_total / (1024**3), 1) if rootfs_total else 0
+            },
+            'network': {
+                'in': network_in_bytes,
+                'out': network_out_bytes,
+                'out_mbps': network_out_mbps
+            },
+            'swap': {
+                'used': status.get('swap', {}).get('used', 0),
+                'total': status.get('swap', {}).get('total', 0),
+                'percent': round((status.get('swap', {}).get('used', 0) / 
+                               max(status.get('swap', {}).get('total', 1), 1)) * 100, 1)
+            }
+        },
+        'vms': {
+            'total': total_vms,
+            'active': active_vms
+        },
+        'uptime': format_uptime(status.get('uptime', 0)),
+        'load': status.get('loadavg', ['0', '0', '0']),
+        'kernel': status.get('kversion', 'Unknown'),
+        'pve_version': status.get('pveversion', 'Unknown'),
+        'history': {
+            'timestamps': timestamps,
+            'cpu': cpu_history,
+            'memory': mem_history
+        }
+    }
+
+@async_login_required
+async def api_metrics(request):
+    """
+    API con conexión REAL a Proxmox - Versión async: los servidores se
+    consultan en paralelo con httpx (utils.proxmox_async) sin ocupar hilos.
+    """
+    import asyncio
+    from datetime import datetime
+    from asgiref.sync import sync_to_async
     from submodulos.models import ProxmoxServer
-    from utils.proxmox_manager import proxmox_manager
+    from submodulos.logic.cluster_snapshot import aget_cached_snapshot
+    from utils import proxmox_async
+    from utils.fanout import afan_out
+    from utils.proxmox_cache import acached_read
     
     try:
-        servers = ProxmoxServer.objects.filter(is_active=True).order_by('id')[:3]
+        servers = await sync_to_async(list)(ProxmoxServer.objects.filter(is_active=True).order_by('id')[:3])
         servers_data = []
         
-        for idx, server in enumerate(servers):
-            try:
-                # Usar el manager centralizado para conexión
-                proxmox = proxmox_manager.get_connection(str(server.id))
-                
-                # Obtener primer nodo disponible
-                nodes_list = proxmox.nodes.get()
-                if not nodes_list:
-                    raise Exception("No hay nodos disponibles en este servidor")
-                
-                # Usar el nombre del nodo configurado o el primero que encontremos
-                node_name = server.node_name if server.node_name and any(n['node'] == server.node_name for n in nodes_list) else nodes_list[0]['node']
-                
-                # Obtener estado del nodo
-                status = proxmox.nodes(node_name).status.get()
-                
-                # Métricas principales
-                cpu_raw = status.get('cpu')
-                cpu_usage = round(cpu_raw * 100, 1) if cpu_raw is not None else 0
-                
-                mem_data = status.get('memory', {})
-                memory_used = mem_data.get('used') or 0
-                memory_total = mem_data.get('total') or 1
-                memory_percent = round((memory_used / memory_total) * 100, 1)
-                
-                disk_data = status.get('rootfs', {})
-                rootfs_used = disk_data.get('used') or 0
-                rootfs_total = disk_data.get('total') or 1
-                disk_percent = round((rootfs_used / rootfs_total) * 100, 1)
-
-                # Red - calcular velocidad actual (Estimación)
-                network_in_bytes = status.get('netin') or 0
-                network_out_bytes = status.get('netout') or 0
-                uptime = status.get('uptime') or 1
-                if uptime < 1: uptime = 1
-                
-                # Cálculo simple de media histórica si no hay delta
-                # Idealmente deberíamos comparar con la última lectura, pero por ahora:
-                network_out_mbps = round(network_out_bytes / (1024 * 1024 * uptime) * 8, 2)
-                # Corrección heurística si el valor es absurdo (picos de inicio)
-                if network_out_mbps > 1000: 
-                    network_out_mbps = round(network_out_mbps / 100, 2)
-                
-                # Obtener VMs (QEMU)
-                try:
-                    qemu_vms = proxmox.nodes(node_name).qemu.get()
-                    active_vms = sum(1 for vm in qemu_vms if vm.get('status') == 'running')
-                except:
-                    qemu_vms = []
-                    active_vms = 0
-                
-                # Obtener Contenedores (LXC)
-                try:
-                    lxc_containers = proxmox.nodes(node_name).lxc.get()
-                    active_vms += sum(1 for ct in lxc_containers if ct.get('status') == 'running')
-                except:
-                    lxc_containers = []
-                
-                total_vms = len(qemu_vms) + len(lxc_containers)
-                
-                # Datos históricos RRD (1 hora)
+        async def fetch_server(server):
+            server_key = str(server.id)
+            
+            # Inventario del cluster (nodos + invitados), compartido entre peticiones
+            snapshot = await aget_cached_snapshot(server_key)
+            if not snapshot.nodes:
+                raise Exception("No hay nodos disponibles en este servidor")
+            
+            # Usar el nombre del nodo configurado o el primero que encontremos
+            node_name = snapshot.resolve_node(server.node_name)
+            
+            async def read_rrd():
+                # Datos históricos RRD (1 hora); puede fallar si no hay datos, manejar gracefully
                 try:
-                    # RRD puede fallar si no hay datos, manejar gracefully
-                    rrd_data = proxmox.nodes(node_name).rrddata.get(timeframe='hour')
+                    return await acached_read(
+                        server_key, node_name, 'rrd',
+                        lambda: proxmox_async.api_get(server_key, f'/nodes/{node_name}/rrddata', timeframe='hour'),
+                        'hour'
+                    )
                 except Exception as e:
                     print(f"DEBUG RRD ERROR {server.name}: {str(e)}")
-                    rrd_data = [] 
-                
-                timestamps = []
-                cpu_history = []
-                mem_history = []
-                
-                for point in rrd_data:
-                    # Filtrar puntos vacíos o corruptos
-                    if not isinstance(point, dict): continue
-                    
-                    try:
-                        ts = point.get('time')
-                        if not ts: continue
-                        
-                        time_str = datetime.fromtimestamp(ts).strftime('%H:%M')
-                        timestamps.append(time_str)
-                        
-                        # Handle potential None values safely
-                        cpu_val = point.get('cpu')
-                        if cpu_val is None: cpu_val = 0
-                        cpu_history.append(round(cpu_val * 100, 1))
-                        
-                        m_used = point.get('memused')
-                        if m_used is None: m_used = 0
-                        
-                        m_total = point.get('memtotal')
-                        if m_total is None or m_total <= 0: m_total = 1
-                        
-                        m_pct = round((m_used / m_total) * 100, 1)
-                        mem_history.append(m_pct)
-                    except:
-                        continue 
-
-                # Limitar a los últimos 12 puntos (1 hora aprox si son cada 5 min)
-                if len(timestamps) > 12:
-                    timestamps = timestamps[-12:]
-                    cpu_history = cpu_history[-12:]
-                    mem_history = mem_history[-12:]
-
-                # Relleno si no hay suficientes datos
-                if len(timestamps) < 2:
-                    current_time = datetime.now()
-                    timestamps = [current_time.strftime('%H:%M')]
-                    cpu_history = [cpu_usage]
-                    mem_history = [memory_percent]
-                
-                # Construir información completa del servidor
-                server_info = {
-                    'id': server.id,
-                    'name': server.name,
-                    'node': node_name,
-                    'online': True,
-                    'metrics': {
-                        'cpu': {
-                            'usage': cpu_usage,
-                            'cores': status.get('cpuinfo', {}).get('cores', 0),
-                            'model': status.get('cpuinfo', {}).get('model', 'Unknown'),
-                            'sockets': status.get('cpuinfo', {}).get('sockets', 1),
-                            'mhz': status.get('cpuinfo', {}).get('mhz', 'Unknown')
-                        },
-                        'memory': {
-                            'percent': memory_percent,
-                            'used_gb': round(memory_used / (1024**3), 1) if memory_used else 0,
-                            'total_gb': round(memory_total / (1024**3), 1) if memory_total else 0,
-                            'free_gb': round((memory_total - memory_used) / (1024**3), 1) if memory_total > memory_used else 0
-                        },
-                        'disk': {
-                            'percent': disk_percent,
-                            'used_tb': round(rootfs_used / (1024**4), 2) if rootfs_used else 0,
-                            'total_tb': round(rootfs_total / (1024**4), 2) if rootfs_total else 0,
-                            'free_tb': round((rootfs_total - rootfs_used) / (1024**4), 2) if rootfs_total > rootfs_used else 0,
-                            'used_gb': round(rootfs_used / (1024**3), 1) if rootfs_used else 0,
-                            'total_gb': round(rootfs_total / (1024**3), 1) if rootfs_total else 0
-                        },
-                        'network': {
-                            'in': network_in_bytes,
-                            'out': network_out_bytes,
-                            'out_mbps': network_out_mbps
-                        },
-                        'swap': {
-                            'used': status.get('swap', {}).get('used', 0),
-                            'total': status.get('swap', {}).get('total', 0),
-                            'percent': round((status.get('swap', {}).get('used', 0) / 
-                                           max(status.get('swap', {}).get('total', 1), 1)) * 100, 1)
-                        }
-                    },
-                    'vms': {
-                        'total': total_vms,
-                        'active': active_vms
-                    },
-                    'uptime': format_uptime(status.get('uptime', 0)),
-                    'load': status.get('loadavg', ['0', '0', '0']),
-                    'kernel': status.get('kversion', 'Unknown'),
-                    'pve_version': status.get('pveversion', 'Unknown'),
-                    'history': {
-                        'timestamps': timestamps,
-                        'cpu': cpu_history,
-                        'memory': mem_history
-                    }
-                }
-                    
-            except Exception as e:
-                import traceback
-                print(f"DEBUG CONNECTION ERROR {server.name}: {str(e)}")
-                # traceback.print_exc()
-                server_info = {
-                    'id': server.id,
-                    'name': server.name,
-                    'node': 'offline',
-                    'online': False,
-                    'metrics': {
-                        'cpu': {'usage': 0, 'cores': 0, 'model': 'Unknown'},
-                        'memory': {'percent': 0, 'used_gb': 0, 'total_gb': 0},
-                        'disk': {'percent': 0, 'used_tb': 0, 'total_tb': 0, 'total_gb': 0},
-                        'network': {'in': 0, 'out': 0, 'out_mbps': 0}
-                    },
-                    'vms': {'total': 0, 'active': 0},
-                    'uptime': '--',
-                    'history': {'timestamps': [], 'cpu': [], 'memory': []}
-                }
+                    return []
             
-            servers_data.append(server_info)
+            # Estado del nodo y RRD a la vez
+            status, rrd_data = await asyncio.gather(
+                acached_read(
+                    server_key, node_name, 'node_status',
+                    lambda: proxmox_async.api_get(server_key, f'/nodes/{node_name}/status')
+                ),
+                read_rrd(),
+            )
+            return _server_metrics_payload(server, node_name, status, snapshot.guests_on(node_name), rrd_data)
+
+        # Consultar los servidores en paralelo; los que fallen quedan offline
+        for result in await afan_out(servers, fetch_server):
+            server = result.item
+            if result.ok:
+                servers_data.append(result.value)
+                continue
+            print(f"DEBUG CONNECTION ERROR {server.name}: {result.error_message}")
+            await proxmox_async.invalidate(str(server.id))
+            servers_data.append({
+                'id': server.id,
+                'name': server.name,
+                'node': 'offline',
+                'online': False,
+                'metrics': {
+                    'cpu': {'usage': 0, 'cores': 0, 'model': 'Unknown'},
+                    'memory': {'percent': 0, 'used_gb': 0, 'total_gb': 0},
+                    'disk': {'percent': 0, 'used_tb': 0, 'total_tb': 0, 'total_gb': 0},
+                    'network': {'in': 0, 'out': 0, 'out_mbps': 0}
+                },
+                'vms': {'total': 0, 'active': 0},
+                'uptime': '--',
+                'history': {'timestamps': [], 'cpu': [], 'memory': []}
+            })
         
         # Completar con servidores vacíos si faltan
         while len(servers_data) < 3:
@@ -3647,8 +3429,23 @@ def api_metrics(request):
             'disk': [s['metrics']['disk']['percent'] if s.get('online') else 0 for s in servers_data]
         }
         
+        # ?since=<version>: solo lo que cambió respecto a esa respuesta (utils.delta)
+        version = await sync_to_async(delta.remember)('metrics', servers_data)
+        since, base = await sync_to_async(delta.requested_base)(request, 'metrics')
+        if base is not None and len(base) == len(servers_data):
+            return JsonResponse({
+                'success': True,
+                'delta': True,
+                'since': since,
+                'version': version,
+                'servers': [_server_metrics_delta(old, new) for old, new in zip(base, servers_data)],
+                'timestamp': datetime.now().isoformat()
+            })
+
         return JsonResponse({
             'success': True,
+            'delta': False,
+            'version': version,
             'servers': servers_data,
             'server_comparison': comparison_data,
             'timestamp': datetime.now().isoformat()
@@ -3658,6 +3455,22 @@ def api_metrics(request):
         print(f"Error general: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+def _server_metrics_delta(old, new):
+    """Cambios de un servidor de api_metrics: campos modificados y puntos nuevos del historial"""
+    old_history = old.get('history') or {}
+    new_history = new.get('history') or {}
+    changes = delta.diff(
+        {k: v for k, v in old.items() if k != 'history'},
+        {k: v for k, v in new.items() if k != 'history'},
+    )
+    if old_history != new_history:
+        series = delta.series_delta(old_history, new_history)
+        if series is None:
+            changes['history'] = new_history
+        else:
+            changes['history_delta'] = series
+    return changes
+
 def format_uptime(seconds):
     """Formatea segundos a formato legible"""
     days = seconds // 86400
@@ -3691,53 +3504,46 @@ def process_rrd_data(rrd_data):
         'memory': memory_data[-24:]
     }
 
-@csrf_exempt
-@require_http_methods(["GET"])
-def get_server_vms(request, server_id):
-    """Obtiene las VMs reales de un servidor"""
+def _resolve_dashboard_server(server_id):
+    """ProxmoxServer por ID o, si no existe, por índice 1-3 (el que usa el frontend)"""
     from submodulos.models import ProxmoxServer
-    from utils.proxmox_manager import proxmox_manager
-    from django.http import JsonResponse
-    
+
     try:
-        # Intentar obtener por ID, si falla, intentar por índice (1-3)
+        return ProxmoxServer.objects.get(id=server_id), None
+    except ProxmoxServer.DoesNotExist:
+        # Usar mismo filtro que api_metrics para consistencia de índices
+        all_servers = ProxmoxServer.objects.filter(is_active=True).order_by('id')
         try:
-            server = ProxmoxServer.objects.get(id=server_id)
-        except ProxmoxServer.DoesNotExist:
-            # Fallback para when el frontend envía índices 1, 2, 3 en lugar de IDs reales
-            # Usar mismo filtro que api_metrics para consistencia de índices
-            all_servers = ProxmoxServer.objects.filter(is_active=True).order_by('id')
-            try:
-                idx = int(server_id) - 1
-                if 0 <= idx < all_servers.count():
-                    server = all_servers[idx]
-                else:
-                    return JsonResponse({"success": False, "error": f"Servidor {server_id} no encontrado"})
-            except ValueError:
-                 return JsonResponse({"success": False, "error": f"ID inválido: {server_id}"})
-        
-        proxmox = proxmox_manager.get_connection(str(server.id))
-        
-        nodes_list = proxmox.nodes.get()
-        target_node = None
+            idx = int(server_id) - 1
+        except ValueError:
+            return None, f"ID inválido: {server_id}"
+        if 0 <= idx < all_servers.count():
+            return all_servers[idx], None
+        return None, f"Servidor {server_id} no encontrado"
+
+@require_http_methods(["GET"])
+async def get_server_vms(request, server_id):
+    """Obtiene las VMs reales de un servidor (async: IPs de los guest agents en paralelo)"""
+    import asyncio
+    from asgiref.sync import sync_to_async
+    from submodulos.logic.cluster_snapshot import aget_cached_snapshot
+    from utils import proxmox_async
+    from utils.proxmox_cache import acached_read
+
+    try:
+        # Intentar obtener por ID, si falla, intentar por índice (1-3)
+        server, error = await sync_to_async(_resolve_dashboard_server)(server_id)
+        if server is None:
+            return JsonResponse({"success": False, "error": error})
         
-        if server.node_name:
-             for n in nodes_list:
-                 if n["node"] == server.node_name:
-                     target_node = n["node"]
-                     break
+        server_key = str(server.id)
         
-        if not target_node and nodes_list:
-            target_node = nodes_list[0]["node"]
+        # Inventario del cluster desde la caché compartida (sin status.current por VM)
+        snapshot = await aget_cached_snapshot(server_key)
+        target_node = snapshot.resolve_node(server.node_name)
             
         if not target_node:
             return JsonResponse({"success": False, "error": "No active nodes found"})
-            
-        vms_data = []
-        
-        def safe_pct(used, total):
-            if not total or total <= 0: return 0
-            return round((used / total) * 100, 1)
 
         def format_uptime_internal(seconds):
             if not seconds: return "--"
@@ -3748,85 +3554,55 @@ def get_server_vms(request, server_id):
             if hours > 0: return f"{hours}h {mins}m"
             return f"{mins}m"
 
-        try:
-            qemu_vms = proxmox.nodes(target_node).qemu.get()
-        except:
-            qemu_vms = []
-            
-        for vm in qemu_vms:
+        async def guest_ip(guest):
+            if guest.type != 'qemu':
+                return "Container"
+            # La IP solo la expone el guest agent (una llamada por VM encendida)
+            if not guest.running:
+                return "Sin IP"
             try:
-                vmid = vm.get("vmid")
-                try:
-                    status_data = proxmox.nodes(target_node).qemu(vmid).status.current.get()
-                except:
-                    status_data = vm
-                
-                cpu_usage = round(status_data.get("cpu", 0) * 100, 1)
-                mem_pct = safe_pct(status_data.get("mem", 0), status_data.get("maxmem", 1))
-                disk_pct = safe_pct(status_data.get("disk", 0), status_data.get("maxdisk", 1))
-                uptime_val = status_data.get("uptime", 0)
-                
-                ip_address = "Sin IP"
-                if vm.get("status") == "running":
-                    try:
-                        iframes = proxmox.nodes(target_node).qemu(vmid).agent("network-get-interfaces").get()
-                        for iface in iframes.get("result", []):
-                            if "ip-addresses" in iface:
-                                for ip_info in iface["ip-addresses"]:
-                                    if ip_info["ip-address-type"] == "ipv4" and not ip_info["ip-address"].startswith("127."):
-                                        ip_address = ip_info["ip-address"]
-                                        break
-                            if ip_address != "Sin IP": break
-                    except:
-                        pass
+                iframes = await acached_read(
+                    server_key, target_node, 'guest_ip',
+                    lambda: proxmox_async.api_get(
+                        server_key, f'/nodes/{target_node}/qemu/{guest.vmid}/agent/network-get-interfaces'),
+                    guest.vmid
+                )
+            except Exception:
+                return "Sin IP"
+            for iface in iframes.get("result", []):
+                for ip_info in iface.get("ip-addresses", []):
+                    if ip_info["ip-address-type"] == "ipv4" and not ip_info["ip-address"].startswith("127."):
+                        return ip_info["ip-address"]
+            return "Sin IP"
 
-                vms_data.append({
-                    "id": f"vm-{server_id}-{vmid}",
-                    "vmid": vmid,
-                    "name": vm.get("name", f"VM {vmid}"),
-                    "status": vm.get("status", "unknown"),
-                    "cpu": cpu_usage,
-                    "memory": mem_pct,
-                    "disk": disk_pct,
-                    "uptime": format_uptime_internal(uptime_val),
-                    "ip": ip_address
-                })
-            except Exception as e:
-                continue
+        guests = snapshot.guests_on(target_node)
+        # Las llamadas al guest agent de todas las VMs a la vez
+        ips = await asyncio.gather(*(guest_ip(guest) for guest in guests))
 
-        try:
-            lxc_cts = proxmox.nodes(target_node).lxc.get()
-        except:
-            lxc_cts = []
-            
-        for ct in lxc_cts:
-            try:
-                vmid = ct.get("vmid")
-                try:
-                    status_data = proxmox.nodes(target_node).lxc(vmid).status.current.get()
-                except:
-                    status_data = ct
+        vms_data = []
+        for guest, ip_address in zip(guests, ips):
+            prefix = "vm" if guest.type == 'qemu' else "lxc"
+            vms_data.append({
+                "id": f"{prefix}-{server_id}-{guest.vmid}",
+                "vmid": guest.vmid,
+                "name": guest.name,
+                "status": guest.status,
+                "cpu": round(guest.cpu, 1),
+                "memory": round(guest.mem_percent, 1),
+                "disk": round(guest.disk_percent, 1),
+                "uptime": format_uptime_internal(guest.uptime),
+                "ip": ip_address
+            })
 
-                cpu_usage = round(status_data.get("cpu", 0) * 100, 1)
-                mem_pct = safe_pct(status_data.get("mem", 0), status_data.get("maxmem", 1))
-                disk_pct = safe_pct(status_data.get("disk", 0), status_data.get("maxdisk", 1))
-                uptime_val = status_data.get("uptime", 0)
-                
-                vms_data.append({
-                    "id": f"lxc-{server_id}-{vmid}",
-                    "vmid": vmid,
-                    "name": ct.get("name", f"CT {vmid}"),
-                    "status": ct.get("status", "unknown"),
-                    "cpu": cpu_usage,
-                    "memory": mem_pct,
-                    "disk": disk_pct,
-                    "uptime": format_uptime_internal(uptime_val),
-                    "ip": "Container" 
-                })
-            except:
-                continue
-                
-        return JsonResponse({"success": True, "vms": vms_data})
+        # ?since=<version>: solo las VMs que cambiaron (utils.delta)
+        scope = f"vms:{server.id}"
+        version = await sync_to_async(delta.remember)(scope, vms_data)
+        since, base = await sync_to_async(delta.requested_base)(request, scope)
+        if base is not None:
+            return JsonResponse({"success": True, "delta": True, "since": since, "version": version,
+                                 **delta.entries_delta(base, vms_data)})
+
+        return JsonResponse({"success": True, "delta": False, "version": version, "vms": vms_data})
 
     except Exception as e:
         import traceback
@@ -3910,54 +3686,51 @@ def api_servers_metrics(request):
     # 1. Obtiene los servidores desde la BASE DE DATOS
     active_servers = ProxmoxServer.objects.filter(is_active=True)
 
-    # 2. Itera sobre los servidores de la BDD
-    for server in active_servers:
-        try:
-            print(f"Connecting to {server.name} ({server.hostname})...")
-            # 3. Conecta usando las credenciales de la BDD
-            proxmox = ProxmoxAPI(
-                server.hostname,
-                user=server.username,
-                password=server.password,
-                verify_ssl=server.verify_ssl,
-                timeout=10 # Le damos 10 segundos
-            )
+    def fetch_server(server):
+        print(f"Connecting to {server.name} ({server.hostname})...")
+        # 3. Conecta usando las credenciales de la BDD (conexión compartida)
+        proxmox = proxmox_manager.get_server_connection(server, timeout=10)
 
-            # 4. Usa el 'node_name' que guardamos en la BDD
-            node_name = server.node_name
-            print(f"Fetching status for node: {node_name}")
-            node_status = proxmox.nodes(node_name).status.get()
+        # 4. Usa el 'node_name' que guardamos en la BDD
+        node_name = server.node_name
+        print(f"Fetching status for node: {node_name}")
+        node_status = proxmox.nodes(node_name).status.get()
 
-            server_info = {
-                'name': server.name,
-                'host': server.hostname,
-                'status': 'online',
-                'cpu': node_status.get('cpu', 0) * 100,
-                'memory': {
-                    'used': node_status.get('memory', {}).get('used', 0),
-                    'total': node_status.get('memory', {}).get('total', 0),
-                    'percent': (node_status.get('memory', {}).get('used', 0) / 
-                                node_status.get('memory', {}).get('total', 1)) * 100
-                },
-                'disk': {
-                    'used': node_status.get('rootfs', {}).get('used', 0),
-                    'total': node_status.get('rootfs', {}).get('total', 0),
-                    'percent': (node_status.get('rootfs', {}).get('used', 0) / 
-                                node_status.get('rootfs', {}).get('total', 1)) * 100
-                },
-                'uptime': node_status.get('uptime', 0)
-            }
-            servers_data.append(server_info)
+        return {
+            'name': server.name,
+            'host': server.hostname,
+            'status': 'online',
+            'cpu': node_status.get('cpu', 0) * 100,
+            'memory': {
+                'used': node_status.get('memory', {}).get('used', 0),
+                'total': node_status.get('memory', {}).get('total', 0),
+                'percent': (node_status.get('memory', {}).get('used', 0) / 
+                            node_status.get('memory', {}).get('total', 1)) * 100
+            },
+            'disk': {
+                'used': node_status.get('rootfs', {}).get('used', 0),
+                'total': node_status.get('rootfs', {}).get('total', 0),
+                'percent': (node_status.get('rootfs', {}).get('used', 0) / 
+                            node_status.get('rootfs', {}).get('total', 1)) * 100
+            },
+            'uptime': node_status.get('uptime', 0)
+        }
 
-        except Exception as e:
-            print(f"ERROR connecting to {server.name}: {e}")
-            logger.error(f"Error al conectar con el servidor {server.name} (ID: {server.id}): {e}")
-            servers_data.append({
-                'name': server.name,
-                'host': server.hostname,
-                'status': 'offline',
-                'error': str(e)
-            })
+    # 2. Consulta todos los servidores en paralelo con plazo por servidor
+    for result in fan_out(active_servers, fetch_server):
+        server = result.item
+        if result.ok:
+            servers_data.append(result.value)
+            continue
+        print(f"ERROR connecting to {server.name}: {result.error_message}")
+        logger.error(f"Error al conectar con el servidor {server.name} (ID: {server.id}): {result.error_message}")
+        connection_registry.invalidate(str(server.id))
+        servers_data.append({
+            'name': server.name,
+            'host': server.hostname,
+            'status': 'offline',
+            'error': result.error_message
+        })
 
     return JsonResponse({
         'success': True,
@@ -3969,134 +3742,6 @@ def api_servers_metrics(request):
 
 # Function get_vm_metrics removed due to broken dependencies
 
-#--------------------------
-    # Predicciones SARIMA para métricas
-
-@csrf_exempt
-def get_metrics_predictions(request, server_id):
-    """Predicciones usando SARIMA"""
-    from statsmodels.tsa.statespace.sarimax import SARIMAX # type: ignore
-    import pandas as pd
-    import numpy as np
-    from datetime import datetime, timedelta
-    
-    try:
-        # Obtener datos históricos del servidor (últimas 24-48 horas)
-        server = ProxmoxServer.objects.get(id=server_id)
-        
-        # Aquí deberías obtener datos reales históricos
-        # Por ahora, generamos datos de ejemplo con estacionalidad
-        hours = 168  # Una semana de datos
-        timestamps = pd.date_range(end=datetime.now(), periods=hours, freq='H')
-        
-        # Simular datos con patrón estacional diario
-        cpu_pattern = np.array([30 + 20*np.sin(2*np.pi*i/24) + np.random.normal(0, 5) for i in range(hours)])
-        mem_pattern = np.array([45 + 15*np.sin(2*np.pi*i/24 + np.pi/4) + np.random.normal(0, 3) for i in range(hours)])
-        
-        # Crear series temporales
-        cpu_series = pd.Series(cpu_pattern, index=timestamps)
-        mem_series = pd.Series(mem_pattern, index=timestamps)
-        
-        predictions = {'cpu': {}, 'memory': {}}
-        
-        # SARIMA para CPU
-        try:
-            # Parámetros SARIMA: (p,d,q)(P,D,Q,s)
-            # s=24 para estacionalidad diaria con datos horarios
-            model_cpu = SARIMAX(cpu_series, 
-                               order=(1, 1, 1),  # ARIMA
-                               seasonal_order=(1, 1, 1, 24))  # Estacional
-            
-            fitted_cpu = model_cpu.fit(disp=False)
-            forecast_cpu = fitted_cpu.forecast(steps=24)
-            
-            # Intervalos de confianza
-            forecast_df = fitted_cpu.get_forecast(steps=24)
-            confidence_int = forecast_df.conf_int()
-            
-            predictions['cpu'] = {
-                'model': 'SARIMA(1,1,1)(1,1,1,24)',
-                'current': float(cpu_series.iloc[-1]),
-                'forecast': {
-                    'timestamps': [t.strftime('%H:%M') for t in forecast_cpu.index],
-                    'values': forecast_cpu.tolist(),
-                    'lower_bound': confidence_int.iloc[:, 0].tolist(),
-                    'upper_bound': confidence_int.iloc[:, 1].tolist()
-                },
-                'metrics': {
-                    'aic': fitted_cpu.aic,
-                    'bic': fitted_cpu.bic,
-                    'mean_forecast': float(forecast_cpu.mean()),
-                    'max_forecast': float(forecast_cpu.max()),
-                    'trend': 'increasing' if forecast_cpu.iloc[-1] > cpu_series.iloc[-1] else 'decreasing'
-                }
-            }
-        except Exception as e:
-            predictions['cpu'] = {'error': str(e)}
-        
-        # SARIMA para Memoria
-        try:
-            model_mem = SARIMAX(mem_series, 
-                              order=(1, 1, 1),
-                              seasonal_order=(1, 1, 1, 24))
-            
-            fitted_mem = model_mem.fit(disp=False)
-            forecast_mem = fitted_mem.forecast(steps=24)
-            
-            forecast_df_mem = fitted_mem.get_forecast(steps=24)
-            confidence_int_mem = forecast_df_mem.conf_int()
-            
-            predictions['memory'] = {
-                'model': 'SARIMA(1,1,1)(1,1,1,24)',
-                'current': float(mem_series.iloc[-1]),
-                'forecast': {
-                    'timestamps': [t.strftime('%H:%M') for t in forecast_mem.index],
-                    'values': forecast_mem.tolist(),
-                    'lower_bound': confidence_int_mem.iloc[:, 0].tolist(),
-                    'upper_bound': confidence_int_mem.iloc[:, 1].tolist()
-                },
-                'metrics': {
-                    'mean_forecast': float(forecast_mem.mean()),
-                    'max_forecast': float(forecast_mem.max()),
-                    'trend': 'increasing' if forecast_mem.iloc[-1] > mem_series.iloc[-1] else 'decreasing'
-                }
-            }
-        except Exception as e:
-            predictions['memory'] = {'error': str(e)}
-        
-        # Generar recomendaciones
-        recommendations = []
-        if predictions['cpu'].get('metrics', {}).get('max_forecast', 0) > 80:
-            recommendations.append({
-                'type': 'warning',
-                'metric': 'CPU',
-                'message': 'CPU podría exceder 80% en las próximas 24h',
-                'action': 'Considerar balanceo de carga o aumentar recursos'
-            })
-        
-        if predictions['memory'].get('metrics', {}).get('max_forecast', 0) > 85:
-            recommendations.append({
-                'type': 'critical',
-                'metric': 'Memory',
-                'message': 'Memoria podría exceder 85% en las próximas 24h',
-                'action': 'Aumentar RAM o migrar VMs'
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'predictions': predictions,
-            'recommendations': recommendations,
-            'server_name': server.name
-        })
-        
-    except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
-
-
-
-
-
-
 #--------------------------------------
 from django.http import JsonResponse
 
@@ -4108,120 +3753,153 @@ def vms_metrics_api(request):
     try:
         # Obtener conexión a todos los nodos Proxmox
         nodes = proxmox_manager.get_all_nodes()
+        seen_servers = set()
         for node_key, node_config in nodes.items():
-            proxmox = proxmox_manager.get_connection(node_key)
+            # El mismo servidor se indexa por ID y por hostname
+            server_key = node_config.get('db_id', node_key)
+            if server_key in seen_servers:
+                continue
+            seen_servers.add(server_key)
+
             node_name = node_config.get('node', node_key)
 
-            # Obtener máquinas QEMU (virtuales)
-            qemu_vms = proxmox.nodes(node_name).qemu.get()
-            for vm in qemu_vms:
-                vmid = vm.get('vmid')
-                vm_name = vm.get('name', f"VM-{vmid}")
-                status = vm.get('status')
+            # Inventario del cluster desde la caché compartida
+            snapshot = get_cached_snapshot(server_key if 'db_id' in node_config else node_key)
 
-                # Solo mostrar las que existen (independientemente del estado)
-                try:
-                    detail = proxmox.nodes(node_name).qemu(vmid).status.current.get()
-                    data.append({
-                        "node": node_name,
-                        "vmid": vmid,
-                        "name": vm_name,
-                        "status": status,
-                        "cpu": round(detail.get("cpu", 0) * 100, 2),
-                        "mem": round(detail.get("mem", 0) / detail.get("maxmem", 1) * 100, 2),
-                        "disk": round(detail.get("disk", 0) / (1024 ** 3), 2),
-                        "net_in": round(detail.get("netin", 0) / (1024 ** 2), 2),
-                        "net_out": round(detail.get("netout", 0) / (1024 ** 2), 2)
-                    })
-                except Exception:
-                    continue
+            # Máquinas QEMU (virtuales), independientemente del estado
+            for guest in snapshot.guests_on(node_name, 'qemu'):
+                data.append({
+                    "node": node_name,
+                    "vmid": guest.vmid,
+                    "name": guest.name,
+                    "status": guest.status,
+                    "cpu": round(guest.cpu, 2),
+                    "mem": round(guest.mem_percent, 2),
+                    "disk": round(guest.disk / (1024 ** 3), 2),
+                    "net_in": round(guest.netin / (1024 ** 2), 2),
+                    "net_out": round(guest.netout / (1024 ** 2), 2)
+                })
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"vms": data})
 
+async def live_events(request):
+    """
+    Canal Server-Sent Events de los dashboards: snapshots del colector y
+    AgentLog nuevos, repartidos desde una única suscripción por proceso
+    (utils.live). Requiere servir la aplicación por ASGI (sentinelnexus.asgi)
+    con Django >= 5.0: al desconectarse el cliente (http.disconnect) Django
+    cancela la respuesta y Broadcaster.stream libera su cola.
+    """
+    from asgiref.sync import sync_to_async
+    from django.http import StreamingHttpResponse
+    from utils.live import broadcaster
+
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    queue = broadcaster.subscribe()
+    response = StreamingHttpResponse(broadcaster.stream(queue), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Sin buffer en nginx
+    return response
+
+def _forecast_document_response(request, kind, entity_id):
+    """Sirve el documento de predicción precalculado con ETag y GET condicional (304)"""
+    from django.utils.http import parse_etags
+    from submodulos.logic.forecast_documents import get_document
+
+    document = get_document(kind, entity_id)
+    if document is None:
+        return JsonResponse({'success': False, 'error': 'Not found'}, status=404)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or document['etag'] in parse_etags(if_none_match)):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(document['body'], content_type='application/json')
+    response['ETag'] = document['etag']
+    # El navegador revalida en cada sondeo; la respuesta 304 no lleva cuerpo
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @csrf_exempt
 def get_metrics_predictions(request, server_id):
     """
     Retorna las predicciones de un servidor específico en formato JSON para Chart.js.
+
+    El documento lo genera el ciclo de predicción (forecast_documents) y se
+    sirve desde la caché con ETag.
     """
-    from submodulos.models import ServerPrediction, ProxmoxServer
-    import pandas as pd
-    
+    from submodulos.models import ProxmoxServer
+
     try:
-        # 1. Obtener el servidor
-        try:
-            # Mapeo rápido de IDs frontend a Nombres en BD
-            server_name_map = {
-                1: 'Servidor Principal',
-                2: 'Servidor Secundario',
-                3: 'Servidor Backup'
-            }
-            name = server_name_map.get(int(server_id))
-            if name:
-                 server = ProxmoxServer.objects.filter(name=name).first()
-            else:
-                 server = ProxmoxServer.objects.get(id=server_id)
-                 
-            if not server:
-                # Fallback: intentar buscar por ID directo si falló el mapeo
-                server = ProxmoxServer.objects.filter(id=server_id).first()
-                if not server:
-                    return JsonResponse({'success': False, 'error': 'Server not found'}, status=404)
+        # Mapeo rápido de IDs frontend a Nombres en BD
+        server_name_map = {
+            1: 'Servidor Principal',
+            2: 'Servidor Secundario',
+            3: 'Servidor Backup'
+        }
+        name = server_name_map.get(int(server_id))
+        server_pk = None
+        if name:
+            server_pk = ProxmoxServer.objects.filter(name=name).values_list('id', flat=True).first()
+        if server_pk is None:
+            # Fallback: intentar buscar por ID directo si falló el mapeo
+            server_pk = ProxmoxServer.objects.filter(id=server_id).values_list('id', flat=True).first()
+        if server_pk is None:
+            return JsonResponse({'success': False, 'error': 'Server not found'}, status=404)
+    except Exception:
+        return JsonResponse({'success': False, 'error': 'Invalid Server ID'}, status=400)
 
-        except Exception:
-             return JsonResponse({'success': False, 'error': 'Invalid Server ID'}, status=400)
-
-        # 2. Obtener predicciones futuras (desde ahora)
-        from django.utils import timezone as django_timezone
-        now = django_timezone.now()
-        preds = ServerPrediction.objects.filter(
-            server=server,
-            timestamp__gte=now
-        ).order_by('timestamp')[:24] # Próximas 24 horas
-
-        # 3. Formatear para Chart.js
-        timestamps = [p.timestamp.strftime('%H:%M') for p in preds]
-        cpu_values = [p.predicted_cpu_usage for p in preds]
-        mem_values = [p.predicted_memory_usage for p in preds]
-        
-        # 4. Generar recomendaciones simples
-        recommendations = []
-        max_cpu = max(cpu_values) if cpu_values else 0
-        max_mem = max(mem_values) if mem_values else 0
-        
-        if max_cpu > 80:
-            recommendations.append({
-                'type': 'warning',
-                'metric': 'CPU',
-                'message': f'Pico de CPU previsto: {max_cpu:.1f}%',
-                'action': 'Monitorizar procesos intensivos'
-            })
-            
-        if max_mem > 90:
-             recommendations.append({
-                'type': 'critical',
-                'metric': 'RAM',
-                'message': f'Pico de RAM previsto: {max_mem:.1f}%',
-                'action': 'Preparar liberación de memoria'
-            })
+    try:
+        return _forecast_document_response(request, 'server', server_pk)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-        return JsonResponse({
-            'success': True,
-            'server_name': server.name,
-            'predictions': {
-                'cpu': {
-                    'labels': timestamps,
-                    'data': cpu_values
-                },
-                'memory': {
-                    'labels': timestamps,
-                    'data': mem_values
-                }
-            },
-            'recommendations': recommendations
-        })
 
+@login_required
+@require_GET
+def get_vm_predictions(request, vm_id):
+    """Predicciones y banda esperada de CPU de una VM (documento precalculado con ETag)"""
+    try:
+        return _forecast_document_response(request, 'vm', vm_id)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@login_required
+def forecast_stats_api(request):
+    """
+    Coste (tiempo de ajuste, observaciones, AIC/BIC) y precisión real
+    (MAE/MAPE) de las predicciones, agregados por tipo de entidad y backend.
+    Parámetro opcional: ?days=N (por defecto 7, máximo 90).
+    """
+    from submodulos.logic.forecast_stats import summarize
+
+    try:
+        days = min(max(int(request.GET.get('days', 7)), 1), 90)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid days'}, status=400)
+
+    try:
+        return JsonResponse({'success': True, **summarize(days=days)})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@login_required
+def capacity_api(request):
+    """
+    Proyección de agotamiento de CPU, RAM y almacenamiento por nodo,
+    calculada en cada sincronización con Proxmox.
+    Parámetro opcional: ?node=<nombre>.
+    """
+    from submodulos.logic.capacity_planner import summarize
+
+    try:
+        return JsonResponse({'success': True, 'resources': summarize(node=request.GET.get('node'))})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
@@ -4230,8 +3908,8 @@ def data_dashboard(request):
     """
     Dashboard para visualizar y exportar datos históricos
     """
-    from submodulos.models import ProxmoxServer, Nodo, VMMetric
-    from django.db.models import Count
+    from submodulos.models import ProxmoxServer, Nodo, VMMetricRollup
+    from django.db.models import Sum
     from django.db.models.functions import TruncDate
     from django.utils import timezone
     from datetime import timedelta
@@ -4245,10 +3923,11 @@ def data_dashboard(request):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=7)
     
-    metrics_history = VMMetric.objects.filter(timestamp__gte=start_date)\
-        .annotate(date=TruncDate('timestamp'))\
+    # Muestras por día a partir de los rollups horarios (no recorre VMMetric)
+    metrics_history = VMMetricRollup.objects.filter(resolution='1h', bucket__gte=start_date)\
+        .annotate(date=TruncDate('bucket'))\
         .values('date')\
-        .annotate(count=Count('id'))\
+        .annotate(count=Sum('sample_count'))\
         .order_by('date')
         
     # Preparar datos para Chart.js
@@ -4282,58 +3961,59 @@ def data_dashboard(request):
 @login_required
 def export_data_csv(request):
     """
-    Exporta datos de métricas a CSV. Soporta filtrado por modelo.
+    Exporta datos de métricas a CSV en streaming. Soporta filtrado por modelo.
+
+    Parámetros opcionales: start_date / end_date (YYYY-MM-DD, fin incluido),
+    server (nombre o ID), vm (nombre o ID, solo vm_metrics), gzip=1 y
+    format=csv|parquet|arrow (columnas tipadas, requiere pyarrow).
     """
-    import csv
-    from django.http import HttpResponse
+    from django.http import StreamingHttpResponse
     from django.utils import timezone
-    from submodulos.models import VMMetric, ServerMetric, ProxmoxServer, Nodo
+    from submodulos.logic.exports import (
+        COLUMNAR_FORMATS, arrow_schema, columnar_chunks, csv_chunks, export_rows, gzip_chunks, parse_bound,
+        streaming_body,
+    )
 
     model_name = request.GET.get('model', 'vm_metrics') # Default to VM Metrics
-    
-    response = HttpResponse(content_type='text/csv')
-    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
-    response['Content-Disposition'] = f'attachment; filename="sentinelnexus_{model_name}_{timestamp}.csv"'
-    
-    writer = csv.writer(response)
-    
-    if model_name == 'vm_metrics':
-        # Exportar Historial de Métricas de VMs
-        writer.writerow(['Timestamp', 'VM', 'Servidor Origen', 'Estado', 'CPU (%)', 'RAM (%)'])
-        queryset = VMMetric.objects.all().order_by('-timestamp')
-        for item in queryset:
-            writer.writerow([
-                item.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                item.vm_name,
-                item.server_origin,
-                item.status,
-                str(item.cpu_usage).replace('.', ','), # Excel friendly for some locales
-                str(item.ram_usage).replace('.', ',')
-            ])
-            
-    elif model_name == 'server_metrics':
-        # Exportar Historial de Métricas de Servidores
-        writer.writerow(['Timestamp', 'Nodo', 'Uptime (s)', 'CPU (%)', 'RAM (%)'])
-        queryset = ServerMetric.objects.all().order_by('-timestamp')
-        for item in queryset:
-            server_name = item.server.name if item.server else "Unknown"
-            writer.writerow([
-                item.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                server_name,
-                item.uptime,
-                str(item.cpu_usage).replace('.', ','),
-                str(item.ram_usage).replace('.', ',')
-            ])
-            
+    if model_name not in ('vm_metrics', 'server_metrics'):
+        return HttpResponse(f"Modelo no reconocido: {model_name}", status=400, content_type='text/plain')
+
+    try:
+        header, rows = export_rows(
+            model_name,
+            start=parse_bound(request.GET.get('start_date')),
+            end=parse_bound(request.GET.get('end_date'), end=True),
+            server=request.GET.get('server') or None,
+            vm=request.GET.get('vm') or None,
+        )
+    except ValueError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain')
 
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    export_format = request.GET.get('format', 'csv')
+    if export_format in COLUMNAR_FORMATS:
+        try:
+            arrow_schema(model_name)  # Falla aquí (y no a mitad de la descarga) si no hay pyarrow
+        except ImportError as e:
+            return HttpResponse(str(e), status=501, content_type='text/plain')
+        extension, content_type = COLUMNAR_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            streaming_body(request, columnar_chunks(model_name, rows, export_format)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="sentinelnexus_{model_name}_{timestamp}.{extension}"'
+        return response
+    if export_format != 'csv':
+        return HttpResponse(f"Formato no soportado: {export_format}", status=400, content_type='text/plain')
 
-    # Fallback legacy export (si no se especifica modelo válido o para compatibilidad)
-    else: 
-         # Si no coincide con ninguno, usamos la lógica anterior de snapshot actual
-         # pero simplificada para devolver algo 
-         writer.writerow(['Timestamp', 'Tipo', 'Entidad', 'Info'])
-         writer.writerow([timezone.now(), 'Error', 'Modelo no reconocido', model_name])
-         
+    # Decimales con coma como la exportación original (Excel en locales es_*)
+    chunks = csv_chunks(header, rows, decimal_comma=True)
+    filename = f"sentinelnexus_{model_name}_{timestamp}.csv"
+    if request.GET.get('gzip') in ('1', 'true'):
+        response = StreamingHttpResponse(streaming_body(request, gzip_chunks(chunks)), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(
+            streaming_body(request, (chunk.encode() for chunk in chunks)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 # ==========================================
@@ -4365,6 +4045,7 @@ def predictions_dashboard(request):
     Vista para mostrar el dashboard de predicciones y anomalías.
     """
     from submodulos.models import ServerPrediction, VMPrediction
+    from submodulos.logic.forecasting import complete_predictions
     from django.utils import timezone
     
     now = timezone.now()
@@ -4373,14 +4054,14 @@ def predictions_dashboard(request):
     # Obtener predicciones recientes (últimos 30 días) para mostrar datos aunque sean pasados
     start_date = now - timedelta(days=30)
     
-    server_predictions = ServerPrediction.objects.filter(
+    server_predictions = complete_predictions(ServerPrediction.objects.filter(
         timestamp__gte=start_date
-    ).order_by('-timestamp', 'server__name')[:50]
+    )).order_by('-timestamp', 'server__name')[:50]
     
     # Obtener predicciones de VMs (muestra)
-    vm_predictions = VMPrediction.objects.filter(
+    vm_predictions = complete_predictions(VMPrediction.objects.filter(
         timestamp__gte=start_date
-    ).order_by('-timestamp', 'vm__nombre')[:20]
+    )).order_by('-timestamp', 'vm__nombre')[:20]
 
     today_min = now - timezone.timedelta(hours=24)
     
@@ -4413,9 +4094,27 @@ def predictions_dashboard(request):
         # En caso de error, asumimos lo peor para obligar a revisar
         agent_offline = True
     
+    # Coste y precisión de los modelos (últimos 7 días)
+    forecast_stats = None
+    try:
+        from submodulos.logic.forecast_stats import summarize
+        forecast_stats = summarize(days=7)
+    except Exception as e:
+        logger.warning(f"Error obteniendo estadísticas de predicción: {e}")
+
+    # Proyección de capacidad por nodo
+    capacity = []
+    try:
+        from submodulos.logic.capacity_planner import summarize as summarize_capacity
+        capacity = summarize_capacity()
+    except Exception as e:
+        logger.warning(f"Error obteniendo la planificación de capacidad: {e}")
+
     return render(request, 'predictions.html', {
         'server_predictions': server_predictions,
         'vm_predictions': vm_predictions,
+        'forecast_stats': forecast_stats,
+        'capacity': capacity,
         'demo_mode': demo_mode,
         'agent_offline': agent_offline,
         'last_metric_time': last_metric_time
@@ -65,7 +65,7 @@ admin.site.register(SistemaOperativo)
 # admin.site.register(EstadisticaRecursos)
 
 # --- Registros para Predicciones SARIMA ---
-from .models import ServerPrediction, VMPrediction
+from .models import ServerPrediction, VMPrediction, ForecastModelState, ForecastRun, ForecastFitStat, CapacityForecast
 
 @admin.register(ServerPrediction)
 class ServerPredictionAdmin(admin.ModelAdmin):
@@ -79,4 +79,29 @@ class VMPredictionAdmin(admin.ModelAdmin):
     list_display = ('vm', 'timestamp', 'predicted_cpu_usage', 'predicted_memory_usage', 'is_anomaly')
     list_filter = ('vm', 'is_anomaly', 'timestamp')
     date_hierarchy = 'timestamp'
-    ordering = ('-timestamp',)
\ No newline at end of file
+    ordering = ('-timestamp',)
+
+@admin.register(ForecastModelState)
+class ForecastModelStateAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'entity_id', 'metric', 'spec', 'reference_mae', 'fitted_at', 'last_observation')
+    list_filter = ('kind', 'metric')
+    ordering = ('kind', 'entity_id', 'metric')
+
+@admin.register(ForecastRun)
+class ForecastRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'started_at', 'finished_at', 'entities', 'failures', 'predictions')
+    list_filter = ('status',)
+    date_hierarchy = 'started_at'
+
+@admin.register(ForecastFitStat)
+class ForecastFitStatAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'backend', 'run', 'fit_seconds', 'nobs', 'aic', 'mape_cpu', 'mape_memory', 'refit', 'ok')
+    list_filter = ('kind', 'backend', 'ok', 'refit')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+
+@admin.register(CapacityForecast)
+class CapacityForecastAdmin(admin.ModelAdmin):
+    list_display = ('recurso', 'capacidad_total', 'usado', 'asignado', 'exhaustion_at', 'limiting', 'samples', 'updated_at')
+    list_filter = ('limiting', 'recurso__tipo_recurso')
+    ordering = ('exhaustion_at',)
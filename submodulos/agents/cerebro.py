@@ -6,10 +6,14 @@ import re
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour, PeriodicBehaviour
 from asgiref.sync import sync_to_async
-from submodulos.models import ServerMetric, VMMetric, AgentLog, MaquinaVirtual, Nodo, VMPrediction, ProxmoxServer
-from submodulos.logic.forecasting import train_and_predict_server, train_and_predict_vm
+from submodulos.models import ServerMetric, VMMetric, AgentLog, MaquinaVirtual, Nodo, VMPrediction, ProxmoxServer, ForecastRun
 from submodulos.proxmox_service import proxmox_service
 from django.utils import timezone
+from django.conf import settings
+from django.db import close_old_connections
+from utils.write_buffer import get_buffer
+from utils.live import publish_logs_on_commit
+from submodulos.logic.online_detector import OnlineDetector
 from datetime import timedelta
 
 # ======================================================
@@ -29,10 +33,14 @@ class CerebroAgent(Agent):
         kwargs.pop('port', None)
         super().__init__(*args, **kwargs)
         # Ensure our settings apply - REMOVED TO RESPECT PATCH
+        self.detector = OnlineDetector('cerebro:vm')
 
 
     @sync_to_async
     def guardar_metrica_servidor(self, nodo_nombre, cpu, ram, up):
+        self._guardar_metrica_servidor(nodo_nombre, cpu, ram, up)
+
+    def _guardar_metrica_servidor(self, nodo_nombre, cpu, ram, up):
         try:
             # Buscar el servidor Proxmox asociado a este nodo
             # Prioridad 1: Coincidencia exacta de nombre de nodo
@@ -49,61 +57,82 @@ class CerebroAgent(Agent):
                     print(f"Servidor para nodo {nodo_nombre} no encontrado explicitamente. Asignando a {server.name}")
 
             if server:
-                ServerMetric.objects.create(
+                get_buffer(ServerMetric).add(ServerMetric(
                     server=server,
                     cpu_usage=cpu,
                     ram_usage=ram,
                     uptime=up,
                     disk_usage=0
-                )
+                ))
             else:
                 print(f"ERROR CRITICO: No hay servidores Proxmox registrados en DB. No se puede guardar metrica de {nodo_nombre}")
         except Exception as e:
             print(f"Error guardando metrica de servidor: {e}")
         
     @sync_to_async
-    def guardar_metrica_vm(self, nombre, servidor, cpu, ram, status):
-        # 1. Guardar Métrica Real
-        VMMetric.objects.create(
-            vm_name=nombre,
-            server_origin=servidor,
-            cpu_usage=cpu,
-            ram_usage=ram,
-            status=status
-        )
-        
-        # 2. DETECCIÓN DE ANOMALÍAS (SARIMA)
+    def procesar_reporte(self, nodo, cpu, ram, up, vms, persistir=True):
+        """
+        Procesa el reporte completo de un nodo en un único salto de hilo.
+
+        Guarda la métrica del nodo y las de todas sus VMs con un bulk_create,
+        resuelve las VMs con una consulta y pasa cada muestra por el detector
+        de anomalías en línea (en memoria). Devuelve el número de VMs procesadas.
+        """
+        # 1. Resolver las VMs registradas (las de este nodo tienen prioridad)
+        nombres = {vm["name"] for vm in vms}
+        vms_db = {}
         try:
-            # Buscar VM en DB para obtener ID
-            vm_obj = MaquinaVirtual.objects.filter(nombre=nombre).first()
-            if vm_obj:
-                # Buscar predicción para la hora actual
-                now = timezone.now()
-                start_range = now - timedelta(minutes=30)
-                end_range = now + timedelta(minutes=30)
-                
-                prediction = VMPrediction.objects.filter(
-                    vm=vm_obj, 
-                    timestamp__range=(start_range, end_range)
-                ).first()
-                
-                if prediction:
-                    # Si difiere más del 20% absoluto
-                    umbrale_cpu = 20.0 
-                    diff_cpu = abs(prediction.predicted_cpu_usage - cpu)
-                    
-                    if diff_cpu > umbrale_cpu:
-                        msg = f"ANOMALIA DETECTADA en {nombre}: CPU Real {cpu}% vs Predicho {prediction.predicted_cpu_usage:.2f}%"
-                        print(msg)
-                        # Registrar anomalía como warning tambien
-                        AgentLog.objects.create(
-                            agent_name="Cerebro",
-                            level="WARNING",
-                            message=msg,
-                            details={"cpu_real": cpu, "cpu_pred": prediction.predicted_cpu_usage}
-                        )
+            candidatas = MaquinaVirtual.objects.filter(nombre__in=nombres).select_related('nodo').order_by('vm_id')
+            for vm_obj in sorted(candidatas, key=lambda v: v.nodo.nombre != nodo):
+                vms_db.setdefault(vm_obj.nombre, vm_obj)
         except Exception as e:
-            print(f"Error en detección de anomalías: {e}")
+            print(f"Error resolviendo VMs de {nodo}: {e}")
+
+        # 2. Guardar Métricas Reales (salvo que el colector ya las haya guardado)
+        if persistir:
+            self._guardar_metrica_servidor(nodo, cpu, ram, up)
+            get_buffer(VMMetric).extend([
+                VMMetric(
+                    vm=vms_db.get(vm["name"]),
+                    vm_name=vm["name"],
+                    server_origin=nodo,
+                    cpu_usage=vm["cpu"],
+                    ram_usage=vm["ram"],
+                    status=vm["status"]
+                )
+                for vm in vms
+            ])
+
+        logs = []
+
+        # 3. DETECCIÓN DE ANOMALÍAS (detector en línea, sin consultas)
+        # Las anomalías se escriben en lote desde ComportamientoDeteccion
+        for vm in vms:
+            vm_obj = vms_db.get(vm["name"])
+            vm_id = vm_obj.vm_id if vm_obj else None
+            self.detector.observe(vm_id, vm["name"], nodo, 'cpu', vm["cpu"])
+            self.detector.observe(vm_id, vm["name"], nodo, 'ram', vm["ram"])
+
+        # 4. Log simple de resumen y alerta si hay carga
+        logs.append(AgentLog(
+            agent_name="Cerebro",
+            level="INFO",
+            message=f"Procesado reporte de {nodo}: {len(vms)} VMs",
+            details={"node": nodo, "vm_count": len(vms)}
+        ))
+        high_load_vms = [vm["name"] for vm in vms if vm["ram"] > 90.0]
+        if high_load_vms:
+            logs.append(AgentLog(
+                agent_name="Cerebro",
+                level="WARNING",
+                message=f"Alta carga de RAM detectada en: {', '.join(high_load_vms)}"[:255],
+                details={"vms": high_load_vms}
+            ))
+        AgentLog.objects.bulk_create(logs)
+        # bulk_create no emite post_save: publicar en el canal en vivo de la consola
+        publish_logs_on_commit(logs)
+
+        return len(vms)
 
     @sync_to_async
     def log_db(self, msg, level='INFO', details=None):
@@ -129,39 +158,28 @@ class CerebroAgent(Agent):
                     
                     if "node" in data and "vms" in data:
                         nodo = data["node"]
-                        
-                        # Guardar Nodo
-                        await self.agent.guardar_metrica_servidor(
-                            nodo, 
-                            float(data["cpu"]), 
-                            float(data["ram"]), 
-                            int(data["uptime"])
+                        # Los reportes del colector ya están guardados en BD
+                        persistir = not data.get("persisted", False)
+                        vms = [
+                            {
+                                "name": vm["name"],
+                                "cpu": float(vm["cpu"]),
+                                "ram": float(vm["ram"]),
+                                "status": vm["status"]
+                            }
+                            for vm in data["vms"]
+                        ]
+
+                        # Nodo + VMs + anomalías en un solo salto de hilo
+                        count = await self.agent.procesar_reporte(
+                            nodo,
+                            float(data["cpu"]),
+                            float(data["ram"]),
+                            int(data["uptime"]),
+                            vms,
+                            persistir
                         )
-                        print(f"💾 NODO GUARDADO: {nodo}")
-                        
-                        # Guardar VMs
-                        vms = data["vms"]
-                        count = 0
-                        high_load_vms = []
-
-                        for vm in vms:
-                            await self.agent.guardar_metrica_vm(
-                                vm["name"],
-                                nodo,
-                                float(vm["cpu"]),
-                                float(vm["ram"]),
-                                vm["status"]
-                            )
-                            count += 1
-                            if float(vm["ram"]) > 90.0:
-                                high_load_vms.append(vm["name"])
-                        
-                        # Log simple de resumen
-                        await self.agent.log_db(f"Procesado reporte de {nodo}: {count} VMs", "INFO", {"node": nodo, "vm_count": count})
-                        
-                        # Log de alerta si hay carga
-                        if high_load_vms:
-                             await self.agent.log_db(f"Alta carga de RAM detectada en: {', '.join(high_load_vms)}", "WARNING", {"vms": high_load_vms})
+                        print(f"💾 REPORTE PROCESADO: {nodo} ({count} VMs)")
 
                         return 
 
@@ -253,35 +271,84 @@ class CerebroAgent(Agent):
                     await self.agent.log_db(f"Error en Watchdog para {vm.nombre}: {e}", "WARNING")
 
     class ComportamientoPrediccion(PeriodicBehaviour):
+        """
+        Los ajustes SARIMA se ejecutan en el worker de Celery de la cola
+        'forecasting' (submodulos.tasks.schedule_forecasts); el agente solo
+        registra las ejecuciones que han terminado desde la última revisión.
+        """
+
+        async def on_start(self):
+            self.ultima_revision = timezone.now()
+
+        @staticmethod
+        def ejecuciones_terminadas(desde):
+            try:
+                return list(ForecastRun.objects.filter(
+                    finished_at__gt=desde
+                ).exclude(status='running').order_by('finished_at'))
+            finally:
+                close_old_connections()
+
         async def run(self):
-            print("CEREBRO: Iniciando ciclo de prediccion SARIMA...")
             try:
-                # 1. Predicciones de Servidores
-                # Usamos sync_to_async para operaciones de BD bloqueantes
-                servidores = await sync_to_async(list)(ProxmoxServer.objects.filter(is_active=True))
-                
-                for server in servidores:
-                    print(f"   ↳ Prediciendo para servidor: {server.name}")
-                    # Ejecutar entrenamiento en hilo aparte para no bloquear el loop
-                    await sync_to_async(train_and_predict_server)(server.id)
-                
-                # 2. Predicciones de VMs (Anomalías)
-                # Solo predecimos para VMs monitoreadas para ahorrar recursos
-                vms = await sync_to_async(list)(MaquinaVirtual.objects.filter(is_monitored=True))
-                
-                for vm in vms:
-                    # Opcional: Solo predecir si tiene suficientes datos (se maneja en logic)
-                    await sync_to_async(train_and_predict_vm)(vm.vm_id)
+                ejecuciones = await sync_to_async(self.ejecuciones_terminadas)(self.ultima_revision)
+                if not ejecuciones:
+                    return
+                self.ultima_revision = ejecuciones[-1].finished_at
 
-                await self.agent.log_db("Ciclo de predicción completado", "INFO")
-                print("CEREBRO: Predicciones generadas exitosamente.")
+                fallidas = [e for e in ejecuciones if e.status == 'failed']
+                entidades = sum(e.entities for e in ejecuciones)
+                fallos = sum(e.failures for e in ejecuciones)
+                predicciones = sum(e.predictions for e in ejecuciones)
+
+                nivel = "WARNING" if fallidas or fallos else "INFO"
+                await self.agent.log_db(
+                    f"Predicciones actualizadas: {len(ejecuciones)} ejecuciones, {entidades} entidades, "
+                    f"{fallos} fallos, {len(fallidas)} ejecuciones fallidas",
+                    nivel,
+                    {
+                        'runs': [e.pk for e in ejecuciones],
+                        'failed_runs': [e.pk for e in fallidas],
+                        'entities': entidades,
+                        'failures': fallos,
+                        'predictions': predicciones,
+                    },
+                )
 
             except Exception as e:
-                print(f"Error en ciclo de prediccion: {e}")
+                print(f"Error leyendo ejecuciones de predicción: {e}")
                 await self.agent.log_db(f"Error en predicción: {e}", "WARNING")
 
+    class ComportamientoDeteccion(PeriodicBehaviour):
+        """Escribe las anomalías del detector en línea y guarda su estado periódicamente"""
+
+        async def on_start(self):
+            self.ultimo_checkpoint = time.monotonic()
+
+        async def run(self):
+            detector = self.agent.detector
+            try:
+                await sync_to_async(detector.flush)("Cerebro")
+                intervalo = getattr(settings, 'ANOMALY_CHECKPOINT_SECONDS', 300)
+                if time.monotonic() - self.ultimo_checkpoint >= intervalo:
+                    await sync_to_async(detector.checkpoint)()
+                    self.ultimo_checkpoint = time.monotonic()
+            except Exception as e:
+                print(f"Error en detector de anomalías: {e}")
+
+        async def on_end(self):
+            await sync_to_async(self.agent.detector.flush)("Cerebro")
+            await sync_to_async(self.agent.detector.checkpoint)()
+
     async def setup(self):
         print("CEREBRO: Iniciando sistema de almacenamiento...")
+
+        # Línea base del detector de anomalías guardada en el último checkpoint
+        try:
+            series = await sync_to_async(self.detector.load)()
+            print(f"CEREBRO: Detector de anomalías con {series} series restauradas")
+        except Exception as e:
+            print(f"CEREBRO: No se pudo restaurar el detector de anomalías: {e}")
         
         # Configuración explícita de seguridad (Redundancia anti-fallos)
         if hasattr(self, 'client') and self.client:
@@ -297,7 +364,11 @@ class CerebroAgent(Agent):
         w = self.ComportamientoWatchdog(period=30)
         self.add_behaviour(w)
 
-        # Comportamiento Predicción (cada 1 hora = 3600s)
-        # Inicia inmediatamente al arrancar y luego repite
-        p = self.ComportamientoPrediccion(period=3600)
+        # Comportamiento Detección (escritura de anomalías cada 15 segundos)
+        d = self.ComportamientoDeteccion(period=15)
+        self.add_behaviour(d)
+
+        # Comportamiento Predicción (lectura de resultados cada 5 minutos;
+        # el cálculo lo hace el worker de Celery de la cola 'forecasting')
+        p = self.ComportamientoPrediccion(period=300)
         self.add_behaviour(p)
\ No newline at end of file
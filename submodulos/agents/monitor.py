@@ -8,6 +8,7 @@ from spade.behaviour import CyclicBehaviour
 from spade.message import Message
 from proxmoxer import ProxmoxAPI
 import urllib3
+from asgiref.sync import sync_to_async
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -27,10 +28,78 @@ class MonitorAgent(Agent):
         self.proxmox_ip = proxmox_ip
         self.proxmox_user = proxmox_user
         self.proxmox_pass = proxmox_pass
-        
+        self.ultimo_snapshot = None
+
+    def leer_snapshot(self):
+        """
+        Snapshot publicado por el colector para este servidor (None si no hay).
+
+        Las vistas también llenan esa clave (get_cached_snapshot) sin persistir
+        métricas, así que solo se usa con el latido del colector vigente: si el
+        colector está caído el agente recolecta y guarda por su cuenta.
+        """
+        from submodulos.collector import collector_is_alive
+        from submodulos.models import ProxmoxServer
+        from utils.proxmox_cache import peek
+
+        if not collector_is_alive():
+            return None
+        server = ProxmoxServer.objects.filter(hostname=self.proxmox_ip).first()
+        if not server:
+            return None
+        return peek(server.id, None, 'snapshot')
+
     class ComportamientoVigilancia(CyclicBehaviour):
+        async def enviar_snapshot(self, snapshot):
+            """Envía al cerebro el reporte de cada nodo a partir del snapshot del colector"""
+            ip = self.agent.proxmox_ip
+            for node in snapshot.nodes:
+                if not node.online:
+                    continue
+                vms_data = [
+                    {
+                        'name': vm.name,
+                        'cpu': vm.cpu,
+                        'ram': vm.mem_percent,
+                        'status': vm.status
+                    }
+                    for vm in snapshot.guests_on(node.name, 'qemu')
+                ]
+                # El colector ya guardó estas métricas: el cerebro solo las analiza
+                payload = {
+                    "node": node.name,
+                    "cpu": node.cpu,
+                    "ram": node.mem_percent,
+                    "uptime": node.uptime,
+                    "vms": vms_data,
+                    "persisted": True
+                }
+                print(f"({ip} -> {node.name}) ENVIANDO SNAPSHOT (Con {len(vms_data)} VMs)")
+                msg = Message(to="cerebro@sentinelnexus.local")
+                msg.set_metadata("performative", "inform")
+                msg.body = json.dumps(payload)
+                await self.send(msg)
+
         async def run(self):
-            # Recolección de métricas
+            # Consumir el snapshot del colector si está disponible
+            try:
+                snapshot = await sync_to_async(self.agent.leer_snapshot)()
+            except Exception as e:
+                print(f"[{self.agent.proxmox_ip}] No se pudo leer el snapshot del colector: {e}")
+                snapshot = None
+
+            if snapshot is not None:
+                # No reenviar el mismo snapshot dos veces
+                if snapshot.collected_at != self.agent.ultimo_snapshot:
+                    self.agent.ultimo_snapshot = snapshot.collected_at
+                    try:
+                        await self.enviar_snapshot(snapshot)
+                    except Exception as e:
+                        print(f"ERROR ENVIANDO SNAPSHOT ({self.agent.proxmox_ip}): {e}")
+                await asyncio.sleep(15)
+                return
+
+            # Sin colector: recolección directa de métricas
             try:
                 # Acceder a las credenciales desde el agente
                 ip = self.agent.proxmox_ip
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SubmodulosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'submodulos'
+
+    def ready(self):
+        # Publicación de AgentLog en el canal de eventos en vivo
+        from submodulos import signals  # noqa: F401
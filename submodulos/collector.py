@@ -0,0 +1,281 @@
+"""
+Colector de métricas Proxmox.
+
+Servicio asyncio de larga duración que es el único que sondea los clusters:
+en cada intervalo obtiene el snapshot de cada servidor (una llamada a
+/cluster/resources más el estado de cada nodo online), lo publica en la caché
+compartida y, a su propio ritmo, lo guarda en ServerMetric/VMMetric.
+
+Las vistas (utils.proxmox_cache), el MonitorAgent y la tarea Celery
+`monitor_all_proxmox_servers` consumen esos snapshots; la tarea solo sondea
+por su cuenta si el latido del colector está caducado. Cada snapshot se
+emite además como evento en vivo a los dashboards conectados (utils.live).
+
+Se arranca con: python manage.py iniciar_colector
+"""
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from submodulos.logic.cluster_snapshot import collect_cluster_snapshot
+from utils import live, proxmox_cache
+from utils.write_buffer import get_buffer, flush_all
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_KEY = 'collector:heartbeat'
+DEFAULT_INTERVAL = 15          # segundos entre sondeos
+DEFAULT_PERSIST_INTERVAL = 60  # segundos entre escrituras en las tablas de métricas
+
+
+def get_interval():
+    return getattr(settings, 'COLLECTOR_INTERVAL', DEFAULT_INTERVAL)
+
+
+def get_persist_interval():
+    return getattr(settings, 'COLLECTOR_PERSIST_INTERVAL', DEFAULT_PERSIST_INTERVAL)
+
+
+def collector_is_alive():
+    """True si el colector ha completado un ciclo recientemente"""
+    try:
+        last_beat = cache.get(HEARTBEAT_KEY)
+    except Exception:
+        return False
+    return last_beat is not None and time.time() - last_beat < get_interval() * 3
+
+
+def _heartbeat():
+    try:
+        cache.set(HEARTBEAT_KEY, time.time(), timeout=get_interval() * 3)
+    except Exception as e:
+        logger.warning(f"No se pudo publicar el latido del colector: {e}")
+
+
+def get_targets():
+    """
+    Servidores a sondear: uno por cluster configurado.
+
+    proxmox_manager indexa el mismo servidor por ID y por hostname, así que se
+    deduplica por ID de BD. Devuelve tuplas (server_key, node_key, config).
+    """
+    from utils.proxmox_manager import proxmox_manager
+
+    targets = []
+    seen = set()
+    for node_key, node_config in proxmox_manager.reload_nodes().items():
+        db_id = node_config.get('db_id')
+        server_key = str(db_id) if db_id is not None else str(node_key)
+        if server_key in seen:
+            continue
+        seen.add(server_key)
+        targets.append((server_key, node_key, node_config))
+    return targets
+
+
+def poll_target(server_key, node_key, timeout=10, deadline=None):
+    """
+    Sondea un cluster y publica snapshot y estado de nodos en la caché.
+
+    Args:
+        timeout (int): timeout de cada llamada HTTP a Proxmox.
+        deadline (float): instante (monotonic) a partir del cual no se piden
+            más estados de nodo, para que el hilo termine a tiempo.
+
+    Returns:
+        ClusterSnapshot
+    """
+    from utils.proxmox_manager import proxmox_manager
+
+    proxmox = proxmox_manager.get_connection(node_key, timeout=timeout)
+    snapshot = collect_cluster_snapshot(proxmox, server_key)
+
+    # El snapshot publicado vive dos intervalos: los consumidores nunca lo cargan en frío
+    ttl = get_interval() * 2
+    proxmox_cache.publish(server_key, None, 'snapshot', snapshot, ttl=ttl)
+    # Un evento por ciclo para todos los dashboards conectados (utils.live)
+    live.publish('snapshot', live.snapshot_payload(snapshot), key=server_key)
+
+    for node in snapshot.nodes:
+        if not node.online:
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            logger.warning(f"Estado de nodos de {server_key} incompleto: plazo agotado")
+            break
+        try:
+            status = proxmox.nodes(node.name).status.get()
+            proxmox_cache.publish(server_key, node.name, 'node_status', status, ttl=ttl)
+        except Exception as e:
+            logger.warning(f"Estado de nodo {node.name} ({server_key}) no disponible: {e}")
+
+    return snapshot
+
+
+def persist_snapshot(server_key, node_config, snapshot):
+    """Encola métricas de nodos e invitados encendidos de un snapshot (buffer de escritura)"""
+    from submodulos.models import ServerMetric, VMMetric, ProxmoxServer, MaquinaVirtual
+
+    server = None
+    vms_db = {}
+    db_id = node_config.get('db_id')
+    if db_id is not None:
+        server = ProxmoxServer.objects.filter(id=db_id).first()
+        # VMs registradas del servidor indexadas por (nodo, vmid)
+        for vm_obj in MaquinaVirtual.objects.filter(nodo__proxmox_server_id=db_id).select_related('nodo'):
+            vms_db[(vm_obj.nodo.nombre, vm_obj.vmid)] = vm_obj
+
+    get_buffer(ServerMetric).extend([
+        ServerMetric(
+            server=server,
+            cpu_usage=node.cpu,
+            ram_usage=node.mem_percent,
+            disk_usage=node.disk_percent,
+            uptime=node.uptime,
+        )
+        for node in snapshot.nodes if node.online
+    ])
+
+    get_buffer(VMMetric).extend([
+        VMMetric(
+            vm=vms_db.get((guest.node, int(guest.vmid))),
+            vm_name=guest.name,
+            server_origin=guest.node,
+            cpu_usage=guest.cpu,
+            ram_usage=guest.mem_percent,
+            status=guest.status,
+        )
+        for guest in snapshot.running_guests
+    ])
+
+
+def collect_target(server_key, node_key, node_config, persist=False, timeout=None):
+    """
+    Sondea (y opcionalmente persiste) un servidor desde un hilo.
+
+    Con `timeout`, cada llamada HTTP usa ese timeout y no se empiezan llamadas
+    nuevas pasado ese plazo: el hilo termina aunque el servidor no responda.
+    """
+    try:
+        if timeout:
+            snapshot = poll_target(server_key, node_key, timeout=timeout, deadline=time.monotonic() + timeout)
+        else:
+            snapshot = poll_target(server_key, node_key)
+        if persist:
+            persist_snapshot(server_key, node_config, snapshot)
+        return snapshot
+    finally:
+        close_old_connections()
+
+
+def collect_once(persist=True):
+    """
+    Ciclo de recolección síncrono (p.ej. desde Celery cuando el colector no está activo).
+
+    Returns:
+        list[str]: resumen por servidor.
+    """
+    from utils.fanout import fan_out
+
+    targets = get_targets()
+    summary = []
+    for result in fan_out(targets, lambda t: collect_target(*t, persist=persist)):
+        server_key, node_key, node_config = result.item
+        name = node_config.get('name', node_key)
+        if result.ok:
+            summary.append(f"✓ {name} ({len(result.value.guests)} invitados)")
+        else:
+            logger.error(f"Error monitoreando {name}: {result.error_message}")
+            summary.append(f"✗ {name}: {result.error_message}")
+    return summary
+
+
+class CollectorService:
+    """Bucle asyncio que sondea todos los clusters una vez por intervalo"""
+
+    def __init__(self, interval=None, persist_interval=None):
+        self.interval = interval or get_interval()
+        self.persist_interval = persist_interval or get_persist_interval()
+        self._last_persist = 0.0
+        self._stopping = asyncio.Event()
+        self._in_flight = {}   # server_key -> recolección cuyo hilo sigue en marcha
+
+    def stop(self):
+        self._stopping.set()
+
+    def install_signal_handlers(self):
+        """SIGTERM (systemctl stop) y SIGINT terminan el ciclo en curso y vacían el buffer"""
+        import signal
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows o hilo no principal: solo queda KeyboardInterrupt
+                pass
+
+    def _collection_done(self, server_key, task):
+        self._in_flight.pop(server_key, None)
+        # Recoge el error de un hilo que terminó después del plazo (sin aviso de asyncio)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Colector: recolección tardía de {server_key} falló: {task.exception()}")
+
+    async def _collect(self, target, persist):
+        server_key, node_key, node_config = target
+        deadline = getattr(settings, 'FANOUT_DEADLINE', 12)
+
+        # wait_for no detiene el hilo: mientras el anterior siga vivo no se lanza otro
+        if server_key in self._in_flight:
+            logger.warning(f"Colector: {node_config.get('name', node_key)} aún procesa el ciclo anterior, se omite")
+            return False
+
+        task = asyncio.ensure_future(
+            asyncio.to_thread(collect_target, server_key, node_key, node_config, persist, deadline)
+        )
+        self._in_flight[server_key] = task
+        task.add_done_callback(lambda t: self._collection_done(server_key, t))
+        try:
+            # shield: al vencer el plazo solo se deja de esperar; la tarea sigue ocupando su hueco
+            await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+            return True
+        except Exception as e:
+            # Si no responde se descarta su conexión para forzar un nuevo login
+            from utils.proxmox_manager import connection_registry
+            connection_registry.invalidate(server_key)
+            logger.warning(f"Colector: {node_config.get('name', node_key)} sin datos ({e or 'timeout'})")
+            return False
+
+    async def run_cycle(self):
+        targets = await asyncio.to_thread(get_targets)
+        persist = time.monotonic() - self._last_persist >= self.persist_interval
+        results = await asyncio.gather(*(self._collect(t, persist) for t in targets))
+        if persist:
+            self._last_persist = time.monotonic()
+        _heartbeat()
+        return sum(1 for ok in results if ok), len(targets)
+
+    async def run(self):
+        logger.info(f"Colector iniciado (intervalo {self.interval}s, persistencia {self.persist_interval}s)")
+        try:
+            while not self._stopping.is_set():
+                started = time.monotonic()
+                try:
+                    ok, total = await self.run_cycle()
+                    logger.debug(f"Ciclo de colector: {ok}/{total} servidores")
+                except Exception as e:
+                    logger.error(f"Error en ciclo de colector: {e}")
+
+                # Ritmo fijo: el siguiente ciclo empieza un intervalo después del anterior
+                remaining = self.interval - (time.monotonic() - started)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=max(remaining, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Las métricas pendientes del buffer se escriben antes de salir
+            flush_all()
+            logger.info("Colector detenido")
@@ -0,0 +1,278 @@
+"""
+Planificación de capacidad por nodo.
+
+En cada sincronización con Proxmox se toma una muestra de cada RecursoFisico
+(CPU, RAM, almacenamiento): capacidad total, uso actual y lo asignado a las
+VMs (última AsignacionRecursosInicial de cada VM). La muestra actualiza en
+CapacityForecast un nivel y una tendencia por hora (Holt con intervalos
+irregulares), de modo que cada sincronización cuesta O(1) por recurso sin
+releer el histórico.
+
+El tiempo hasta el agotamiento combina:
+
+- Uso: para CPU y RAM, la tendencia de las predicciones SARIMA del servidor
+  del nodo (ServerPrediction, en %); si no hay predicciones, la tendencia
+  observada. El almacenamiento solo tiene la observada.
+- Asignación: la tendencia de lo asignado frente a la capacidad permitida
+  (capacidad_total × CAPACITY_OVERCOMMIT del tipo de recurso).
+
+Se guarda el más cercano de los dos y qué lo limita.
+
+Configuración (settings):
+    CAPACITY_LEVEL_ALPHA: peso de la muestra nueva en el nivel
+    CAPACITY_TREND_BETA: peso de la pendiente nueva en la tendencia
+    CAPACITY_MIN_INTERVAL_SECONDS: separación mínima entre muestras que actualizan la tendencia
+    CAPACITY_MAX_DAYS: horizonte máximo; más allá no se considera agotamiento
+    CAPACITY_OVERCOMMIT: sobreasignación permitida por tipo de recurso
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CAPACITY_LEVEL_ALPHA': 0.3,
+    'CAPACITY_TREND_BETA': 0.1,
+    'CAPACITY_MIN_INTERVAL_SECONDS': 300,
+    'CAPACITY_MAX_DAYS': 365,
+    'CAPACITY_OVERCOMMIT': {'CPU': 4.0, 'RAM': 1.0, 'Almacenamiento': 1.0},
+}
+
+# Tipo de recurso -> métrica de ServerPrediction que lo predice
+PREDICTED_METRICS = {
+    'CPU': 'predicted_cpu_usage',
+    'RAM': 'predicted_memory_usage',
+}
+
+UPDATE_FIELDS = [
+    'capacidad_total', 'usado', 'asignado', 'usage_level', 'usage_trend',
+    'allocation_level', 'allocation_trend', 'predicted_trend', 'samples',
+    'last_sample_at', 'hours_to_exhaustion', 'hours_to_overcommit',
+    'exhaustion_at', 'limiting', 'updated_at',
+]
+
+
+def _setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+def _holt(level, trend, value, hours, alpha, beta):
+    """Actualiza nivel y tendencia (por hora) con una muestra tomada `hours` después de la anterior"""
+    if level is None:
+        return value, 0.0
+    if hours <= 0:
+        return alpha * value + (1 - alpha) * level, trend
+    new_level = alpha * value + (1 - alpha) * (level + trend * hours)
+    trend = beta * (new_level - level) / hours + (1 - beta) * trend
+    return new_level, trend
+
+
+def _hours_to(limit, level, trend, max_hours):
+    """Horas hasta que `level` alcanza `limit` con la tendencia dada (None si no ocurre en el horizonte)"""
+    if level is None or limit <= 0:
+        return None
+    if level >= limit:
+        return 0.0
+    if trend <= 0:
+        return None
+    hours = (limit - level) / trend
+    return hours if hours <= max_hours else None
+
+
+def _predicted_trends(server_ids, now):
+    """
+    Tendencia de las predicciones SARIMA vigentes por servidor y métrica.
+
+    Returns:
+        dict: {(server_id, campo): (pendiente %/h, horas hasta 100% o None)}
+    """
+    from submodulos.models import ServerPrediction
+    from submodulos.logic.forecasting import complete_predictions
+
+    series = {}
+    for server_id, ts, cpu, memory in complete_predictions(ServerPrediction.objects.filter(
+        server_id__in=server_ids, timestamp__gte=now,
+    )).order_by('server_id', 'timestamp').values_list(
+        'server_id', 'timestamp', 'predicted_cpu_usage', 'predicted_memory_usage'
+    ):
+        hours = (ts - now).total_seconds() / 3600
+        series.setdefault((server_id, 'predicted_cpu_usage'), []).append((hours, cpu))
+        series.setdefault((server_id, 'predicted_memory_usage'), []).append((hours, memory))
+
+    trends = {}
+    for key, points in series.items():
+        if len(points) < 2:
+            continue
+        # Pendiente por mínimos cuadrados sobre el horizonte
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        sxx = sum((x - mean_x) ** 2 for x, _ in points)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx if sxx else 0.0
+
+        crossing = next((x for x, y in points if y >= 100), None)
+        if crossing is None and slope > 0:
+            last_x, last_y = points[-1]
+            crossing = last_x + (100 - last_y) / slope
+        trends[key] = (slope, crossing)
+    return trends
+
+
+def _allocations(resource_ids):
+    """Total asignado por recurso: última asignación de cada VM (la sincronización añade una por pasada)"""
+    from submodulos.models import AsignacionRecursosInicial
+
+    totals = {}
+    for recurso_id, amount in (
+        AsignacionRecursosInicial.objects
+        .filter(recurso_id__in=resource_ids)
+        .order_by('maquina_virtual_id', 'recurso_id', '-fecha_asignacion')
+        .distinct('maquina_virtual_id', 'recurso_id')
+        .values_list('recurso_id', 'cantidad_asignada')
+    ):
+        totals[recurso_id] = totals.get(recurso_id, 0.0) + float(amount)
+    return totals
+
+
+def update_capacity(server=None, now=None):
+    """
+    Incorpora la muestra actual de los recursos (de un servidor o de todos) y
+    recalcula su proyección.
+
+    Returns:
+        int: recursos actualizados.
+    """
+    from submodulos.models import CapacityForecast, RecursoFisico
+
+    now = now or timezone.now()
+    resources = RecursoFisico.objects.filter(estado='activo').select_related('nodo', 'tipo_recurso')
+    if server is not None:
+        resources = resources.filter(nodo__proxmox_server=server)
+    resources = list(resources)
+    if not resources:
+        return 0
+
+    ids = [r.recurso_id for r in resources]
+    previous = {f.recurso_id: f for f in CapacityForecast.objects.filter(recurso_id__in=ids)}
+    allocated = _allocations(ids)
+    predicted = _predicted_trends({r.nodo.proxmox_server_id for r in resources if r.nodo.proxmox_server_id}, now)
+
+    alpha = _setting('CAPACITY_LEVEL_ALPHA')
+    beta = _setting('CAPACITY_TREND_BETA')
+    min_interval = _setting('CAPACITY_MIN_INTERVAL_SECONDS')
+    max_hours = _setting('CAPACITY_MAX_DAYS') * 24
+    overcommit = {**DEFAULTS['CAPACITY_OVERCOMMIT'], **_setting('CAPACITY_OVERCOMMIT')}
+
+    forecasts = []
+    for resource in resources:
+        total = float(resource.capacidad_total)
+        used = max(total - float(resource.capacidad_disponible), 0.0)
+        assigned = allocated.get(resource.recurso_id, 0.0)
+        kind = resource.tipo_recurso.nombre
+
+        forecast = previous.get(resource.recurso_id) or CapacityForecast(recurso=resource)
+        hours = 0.0
+        if forecast.last_sample_at:
+            hours = (now - forecast.last_sample_at).total_seconds() / 3600
+            if hours * 3600 < min_interval:
+                hours = 0.0  # Muestra demasiado próxima: solo ajusta el nivel
+        forecast.usage_level, forecast.usage_trend = _holt(
+            forecast.usage_level, forecast.usage_trend, used, hours, alpha, beta)
+        forecast.allocation_level, forecast.allocation_trend = _holt(
+            forecast.allocation_level, forecast.allocation_trend, assigned, hours, alpha, beta)
+        if hours or not forecast.last_sample_at:
+            forecast.last_sample_at = now
+            forecast.samples += 1
+        forecast.capacidad_total, forecast.usado, forecast.asignado = total, used, assigned
+
+        # Uso: predicción SARIMA del servidor si la hay, si no la tendencia observada
+        trend = predicted.get((resource.nodo.proxmox_server_id, PREDICTED_METRICS.get(kind)))
+        if trend is not None:
+            slope, crossing = trend
+            forecast.predicted_trend = slope / 100 * total
+            forecast.hours_to_exhaustion = crossing if crossing is not None and crossing <= max_hours else None
+            usage_source = 'prediccion'
+        else:
+            forecast.predicted_trend = None
+            forecast.hours_to_exhaustion = _hours_to(total, forecast.usage_level, forecast.usage_trend, max_hours)
+            usage_source = 'uso'
+
+        forecast.hours_to_overcommit = _hours_to(
+            total * overcommit.get(kind, 1.0), forecast.allocation_level, forecast.allocation_trend, max_hours)
+
+        candidates = [(h, source) for h, source in (
+            (forecast.hours_to_exhaustion, usage_source),
+            (forecast.hours_to_overcommit, 'asignacion'),
+        ) if h is not None]
+        if candidates:
+            hours_left, forecast.limiting = min(candidates)
+            forecast.exhaustion_at = now + timedelta(hours=hours_left)
+        else:
+            forecast.exhaustion_at, forecast.limiting = None, ''
+        forecast.updated_at = now
+        forecasts.append(forecast)
+
+    CapacityForecast.objects.bulk_create(
+        forecasts,
+        update_conflicts=True,
+        unique_fields=['recurso'],
+        update_fields=UPDATE_FIELDS,
+    )
+    return len(forecasts)
+
+
+def refresh_after_sync(server=None):
+    """Punto de entrada de la sincronización: un fallo aquí no debe romperla"""
+    try:
+        updated = update_capacity(server)
+        logger.info(f"Capacidad actualizada: {updated} recursos")
+    except Exception as e:
+        logger.warning(f"No se pudo actualizar la planificación de capacidad: {e}")
+
+
+def summarize(node=None, now=None):
+    """
+    Proyecciones de capacidad, las más próximas a agotarse primero.
+
+    Returns:
+        list: un dict por recurso.
+    """
+    from django.db.models import F
+    from submodulos.models import CapacityForecast
+
+    now = now or timezone.now()
+    queryset = CapacityForecast.objects.select_related('recurso__nodo', 'recurso__tipo_recurso')
+    if node:
+        queryset = queryset.filter(recurso__nodo__nombre=node)
+
+    rows = []
+    for forecast in queryset.order_by(F('exhaustion_at').asc(nulls_last=True), 'recurso__nodo__nombre'):
+        resource = forecast.recurso
+        total = forecast.capacidad_total
+        rows.append({
+            'node': resource.nodo.nombre,
+            'resource': resource.tipo_recurso.nombre,
+            'unit': resource.tipo_recurso.unidad_medida,
+            'total': round(total, 2),
+            'used': round(forecast.usado, 2),
+            'allocated': round(forecast.asignado, 2),
+            'used_pct': round(forecast.usado / total * 100, 1) if total else None,
+            'allocated_pct': round(forecast.asignado / total * 100, 1) if total else None,
+            'usage_trend_per_day': round((forecast.predicted_trend if forecast.predicted_trend is not None
+                                          else forecast.usage_trend) * 24, 3),
+            'allocation_trend_per_day': round(forecast.allocation_trend * 24, 3),
+            'days_to_exhaustion': round(forecast.hours_to_exhaustion / 24, 1)
+            if forecast.hours_to_exhaustion is not None else None,
+            'days_to_overcommit': round(forecast.hours_to_overcommit / 24, 1)
+            if forecast.hours_to_overcommit is not None else None,
+            'exhaustion_at': forecast.exhaustion_at,
+            'days_left': round((forecast.exhaustion_at - now).total_seconds() / 86400, 1)
+            if forecast.exhaustion_at else None,
+            'limiting': forecast.limiting,
+            'samples': forecast.samples,
+            'updated_at': forecast.updated_at,
+        })
+    return rows
@@ -0,0 +1,259 @@
+"""
+Snapshot de un cluster Proxmox a partir de una única llamada a /cluster/resources.
+
+En lugar de listar qemu/lxc por nodo y pedir status.current (más rrddata y
+config) por cada invitado, se obtiene todo el inventario (nodos, VMs,
+contenedores y almacenamiento) en una sola petición por cluster y se
+normaliza en estructuras tipadas que consumen las vistas.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+
+from submodulos.proxmox_service import ProxmoxService
+
+logger = logging.getLogger(__name__)
+
+
+def _pct(used, total):
+    """Porcentaje seguro (0 si no hay total)"""
+    if not total or total <= 0:
+        return 0.0
+    return (used or 0) / total * 100
+
+
+@dataclass
+class NodeSnapshot:
+    name: str
+    status: str = 'unknown'
+    cpu: float = 0.0          # Porcentaje 0-100
+    maxcpu: int = 0
+    mem: int = 0              # Bytes
+    maxmem: int = 0
+    disk: int = 0             # Bytes (rootfs)
+    maxdisk: int = 0
+    uptime: int = 0
+
+    @property
+    def online(self):
+        return self.status == 'online'
+
+    @property
+    def mem_percent(self):
+        return _pct(self.mem, self.maxmem)
+
+    @property
+    def disk_percent(self):
+        return _pct(self.disk, self.maxdisk)
+
+
+@dataclass
+class GuestSnapshot:
+    vmid: int
+    name: str
+    node: str
+    type: str                 # 'qemu' o 'lxc'
+    status: str = 'unknown'
+    template: int = 0
+    cpu: float = 0.0          # Porcentaje 0-100
+    maxcpu: int = 0
+    mem: int = 0              # Bytes
+    maxmem: int = 0
+    disk: int = 0             # Bytes
+    maxdisk: int = 0
+    netin: int = 0            # Bytes acumulados
+    netout: int = 0
+    diskread: int = 0
+    diskwrite: int = 0
+    uptime: int = 0
+
+    @property
+    def running(self):
+        return self.status == 'running'
+
+    @property
+    def mem_percent(self):
+        return _pct(self.mem, self.maxmem)
+
+    @property
+    def disk_percent(self):
+        return _pct(self.disk, self.maxdisk)
+
+
+@dataclass
+class StorageSnapshot:
+    storage: str
+    node: str
+    status: str = 'unknown'
+    plugintype: str = ''
+    shared: bool = False
+    disk: int = 0             # Bytes usados
+    maxdisk: int = 0
+
+    @property
+    def active(self):
+        return self.status == 'available'
+
+    @property
+    def disk_percent(self):
+        return _pct(self.disk, self.maxdisk)
+
+
+@dataclass
+class ClusterSnapshot:
+    server_key: str
+    collected_at: float = field(default_factory=time.time)
+    nodes: list = field(default_factory=list)
+    guests: list = field(default_factory=list)
+    storage: list = field(default_factory=list)
+
+    def node(self, name):
+        """Devuelve el nodo `name` o None"""
+        for node in self.nodes:
+            if node.name == name:
+                return node
+        return None
+
+    def node_names(self):
+        return [n.name for n in self.nodes]
+
+    def resolve_node(self, preferred=None):
+        """Nombre del nodo configurado si existe en el cluster, si no el primero"""
+        if preferred and self.node(preferred):
+            return preferred
+        return self.nodes[0].name if self.nodes else None
+
+    def guests_on(self, node_name, vm_type=None):
+        """Invitados de un nodo (opcionalmente filtrados por tipo)"""
+        return [
+            g for g in self.guests
+            if g.node == node_name and (vm_type is None or g.type == vm_type)
+        ]
+
+    def guest(self, node_name, vmid):
+        for g in self.guests:
+            if g.node == node_name and int(g.vmid) == int(vmid):
+                return g
+        return None
+
+    @property
+    def running_guests(self):
+        return [g for g in self.guests if g.running]
+
+
+def _num(item, key, default=0):
+    """Lee un valor numérico de la respuesta tolerando None"""
+    value = item.get(key)
+    return default if value is None else value
+
+
+def build_snapshot(server_key, resources):
+    """Normaliza la lista de /cluster/resources en un ClusterSnapshot"""
+    snapshot = ClusterSnapshot(server_key=str(server_key))
+
+    for item in resources or []:
+        kind = item.get('type')
+        if kind == 'node':
+            snapshot.nodes.append(NodeSnapshot(
+                name=item.get('node'),
+                status=item.get('status', 'unknown'),
+                cpu=_num(item, 'cpu') * 100,
+                maxcpu=_num(item, 'maxcpu'),
+                mem=_num(item, 'mem'),
+                maxmem=_num(item, 'maxmem'),
+                disk=_num(item, 'disk'),
+                maxdisk=_num(item, 'maxdisk'),
+                uptime=_num(item, 'uptime'),
+            ))
+        elif kind in ('qemu', 'lxc'):
+            vmid = item.get('vmid')
+            default_name = f"VM {vmid}" if kind == 'qemu' else f"CT {vmid}"
+            snapshot.guests.append(GuestSnapshot(
+                vmid=vmid,
+                name=item.get('name') or default_name,
+                node=item.get('node'),
+                type=kind,
+                status=item.get('status', 'unknown'),
+                template=_num(item, 'template'),
+                cpu=_num(item, 'cpu') * 100,
+                maxcpu=_num(item, 'maxcpu'),
+                mem=_num(item, 'mem'),
+                maxmem=_num(item, 'maxmem'),
+                disk=_num(item, 'disk'),
+                maxdisk=_num(item, 'maxdisk'),
+                netin=_num(item, 'netin'),
+                netout=_num(item, 'netout'),
+                diskread=_num(item, 'diskread'),
+                diskwrite=_num(item, 'diskwrite'),
+                uptime=_num(item, 'uptime'),
+            ))
+        elif kind == 'storage':
+            snapshot.storage.append(StorageSnapshot(
+                storage=item.get('storage'),
+                node=item.get('node'),
+                status=item.get('status', 'unknown'),
+                plugintype=item.get('plugintype', ''),
+                shared=bool(item.get('shared', 0)),
+                disk=_num(item, 'disk'),
+                maxdisk=_num(item, 'maxdisk'),
+            ))
+
+    snapshot.nodes.sort(key=lambda n: n.name or '')
+    snapshot.guests.sort(key=lambda g: (g.node or '', int(g.vmid or 0)))
+    return snapshot
+
+
+def collect_cluster_snapshot(proxmox, server_key):
+    """
+    Obtiene nodos, invitados y almacenamiento del cluster en una sola llamada.
+
+    Args:
+        proxmox: Conexión ProxmoxAPI (normalmente la compartida del registro).
+        server_key: Identificador del servidor (ID de ProxmoxServer o clave de nodo).
+
+    Raises:
+        Exception: si la API no responde, para que el llamador marque el servidor offline.
+    """
+    service = ProxmoxService(proxmox=proxmox)
+    resources = service.get_cluster_resources(raise_errors=True)
+    return build_snapshot(server_key, resources)
+
+
+def get_server_snapshot(server, timeout=30):
+    """Snapshot de un ProxmoxServer usando su conexión compartida"""
+    from utils.proxmox_manager import proxmox_manager
+    proxmox = proxmox_manager.get_server_connection(server, timeout=timeout)
+    return collect_cluster_snapshot(proxmox, server.id)
+
+
+def get_node_snapshot(node_key, timeout=30):
+    """Snapshot de un nodo configurado en proxmox_manager"""
+    from utils.proxmox_manager import proxmox_manager
+    proxmox = proxmox_manager.get_connection(node_key, timeout=timeout)
+    return collect_cluster_snapshot(proxmox, node_key)
+
+
+def get_cached_snapshot(server_key, timeout=30):
+    """
+    Snapshot a través de la caché compartida de Proxmox.
+
+    Varias peticiones concurrentes (o pestañas sondeando) comparten una única
+    consulta a /cluster/resources por TTL; si el dato está caducado se sirve
+    el anterior mientras se refresca en segundo plano.
+    """
+    from utils.proxmox_cache import cached_read
+    return cached_read(
+        server_key, None, 'snapshot',
+        lambda: get_node_snapshot(str(server_key), timeout=timeout)
+    )
+
+
+async def aget_cached_snapshot(server_key):
+    """Versión asíncrona de get_cached_snapshot (consulta con utils.proxmox_async)"""
+    from utils.proxmox_async import api_get
+    from utils.proxmox_cache import acached_read
+
+    async def load():
+        return build_snapshot(server_key, await api_get(str(server_key), '/cluster/resources'))
+
+    return await acached_read(server_key, None, 'snapshot', load)
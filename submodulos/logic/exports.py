@@ -0,0 +1,495 @@
+"""
+Exportación en streaming de métricas e históricos.
+
+Las exportaciones recorren la consulta con iterator(chunk_size=...) (cursor de
+servidor en PostgreSQL) y values_list() con los nombres ya unidos en SQL, de
+modo que la memoria no depende del número de filas y no hay consultas por
+fila. Las filas se convierten a CSV en bloques y, si se pide, se comprimen
+con gzip sobre la marcha.
+
+Uso:
+    header, rows = export_rows('vm_metrics', start=..., end=..., server='pve1')
+    StreamingHttpResponse(csv_chunks(header, rows))
+
+Los mismos generadores sirven para la vista export_data_csv y el comando
+export_predictions. Bajo ASGI la vista los envuelve con `streaming_body`:
+Django acumula en memoria los iteradores síncronos de un
+StreamingHttpResponse servido por ASGI.
+
+Formatos columnares (pyarrow): Parquet y Arrow IPC con columnas tipadas
+(float64, int64, timestamp UTC) tomadas de los campos del modelo, construidos
+lote a lote desde el mismo cursor. Para el navegador se genera un único
+archivo en streaming; el comando puede además escribir un dataset
+particionado por día y servidor (estilo Hive: day=YYYY-MM-DD/server=...).
+"""
+import csv
+import gzip
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+CHUNK_SIZE = 5000
+BUFFER_BYTES = 64 * 1024   # Tamaño aproximado de cada bloque enviado
+BATCH_ROWS = 50000         # Filas por lote / row group en los formatos columnares
+
+COLUMNAR_FORMATS = {
+    # formato -> (extensión, content type)
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.stream'),
+}
+
+
+@dataclass
+class Dataset:
+    """Tabla exportable: columnas (cabecera, campo) y campos por los que se filtra"""
+    model: str
+    columns: list
+    server_field: str = None      # Nombre del servidor
+    server_id_field: str = None
+    vm_field: str = None          # Nombre de la VM
+    vm_id_field: str = None
+    timestamp_field: str = 'timestamp'
+    ordering: tuple = ('-timestamp',)
+
+    @property
+    def header(self):
+        return [label for label, _ in self.columns]
+
+    @property
+    def fields(self):
+        return [name for _, name in self.columns]
+
+    def get_model(self):
+        from django.apps import apps
+        return apps.get_model('submodulos', self.model)
+
+
+DATASETS = {
+    'vm_metrics': Dataset(
+        model='VMMetric',
+        columns=[
+            ('Timestamp', 'timestamp'),
+            ('VM', 'vm_name'),
+            ('Servidor Origen', 'server_origin'),
+            ('Estado', 'status'),
+            ('CPU (%)', 'cpu_usage'),
+            ('RAM (%)', 'ram_usage'),
+        ],
+        server_field='server_origin',
+        vm_field='vm_name',
+        vm_id_field='vm_id',
+    ),
+    'server_metrics': Dataset(
+        model='ServerMetric',
+        columns=[
+            ('Timestamp', 'timestamp'),
+            ('Nodo', 'server__name'),
+            ('Uptime (s)', 'uptime'),
+            ('CPU (%)', 'cpu_usage'),
+            ('RAM (%)', 'ram_usage'),
+        ],
+        server_field='server__name',
+        server_id_field='server_id',
+    ),
+    'server_history': Dataset(
+        model='ServerMetric',
+        columns=[
+            ('Server', 'server__name'),
+            ('Timestamp', 'timestamp'),
+            ('CPU Usage (%)', 'cpu_usage'),
+            ('RAM Usage (%)', 'ram_usage'),
+            ('Disk Usage (%)', 'disk_usage'),
+            ('Uptime', 'uptime'),
+        ],
+        server_field='server__name',
+        server_id_field='server_id',
+    ),
+    'server_predictions': Dataset(
+        model='ServerPrediction',
+        columns=[
+            ('Server', 'server__name'),
+            ('Timestamp', 'timestamp'),
+            ('Predicted CPU (%)', 'predicted_cpu_usage'),
+            ('Predicted Memory (%)', 'predicted_memory_usage'),
+            ('Confidence Lower', 'confidence_lower'),
+            ('Confidence Upper', 'confidence_upper'),
+            ('Created At', 'created_at'),
+        ],
+        server_field='server__name',
+        server_id_field='server_id',
+    ),
+}
+
+
+def parse_bound(value, end=False):
+    """
+    Fecha (YYYY-MM-DD) o fecha y hora ISO como datetime con zona horaria.
+    Una fecha sola como límite final incluye el día completo.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Fecha no válida: {value}")
+        moment = datetime.combine(day + timedelta(days=1) if end else day, dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filtered_queryset(name, start=None, end=None, server=None, vm=None):
+    """Consulta del conjunto `name` con los filtros de rango, servidor y VM"""
+    if name not in DATASETS:
+        raise ValueError(f"Modelo no reconocido: {name}")
+    dataset = DATASETS[name]
+    queryset = dataset.get_model().objects.all()
+
+    if start:
+        queryset = queryset.filter(**{f'{dataset.timestamp_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{dataset.timestamp_field}__lt': end})
+    if server:
+        if str(server).isdigit() and dataset.server_id_field:
+            queryset = queryset.filter(**{dataset.server_id_field: int(server)})
+        elif dataset.server_field:
+            queryset = queryset.filter(**{dataset.server_field: server})
+    if vm:
+        if not dataset.vm_field:
+            raise ValueError(f"El filtro por VM no aplica a {name}")
+        if str(vm).isdigit() and dataset.vm_id_field:
+            queryset = queryset.filter(**{dataset.vm_id_field: int(vm)})
+        else:
+            queryset = queryset.filter(**{dataset.vm_field: vm})
+    return queryset.order_by(*dataset.ordering)
+
+
+def export_rows(name, start=None, end=None, server=None, vm=None, chunk_size=CHUNK_SIZE):
+    """
+    Cabecera y generador de tuplas del conjunto `name` (sin consultas por fila).
+
+    Returns:
+        tuple: (cabecera, iterador de filas)
+    """
+    dataset = DATASETS.get(name)
+    queryset = filtered_queryset(name, start=start, end=end, server=server, vm=vm)
+    rows = queryset.values_list(*dataset.fields).iterator(chunk_size=chunk_size)
+    return dataset.header, rows
+
+
+def _format(value, decimal_comma):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')  # UTC, como en la BD
+    if isinstance(value, float) and decimal_comma:
+        return str(value).replace('.', ',')  # Excel friendly for some locales
+    return value
+
+
+class _Buffer:
+    """Destino de csv.writer que acumula el texto en lugar de escribirlo"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        self.parts.append(value)
+        self.size += len(value)
+
+    def take(self):
+        text = ''.join(self.parts)
+        self.parts, self.size = [], 0
+        return text
+
+
+def csv_chunks(header, rows, decimal_comma=False, buffer_bytes=BUFFER_BYTES):
+    """Genera el CSV en bloques de texto de ~buffer_bytes"""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_format(value, decimal_comma) for value in row])
+        if buffer.size >= buffer_bytes:
+            yield buffer.take()
+    if buffer.size:
+        yield buffer.take()
+
+
+def gzip_chunks(chunks, encoding='utf-8', level=6):
+    """Comprime en formato gzip un generador de bloques de texto"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode(encoding))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_body(request, chunks):
+    """
+    Cuerpo para StreamingHttpResponse que se transmite por bloques en WSGI y en ASGI.
+
+    Bajo ASGI se entrega un iterador asíncrono que avanza el generador bloque
+    a bloque en el hilo síncrono compartido (el cursor de servidor sigue en
+    la misma conexión a BD); bajo WSGI el generador se devuelve tal cual.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+
+    if not isinstance(request, ASGIRequest):
+        return chunks
+    return _async_chunks(chunks)
+
+
+async def _async_chunks(chunks):
+    from asgiref.sync import sync_to_async
+
+    iterator = iter(chunks)
+    done = object()
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        # Descarga cortada: cerrar el generador libera el cursor de servidor
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def write_csv(path, header, rows, compress=False, decimal_comma=False):
+    """
+    Escribe el CSV en disco en bloques. No crea el archivo si no hay filas.
+
+    Returns:
+        int: filas escritas.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+
+    count = 0
+
+    def counted():
+        nonlocal count
+        count += 1
+        yield first
+        for row in rows:
+            count += 1
+            yield row
+
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', newline='', encoding='utf-8') as output:
+        for chunk in csv_chunks(header, counted(), decimal_comma=decimal_comma):
+            output.write(chunk)
+    return count
+
+
+# --- Formatos columnares (Parquet / Arrow IPC) ---
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("La exportación Parquet/Arrow requiere pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _model_field(model, path):
+    """Campo del modelo para una ruta de values_list (p.ej. 'server__name')"""
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def _arrow_type(pa, field):
+    internal = field.get_internal_type()
+    if internal == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    if internal in ('FloatField', 'DecimalField'):
+        return pa.float64()
+    if internal in ('IntegerField', 'BigIntegerField', 'SmallIntegerField', 'PositiveIntegerField',
+                    'AutoField', 'BigAutoField'):
+        return pa.int64()
+    if internal == 'BooleanField':
+        return pa.bool_()
+    return pa.string()
+
+
+def column_name(path):
+    return path.replace('__', '_')
+
+
+def arrow_schema(name):
+    """Esquema tipado del conjunto `name` a partir de los campos del modelo"""
+    pa = _pyarrow()
+    dataset = DATASETS[name]
+    model = dataset.get_model()
+    return pa.schema([
+        pa.field(column_name(path), _arrow_type(pa, _model_field(model, path)))
+        for path in dataset.fields
+    ])
+
+
+def record_batches(schema, rows, batch_rows=BATCH_ROWS, extra=None):
+    """
+    Agrupa las tuplas en RecordBatch de `batch_rows` filas.
+
+    Args:
+        extra (list): [(pa.Field, función(fila))] columnas derivadas añadidas al final.
+    """
+    pa = _pyarrow()
+    extra = extra or []
+    fields = list(schema) + [field for field, _ in extra]
+    target = pa.schema(fields)
+    columns = [[] for _ in fields]
+    width = len(schema)
+
+    def build():
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, fields)],
+            schema=target,
+        )
+
+    for row in rows:
+        for index in range(width):
+            columns[index].append(row[index])
+        for offset, (_, derive) in enumerate(extra):
+            columns[width + offset].append(derive(row))
+        if len(columns[0]) >= batch_rows:
+            yield build()
+            columns = [[] for _ in fields]
+    if columns[0]:
+        yield build()
+
+
+class _ByteSink:
+    """Archivo de solo escritura en memoria que se vacía después de cada lote"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _writer(pa, fmt, sink, schema):
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(sink, schema, compression='snappy')
+    return pa.ipc.new_stream(sink, schema)
+
+
+def columnar_chunks(name, rows, fmt='parquet', batch_rows=BATCH_ROWS):
+    """
+    Genera un archivo Parquet o un stream Arrow IPC en bloques de bytes (un
+    row group / lote por bloque), para StreamingHttpResponse.
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    pa = _pyarrow()
+    schema = arrow_schema(name)
+    sink = _ByteSink()
+    writer = _writer(pa, fmt, pa.PythonFile(sink, mode='w'), schema)
+    for batch in record_batches(schema, rows, batch_rows):
+        writer.write_batch(batch)
+        data = sink.take()
+        if data:
+            yield data
+    writer.close()
+    yield sink.take()
+
+
+def write_columnar(path, name, rows, fmt='parquet', partition=False, batch_rows=BATCH_ROWS):
+    """
+    Escribe el conjunto en disco: un archivo, o con `partition` un directorio
+    particionado por día y servidor.
+
+    Returns:
+        int: filas escritas.
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    pa = _pyarrow()
+    schema = arrow_schema(name)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    if not partition:
+        batches = record_batches(schema, counted(), batch_rows)
+        first = next(batches, None)
+        if first is None:
+            return 0
+        with pa.OSFile(path, 'wb') as sink:
+            writer = _writer(pa, fmt, sink, schema)
+            writer.write_batch(first)
+            for batch in batches:
+                writer.write_batch(batch)
+            writer.close()
+        return count
+
+    import pyarrow.dataset as ds
+
+    dataset = DATASETS[name]
+    timestamp_index = dataset.fields.index(dataset.timestamp_field)
+    day = pa.field('day', pa.date32())
+    extra = [(day, lambda row: row[timestamp_index].date())]
+    partition_fields = [day]
+    if dataset.server_field:
+        partition_fields.append(schema.field(column_name(dataset.server_field)))
+
+    batches = record_batches(schema, counted(), batch_rows, extra=extra)
+    first = next(batches, None)
+    if first is None:
+        return 0
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    extension = COLUMNAR_FORMATS[fmt][0]
+    ds.write_dataset(
+        all_batches(),
+        path,
+        schema=first.schema,
+        format='parquet' if fmt == 'parquet' else 'ipc',
+        partitioning=ds.partitioning(pa.schema(partition_fields), flavor='hive'),
+        basename_template=f"{name}-{{i}}.{extension}",
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=batch_rows,
+    )
+    return count
@@ -0,0 +1,177 @@
+"""
+Documentos de predicción listos para servir.
+
+Al terminar cada ejecución del ciclo de predicción se genera, por servidor y
+por VM, el JSON que devuelven los endpoints /api/predictions/... (etiquetas,
+valores, bandas de confianza y recomendaciones) y se guarda serializado en la
+caché junto con su ETag. Los endpoints solo leen la caché y responden 304 si
+el cliente ya tiene esa versión; el contenido cambia una vez por hora.
+
+Si el documento no está en caché (caché vaciada, antes del primer ciclo) se
+construye desde la BD y se guarda.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'forecast:doc'
+DEFAULT_TTL = 2 * 3600   # Dos ciclos: el siguiente ciclo lo sustituye antes de caducar
+HORIZON = 24             # Horas que se sirven
+
+
+def _cache_key(kind, entity_id):
+    return f"{CACHE_PREFIX}:{kind}:{entity_id}"
+
+
+def _recommendations(cpu_values, mem_values):
+    """Recomendaciones simples a partir de los picos previstos"""
+    recommendations = []
+    max_cpu = max(cpu_values) if cpu_values else 0
+    max_mem = max(mem_values) if mem_values else 0
+
+    if max_cpu > 80:
+        recommendations.append({
+            'type': 'warning',
+            'metric': 'CPU',
+            'message': f'Pico de CPU previsto: {max_cpu:.1f}%',
+            'action': 'Monitorizar procesos intensivos'
+        })
+
+    if max_mem > 90:
+        recommendations.append({
+            'type': 'critical',
+            'metric': 'RAM',
+            'message': f'Pico de RAM previsto: {max_mem:.1f}%',
+            'action': 'Preparar liberación de memoria'
+        })
+    return recommendations
+
+
+def build_document(kind, name, predictions):
+    """
+    Documento JSON de una entidad a partir de sus predicciones (ordenadas).
+
+    Args:
+        kind (str): 'server' o 'vm'.
+        name (str): nombre de la entidad.
+        predictions (list): ServerPrediction/VMPrediction con `run` cargado.
+    """
+    run = predictions[0].run if predictions else None
+    timestamps = [p.timestamp.strftime('%H:%M') for p in predictions]
+    cpu_values = [p.predicted_cpu_usage for p in predictions]
+    mem_values = [p.predicted_memory_usage for p in predictions]
+    if kind == 'server':
+        lower = [p.confidence_lower for p in predictions]
+        upper = [p.confidence_upper for p in predictions]
+    else:
+        lower = [p.cpu_lower for p in predictions]
+        upper = [p.cpu_upper for p in predictions]
+
+    return {
+        'success': True,
+        f'{kind}_name': name,
+        'run_id': run.pk if run else None,
+        'generated_at': run.finished_at.isoformat() if run and run.finished_at else None,
+        'predictions': {
+            'cpu': {
+                'labels': timestamps,
+                'data': cpu_values,
+                'lower_bound': lower,
+                'upper_bound': upper,
+            },
+            'memory': {
+                'labels': timestamps,
+                'data': mem_values
+            }
+        },
+        'recommendations': _recommendations(cpu_values, mem_values)
+    }
+
+
+def _entry(document):
+    """Serializa el documento una sola vez y calcula su ETag"""
+    body = json.dumps(document, cls=DjangoJSONEncoder).encode()
+    return {'etag': f'"{hashlib.sha1(body).hexdigest()}"', 'body': body}
+
+
+def _load(kind, entity_ids, now=None):
+    """Documentos de varias entidades con una consulta de predicciones"""
+    from submodulos.models import ServerPrediction, VMPrediction, ProxmoxServer, MaquinaVirtual
+    from submodulos.logic.forecasting import complete_predictions
+
+    now = now or timezone.now()
+    if kind == 'server':
+        names = dict(ProxmoxServer.objects.filter(id__in=entity_ids).values_list('id', 'name'))
+        queryset = ServerPrediction.objects.filter(server_id__in=entity_ids)
+        key = 'server_id'
+    else:
+        names = dict(MaquinaVirtual.objects.filter(vm_id__in=entity_ids).values_list('vm_id', 'nombre'))
+        queryset = VMPrediction.objects.filter(vm_id__in=entity_ids)
+        key = 'vm_id'
+
+    grouped = {entity_id: [] for entity_id in names}
+    for prediction in complete_predictions(queryset.filter(
+        timestamp__gte=now,
+        timestamp__lt=now + timedelta(hours=HORIZON + 1),
+    )).select_related('run').order_by(key, 'timestamp'):
+        rows = grouped.setdefault(getattr(prediction, key), [])
+        if len(rows) < HORIZON:
+            rows.append(prediction)
+
+    return {
+        entity_id: _entry(build_document(kind, names.get(entity_id, ''), rows))
+        for entity_id, rows in grouped.items()
+        if entity_id in names
+    }
+
+
+def publish(kind, entity_ids):
+    """Regenera y guarda en caché los documentos de las entidades indicadas"""
+    entity_ids = list(entity_ids)
+    if not entity_ids:
+        return 0
+    entries = _load(kind, entity_ids)
+    ttl = getattr(settings, 'FORECAST_DOCUMENT_TTL', DEFAULT_TTL)
+    try:
+        cache.set_many({_cache_key(kind, entity_id): entry for entity_id, entry in entries.items()}, timeout=ttl)
+    except Exception as e:
+        logger.warning(f"No se pudieron publicar los documentos de predicción: {e}")
+    return len(entries)
+
+
+def publish_results(results):
+    """Publica los documentos de las entidades con predicciones nuevas"""
+    for kind in ('server', 'vm'):
+        publish(kind, {r.entity_id for r in results if r.ok and r.kind == kind})
+
+
+def get_document(kind, entity_id):
+    """
+    Documento servible de una entidad.
+
+    Returns:
+        dict | None: {'etag', 'body'} o None si la entidad no existe.
+    """
+    key = _cache_key(kind, entity_id)
+    try:
+        entry = cache.get(key)
+    except Exception:
+        entry = None
+    if entry is not None:
+        return entry
+
+    entry = _load(kind, [entity_id]).get(entity_id)
+    if entry is not None:
+        try:
+            cache.set(key, entry, timeout=getattr(settings, 'FORECAST_DOCUMENT_TTL', DEFAULT_TTL))
+        except Exception:
+            pass
+    return entry
@@ -0,0 +1,467 @@
+"""
+Motor de predicción en paralelo.
+
+El ciclo horario entrenaba los SARIMAX de cada servidor y VM uno detrás de
+otro. El motor separa el trabajo en tres fases:
+
+1. Carga (proceso padre): las series horarias de todas las entidades se leen
+   con una consulta por tipo (rollups de 1h, muestras en bruto si aún no hay).
+2. Ajuste (pool de procesos): cada entidad se ajusta en un proceso del pool;
+   los trabajos solo reciben listas de valores, sin acceso a la BD.
+3. Escritura (proceso padre): todas las predicciones se guardan en un lote
+   (upsert) asociado a una ForecastRun.
+
+El ciclo completo (submodulos.logic.forecasting.run_cycle) elige el backend de
+cada tipo de entidad; este módulo implementa el backend SARIMA.
+
+Arranque en caliente: los parámetros ajustados de cada (entidad, métrica) se
+guardan en ForecastModelState. En el ciclo siguiente el modelo se reconstruye
+con esos parámetros y solo se filtra la serie (sin optimizar); se reajusta
+cuando el estado caduca (FORECAST_REFIT_HOURS), cuando el error medio de las
+últimas horas supera FORECAST_DRIFT_FACTOR veces el error de referencia, o si
+cambian los órdenes SARIMA. Los reajustes parten de los parámetros anteriores.
+
+Este módulo no importa Django a nivel de módulo: los procesos del pool se
+crean con 'spawn' y solo necesitan pandas/statsmodels para ajustar.
+"""
+import logging
+import os
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+logger = logging.getLogger(__name__)
+
+# Configuración SARIMA por tipo de entidad
+SARIMA_ORDERS = {
+    'server': {'order': (1, 1, 1), 'seasonal_order': (1, 1, 1, 24), 'min_points': 24, 'history_days': 30},
+    'vm': {'order': (1, 0, 1), 'seasonal_order': (0, 0, 0, 0), 'min_points': 12, 'history_days': 14},
+}
+METRICS = ('cpu', 'memory')
+DEFAULT_REFIT_HOURS = 24
+DEFAULT_DRIFT_FACTOR = 1.5
+DRIFT_WINDOW = 6  # Horas recientes con las que se mide la deriva
+
+
+@dataclass
+class ForecastTask:
+    """
+    Serie horaria de una entidad lista para ajustar (serializable).
+
+    `cpu` y `memory` son arrays con un valor por hora desde `start` (NaN en
+    las horas sin datos), tal como los devuelve timeseries.load_hourly.
+    """
+    kind: str                 # 'server' o 'vm'
+    entity_id: int
+    name: str
+    start: object             # datetime de la primera hora o None si no hay datos
+    cpu: object
+    memory: object
+    steps: int = 48
+    states: dict = field(default_factory=dict)  # métrica -> estado guardado
+    refit_hours: int = DEFAULT_REFIT_HOURS
+    drift_factor: float = DEFAULT_DRIFT_FACTOR
+
+
+@dataclass
+class ForecastResult:
+    kind: str
+    entity_id: int
+    name: str
+    error: str = None
+    elapsed: float = 0.0
+    timestamps: list = field(default_factory=list)   # Horas predichas
+    cpu: list = field(default_factory=list)
+    cpu_lower: list = field(default_factory=list)
+    cpu_upper: list = field(default_factory=list)
+    memory: list = field(default_factory=list)
+    skipped: bool = False     # Datos insuficientes (no es un fallo)
+    states: dict = field(default_factory=dict)  # métrica -> estado actualizado
+    refits: dict = field(default_factory=dict)  # métrica -> motivo del reajuste (None si se reutilizó)
+    backend: str = 'sarima'
+    nobs: int = 0
+    aic: float = None         # Suma de los modelos de CPU y RAM
+    bic: float = None
+
+    @property
+    def ok(self):
+        return self.error is None and not self.skipped
+
+
+def _hourly_frame(task):
+    import pandas as pd
+
+    if not len(task.cpu):
+        return pd.DataFrame(columns=['cpu_usage', 'memory_usage'])
+    index = pd.date_range(task.start, periods=len(task.cpu), freq='h')
+    # Las horas sin datos toman el último valor conocido
+    return pd.DataFrame({'cpu_usage': task.cpu, 'memory_usage': task.memory}, index=index).ffill()
+
+
+def get_spec(config):
+    return f"{config['order']}x{config['seasonal_order']}"
+
+
+def _recent_mae(results):
+    import numpy as np
+
+    resid = np.asarray(results.resid)[-DRIFT_WINDOW:]
+    resid = resid[np.isfinite(resid)]
+    return float(np.abs(resid).mean()) if len(resid) else None
+
+
+def _refit_reason(state, spec, param_count, task, now):
+    if not state:
+        return 'sin estado'
+    if state['spec'] != spec or len(state['params']) != param_count:
+        return 'órdenes cambiados'
+    if now - state['fitted_at'] >= timedelta(hours=task.refit_hours):
+        return 'caducado'
+    return None
+
+
+def _fit_sarimax(series, config, task, metric, now):
+    """
+    Ajusta (o reutiliza) el modelo de una métrica.
+
+    Returns:
+        tuple: (resultados, forecast, estado actualizado, motivo del reajuste o None)
+    """
+    import numpy as np
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    model = SARIMAX(series,
+                    order=config['order'],
+                    seasonal_order=config['seasonal_order'],
+                    enforce_stationarity=False,
+                    enforce_invertibility=False)
+    spec = get_spec(config)
+    state = task.states.get(metric)
+    reason = _refit_reason(state, spec, len(model.param_names), task, now)
+
+    if reason is None:
+        # Parámetros conocidos: solo el filtro de Kalman con las observaciones nuevas
+        results = model.filter(np.asarray(state['params'], dtype=float))
+        recent = _recent_mae(results)
+        reference = state.get('reference_mae')
+        if recent is not None and reference and recent > reference * task.drift_factor:
+            reason = f'deriva ({recent:.2f} > {reference:.2f}x{task.drift_factor})'
+        else:
+            new_state = dict(state, nobs=int(results.nobs), last_observation=series.index[-1].to_pydatetime())
+            return results, results.get_forecast(steps=task.steps), new_state, None
+
+    start_params = None
+    if state and state['spec'] == spec and len(state['params']) == len(model.param_names):
+        start_params = np.asarray(state['params'], dtype=float)
+    results = model.fit(disp=False, start_params=start_params)
+    new_state = {
+        'spec': spec,
+        'params': [float(v) for v in results.params],
+        'reference_mae': _recent_mae(results),
+        'nobs': int(results.nobs),
+        'last_observation': series.index[-1].to_pydatetime(),
+        'fitted_at': now,
+    }
+    return results, results.get_forecast(steps=task.steps), new_state, reason
+
+
+def fit_task(task):
+    """Ajusta CPU y RAM de una entidad (se ejecuta en un proceso del pool)"""
+    started = time.monotonic()
+    result = ForecastResult(task.kind, task.entity_id, task.name)
+    try:
+        config = SARIMA_ORDERS[task.kind]
+        df = _hourly_frame(task)
+        if len(df) < config['min_points']:
+            result.skipped = True
+            result.error = f"Datos insuficientes ({len(df)}h < {config['min_points']}h)"
+            return result
+
+        now = datetime.now(dt_timezone.utc)
+        results_cpu, forecast_cpu, result.states['cpu'], result.refits['cpu'] = _fit_sarimax(
+            df['cpu_usage'], config, task, 'cpu', now)
+        results_ram, forecast_ram, result.states['memory'], result.refits['memory'] = _fit_sarimax(
+            df['memory_usage'], config, task, 'memory', now)
+        result.nobs = len(df)
+        result.aic = float(results_cpu.aic + results_ram.aic)
+        result.bic = float(results_cpu.bic + results_ram.bic)
+        conf_int_cpu = forecast_cpu.conf_int()
+
+        last_timestamp = df.index[-1].to_pydatetime()
+        result.timestamps = [last_timestamp + timedelta(hours=i + 1) for i in range(task.steps)]
+        # Asegurar no negativos
+        result.cpu = [max(0.0, float(v)) for v in forecast_cpu.predicted_mean]
+        result.memory = [max(0.0, float(v)) for v in forecast_ram.predicted_mean]
+        result.cpu_lower = [max(0.0, float(v)) for v in conf_int_cpu.iloc[:, 0]]
+        result.cpu_upper = [float(v) for v in conf_int_cpu.iloc[:, 1]]
+    except Exception as e:
+        result.error = str(e)
+    finally:
+        result.elapsed = time.monotonic() - started
+    return result
+
+
+def get_workers(workers=None):
+    if workers is not None:
+        return workers
+    from django.conf import settings
+    workers = getattr(settings, 'FORECAST_WORKERS', None)
+    return workers if workers is not None else (os.cpu_count() or 1)
+
+
+def _get_mp_context():
+    from django.conf import settings
+    return multiprocessing.get_context(getattr(settings, 'FORECAST_MP_CONTEXT', 'spawn'))
+
+
+def run_tasks(tasks, workers=None):
+    """
+    Ajusta todas las tareas en un pool de procesos.
+
+    Args:
+        tasks (list[ForecastTask]): series cargadas.
+        workers (int): procesos del pool; 0 ajusta en el proceso actual.
+
+    Returns:
+        list[ForecastResult] en el mismo orden que `tasks`.
+    """
+    workers = get_workers(workers)
+    if not tasks:
+        return []
+    if workers <= 0 or len(tasks) == 1:
+        return [fit_task(task) for task in tasks]
+
+    # Las series más largas primero para repartir mejor el pool
+    order = sorted(range(len(tasks)), key=lambda i: len(tasks[i].cpu), reverse=True)
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=_get_mp_context()) as pool:
+        fitted = pool.map(fit_task, [tasks[i] for i in order], chunksize=1)
+        results = [None] * len(tasks)
+        for i, result in zip(order, fitted):
+            results[i] = result
+    return results
+
+
+# --- Carga de series (proceso padre, una consulta por tipo) ---
+
+def attach_states(tasks, force_refit=False):
+    """Añade a cada tarea los parámetros guardados y la política de reajuste"""
+    from django.conf import settings
+    from submodulos.models import ForecastModelState
+
+    refit_hours = getattr(settings, 'FORECAST_REFIT_HOURS', DEFAULT_REFIT_HOURS)
+    drift_factor = getattr(settings, 'FORECAST_DRIFT_FACTOR', DEFAULT_DRIFT_FACTOR)
+    by_key = {(t.kind, t.entity_id): t for t in tasks}
+    if not force_refit and by_key:
+        rows = ForecastModelState.objects.filter(
+            kind__in={t.kind for t in tasks},
+            entity_id__in={t.entity_id for t in tasks},
+        ).values('kind', 'entity_id', 'metric', 'spec', 'params', 'reference_mae',
+                 'nobs', 'last_observation', 'fitted_at')
+        for row in rows:
+            task = by_key.get((row.pop('kind'), row.pop('entity_id')))
+            if task is not None:
+                task.states[row.pop('metric')] = row
+    for task in tasks:
+        task.refit_hours = refit_hours
+        task.drift_factor = drift_factor
+    return tasks
+
+
+def load_tasks(kind, entities, steps=48, now=None, force_refit=False):
+    """
+    Tareas de varias entidades del mismo tipo con una carga alineada
+    (timeseries.load_hourly: rollups de 1h o promedios horarios en SQL).
+    """
+    from django.utils import timezone
+    from submodulos.logic.timeseries import load_hourly
+
+    entities = list(entities)
+    now = now or timezone.now()
+    start = now - timedelta(days=SARIMA_ORDERS[kind]['history_days'])
+    matrix = load_hourly(kind, [entity.pk for entity in entities], start, now)
+
+    tasks = []
+    for row, entity in enumerate(entities):
+        first, cpu, memory = matrix.trimmed(row)
+        name = entity.name if kind == 'server' else entity.nombre
+        tasks.append(ForecastTask(kind, entity.pk, name, first, cpu, memory, steps))
+    return attach_states(tasks, force_refit)
+
+
+def load_server_tasks(servers, steps=48, now=None, force_refit=False):
+    """Series horarias de varios servidores (30 días)"""
+    return load_tasks('server', servers, steps, now, force_refit)
+
+
+def load_vm_tasks(vms, steps=48, now=None, force_refit=False):
+    """Series horarias de varias VMs (14 días)"""
+    return load_tasks('vm', vms, steps, now, force_refit)
+
+
+# --- Escritura (un lote por tipo) ---
+
+SERVER_UPDATE_FIELDS = ['predicted_cpu_usage', 'predicted_memory_usage', 'confidence_lower', 'confidence_upper', 'run']
+# is_anomaly lo marca el detector en línea: un reajuste no debe reiniciarlo
+VM_UPDATE_FIELDS = ['predicted_cpu_usage', 'predicted_memory_usage', 'cpu_lower', 'cpu_upper', 'run']
+
+
+def save_results(results, run=None):
+    """
+    Escribe el horizonte de todas las entidades en una transacción.
+
+    Las predicciones se insertan con INSERT ... ON CONFLICT sobre
+    (entidad, timestamp); las filas de ejecuciones anteriores que quedan dentro
+    del horizonte nuevo pero fuera de los timestamps escritos se borran con una
+    sola consulta por tipo. La ejecución (`run`) se marca completa en la misma
+    transacción, así que un lector nunca ve un horizonte a medias.
+
+    Returns:
+        int: predicciones escritas.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+    from submodulos.models import ServerPrediction, VMPrediction, ForecastModelState, ForecastRun, ForecastFitStat
+
+    if run is None:
+        run = ForecastRun.objects.create()
+
+    server_preds, vm_preds, states, stats = [], [], [], []
+    server_stale, vm_stale = Q(pk__in=[]), Q(pk__in=[])
+    for result in results:
+        if result.skipped:
+            continue
+        stats.append(ForecastFitStat(
+            run=run,
+            kind=result.kind,
+            entity_id=result.entity_id,
+            name=(result.name or '')[:100],
+            backend=result.backend,
+            ok=result.ok,
+            refit=any(result.refits.values()) or not result.states,
+            fit_seconds=result.elapsed,
+            nobs=result.nobs,
+            aic=result.aic,
+            bic=result.bic,
+        ))
+        if not result.ok:
+            continue
+        for metric, state in result.states.items():
+            states.append(ForecastModelState(kind=result.kind, entity_id=result.entity_id, metric=metric, **state))
+        first = result.timestamps[0]
+        if result.kind == 'server':
+            server_stale |= Q(server_id=result.entity_id, timestamp__gte=first)
+            for i, ts in enumerate(result.timestamps):
+                server_preds.append(ServerPrediction(
+                    server_id=result.entity_id,
+                    run=run,
+                    timestamp=ts,
+                    predicted_cpu_usage=result.cpu[i],
+                    predicted_memory_usage=result.memory[i],
+                    confidence_lower=result.cpu_lower[i],
+                    confidence_upper=result.cpu_upper[i],
+                ))
+        else:
+            vm_stale |= Q(vm_id=result.entity_id, timestamp__gte=first)
+            for i, ts in enumerate(result.timestamps):
+                vm_preds.append(VMPrediction(
+                    vm_id=result.entity_id,
+                    run=run,
+                    timestamp=ts,
+                    predicted_cpu_usage=result.cpu[i],
+                    predicted_memory_usage=result.memory[i],
+                    cpu_lower=result.cpu_lower[i] if result.cpu_lower else None,
+                    cpu_upper=result.cpu_upper[i] if result.cpu_upper else None,
+                    is_anomaly=False,
+                ))
+
+    with transaction.atomic():
+        if server_preds:
+            ServerPrediction.objects.bulk_create(
+                server_preds, batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['server', 'timestamp'],
+                update_fields=SERVER_UPDATE_FIELDS,
+            )
+            # Restos de horizontes anteriores más largos que el actual
+            ServerPrediction.objects.filter(server_stale).exclude(run=run).delete()
+        if vm_preds:
+            VMPrediction.objects.bulk_create(
+                vm_preds, batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['vm', 'timestamp'],
+                update_fields=VM_UPDATE_FIELDS,
+            )
+            VMPrediction.objects.filter(vm_stale).exclude(run=run).delete()
+        ForecastFitStat.objects.bulk_create(stats, batch_size=1000)
+        if states:
+            ForecastModelState.objects.bulk_create(
+                states, batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['kind', 'entity_id', 'metric'],
+                update_fields=['spec', 'params', 'reference_mae', 'nobs', 'last_observation', 'fitted_at', 'updated_at'],
+            )
+
+        run.status = 'complete'
+        run.finished_at = timezone.now()
+        run.entities = len(results)
+        run.failures = sum(1 for r in results if r.error and not r.skipped)
+        run.predictions = len(server_preds) + len(vm_preds)
+        run.save(update_fields=['status', 'finished_at', 'entities', 'failures', 'predictions'])
+
+    # Documentos listos para servir (endpoints /api/predictions/...)
+    try:
+        from submodulos.logic.forecast_documents import publish_results
+        publish_results(results)
+    except Exception as e:
+        logger.warning(f"No se pudieron publicar los documentos de predicción: {e}")
+    return run.predictions
+
+
+@dataclass
+class ForecastCycle:
+    """Resumen de un ciclo de predicción"""
+    results: list
+    saved: int = 0
+    elapsed: float = 0.0
+    run_id: int = None
+
+    @property
+    def failures(self):
+        return [r for r in self.results if r.error and not r.skipped]
+
+    @property
+    def skipped(self):
+        return [r for r in self.results if r.skipped]
+
+    @property
+    def refits(self):
+        """Modelos reajustados en este ciclo (el resto reutilizó sus parámetros)"""
+        return sum(1 for r in self.results for reason in r.refits.values() if reason)
+
+    @property
+    def fit_time(self):
+        return sum(r.elapsed for r in self.results)
+
+    def summary(self):
+        ok = sum(1 for r in self.results if r.ok)
+        return (f"{ok}/{len(self.results)} entidades en {self.elapsed:.1f}s "
+                f"(ajuste acumulado {self.fit_time:.1f}s, {self.refits} modelos reajustados, {len(self.failures)} fallos, "
+                f"{len(self.skipped)} sin datos suficientes)")
+
+    def details(self):
+        return {
+            'run_id': self.run_id,
+            'entities': len(self.results),
+            'saved_predictions': self.saved,
+            'elapsed': round(self.elapsed, 2),
+            'fit_time': round(self.fit_time, 2),
+            'refits': self.refits,
+            'failures': [{'kind': r.kind, 'name': r.name, 'error': r.error} for r in self.failures],
+            'slowest': [
+                {'kind': r.kind, 'name': r.name, 'elapsed': round(r.elapsed, 2)}
+                for r in sorted(self.results, key=lambda r: r.elapsed, reverse=True)[:5]
+            ],
+        }
@@ -0,0 +1,166 @@
+"""
+Instrumentación de coste y precisión de las predicciones.
+
+Cada ejecución guarda en ForecastFitStat el coste del ajuste por entidad
+(tiempo, observaciones, AIC/BIC). Cuando las horas predichas ya tienen
+rollups de 1 hora, `evaluate_pending` compara las predicciones que siguen
+asociadas a esa ejecución con los valores reales y guarda MAE y MAPE.
+
+`summarize` agrega ambos por tipo de entidad y backend para el dashboard de
+predicciones y la API JSON.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from submodulos.models import (
+    ForecastFitStat, ServerMetricRollup, ServerPrediction, VMMetricRollup, VMPrediction,
+)
+from submodulos.logic.rollups import DEFAULT_LAG_SECONDS, floor_to
+
+logger = logging.getLogger(__name__)
+
+# Horas tras la ejecución antes de evaluarla: para entonces la siguiente
+# ejecución ya ha sustituido el horizonte futuro y las horas pasadas son definitivas
+EVALUATION_DELAY = timedelta(hours=2)
+# Ejecuciones más antiguas sin datos reales se dan por evaluadas (sin puntos)
+EVALUATION_MAX_AGE = timedelta(days=3)
+# Denominador mínimo del MAPE (puntos %) para que un uso casi nulo no lo dispare
+MAPE_FLOOR = 1.0
+
+KINDS = {
+    'server': (ServerPrediction, 'server_id', ServerMetricRollup, 'server_id'),
+    'vm': (VMPrediction, 'vm_id', VMMetricRollup, 'vm_id'),
+}
+
+
+def _errors(pairs):
+    """MAE y MAPE de una lista de (predicho, real)"""
+    if not pairs:
+        return None, None
+    abs_errors = [abs(pred - real) for pred, real in pairs]
+    mae = sum(abs_errors) / len(pairs)
+    mape = sum(err / max(abs(real), MAPE_FLOOR) for err, (_, real) in zip(abs_errors, pairs)) / len(pairs) * 100
+    return mae, mape
+
+
+def evaluate_pending(now=None):
+    """
+    Calcula el error real de las estadísticas pendientes (una consulta de
+    predicciones y una de rollups por tipo de entidad).
+
+    Returns:
+        int: estadísticas evaluadas.
+    """
+    now = now or timezone.now()
+    pending = list(ForecastFitStat.objects.filter(
+        ok=True,
+        evaluated_at__isnull=True,
+        created_at__lte=now - EVALUATION_DELAY,
+    ))
+    if not pending:
+        return 0
+
+    # Última hora cerrada con rollup de 1h
+    lag = getattr(settings, 'ROLLUP_LAG_SECONDS', DEFAULT_LAG_SECONDS)
+    until = floor_to(now - timedelta(seconds=lag), '1h')
+
+    evaluated = []
+    for kind, (prediction_model, prediction_key, rollup_model, rollup_key) in KINDS.items():
+        stats = [s for s in pending if s.kind == kind]
+        if not stats:
+            continue
+        entity_ids = {s.entity_id for s in stats}
+
+        predictions = {}
+        first = None
+        for run_id, entity_id, ts, cpu, memory in prediction_model.objects.filter(
+            run_id__in={s.run_id for s in stats},
+            **{f'{prediction_key}__in': entity_ids},
+            timestamp__lt=until,
+        ).values_list('run_id', prediction_key, 'timestamp', 'predicted_cpu_usage', 'predicted_memory_usage'):
+            predictions.setdefault((run_id, entity_id), []).append((ts, cpu, memory))
+            first = ts if first is None or ts < first else first
+
+        actuals = {}
+        if first is not None:
+            for entity_id, bucket, cpu, memory in rollup_model.objects.filter(
+                resolution='1h',
+                **{f'{rollup_key}__in': entity_ids},
+                bucket__gte=first,
+                bucket__lt=until,
+            ).values_list(rollup_key, 'bucket', 'avg_cpu', 'avg_memory'):
+                actuals[(entity_id, bucket)] = (cpu, memory)
+
+        for stat in stats:
+            cpu_pairs, memory_pairs = [], []
+            for ts, cpu, memory in predictions.get((stat.run_id, stat.entity_id), []):
+                real = actuals.get((stat.entity_id, ts))
+                if real:
+                    cpu_pairs.append((cpu, real[0]))
+                    memory_pairs.append((memory, real[1]))
+            if not cpu_pairs and now - stat.created_at < EVALUATION_MAX_AGE:
+                continue  # Aún pueden llegar datos
+            stat.mae_cpu, stat.mape_cpu = _errors(cpu_pairs)
+            stat.mae_memory, stat.mape_memory = _errors(memory_pairs)
+            stat.evaluated_points = len(cpu_pairs)
+            stat.evaluated_at = now
+            evaluated.append(stat)
+
+    ForecastFitStat.objects.bulk_update(
+        evaluated,
+        ['mae_cpu', 'mape_cpu', 'mae_memory', 'mape_memory', 'evaluated_points', 'evaluated_at'],
+        batch_size=1000,
+    )
+    if evaluated:
+        logger.info(f"Estadísticas de predicción evaluadas: {len(evaluated)}")
+    return len(evaluated)
+
+
+def summarize(days=7, now=None):
+    """
+    Coste y precisión de los últimos `days` días.
+
+    Returns:
+        dict: {'backends': [...por tipo y backend], 'entities': [...peores MAPE de CPU]}
+    """
+    now = now or timezone.now()
+    stats = ForecastFitStat.objects.filter(created_at__gte=now - timedelta(days=days))
+
+    backends = []
+    for row in stats.values('kind', 'backend').annotate(
+        fits=Count('id'),
+        failures=Count('id', filter=Q(ok=False)),
+        refits=Count('id', filter=Q(refit=True)),
+        total_seconds=Sum('fit_seconds'),
+        avg_seconds=Avg('fit_seconds'),
+        avg_nobs=Avg('nobs'),
+        avg_aic=Avg('aic'),
+        avg_bic=Avg('bic'),
+        mae_cpu=Avg('mae_cpu'),
+        mape_cpu=Avg('mape_cpu'),
+        mae_memory=Avg('mae_memory'),
+        mape_memory=Avg('mape_memory'),
+    ).order_by('kind', 'backend'):
+        backends.append({
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in row.items()
+        })
+
+    entities = []
+    for row in stats.filter(evaluated_points__gt=0).values('kind', 'entity_id', 'name').annotate(
+        fits=Count('id'),
+        avg_seconds=Avg('fit_seconds'),
+        mae_cpu=Avg('mae_cpu'),
+        mape_cpu=Avg('mape_cpu'),
+        mape_memory=Avg('mape_memory'),
+    ).order_by('-mape_cpu')[:20]:
+        entities.append({
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in row.items()
+        })
+
+    return {'days': days, 'backends': backends, 'entities': entities}
@@ -1,179 +1,305 @@
-import pandas as pd
+"""
+Predicción de uso de recursos de servidores y VMs.
+
+Cada tipo de entidad usa un backend (Forecaster) configurable en
+settings.FORECAST_BACKENDS:
+
+- 'sarima': SARIMAX por entidad en el pool de procesos de forecast_engine,
+  para la planificación de capacidad de los servidores.
+- 'holt_winters' / 'ewma': suavizado exponencial vectorizado con NumPy; ajusta
+  todas las entidades a la vez como una matriz 2-D y calcula la banda esperada
+  con cuantiles del error reciente. Es la línea base de anomalías de las VMs.
+"""
+import logging
+import time
+from datetime import timedelta
+
 import numpy as np
-from statsmodels.tsa.statespace.sarimax import SARIMAX
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
-from submodulos.models import ProxmoxServer, ServerMetric, ServerPrediction
-from submodulos.models import MaquinaVirtual, VMMetric, VMPrediction
+
+from submodulos.models import ProxmoxServer, MaquinaVirtual, ForecastRun
+from submodulos.logic.forecast_engine import (
+    SARIMA_ORDERS, ForecastCycle, ForecastResult, load_server_tasks, load_vm_tasks, run_tasks, save_results,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKENDS = {'server': 'sarima', 'vm': 'holt_winters'}
+
+
+class Forecaster:
+    """Backend de predicción: recibe tareas y devuelve un ForecastResult por tarea, en orden"""
+    name = None
+
+    def predict(self, tasks, workers=None):
+        raise NotImplementedError
+
+
+class SarimaForecaster(Forecaster):
+    name = 'sarima'
+
+    def predict(self, tasks, workers=None):
+        return run_tasks(tasks, workers=workers)
+
+
+class SmoothingForecaster(Forecaster):
+    """
+    Holt-Winters aditivo con tendencia amortiguada, vectorizado sobre todas las
+    series. Sin estacionalidad (season=None) equivale a un EWMA con tendencia.
+    """
+
+    def __init__(self, name, season=24, alpha=0.3, beta=0.05, gamma=0.2, phi=0.98, quantile=0.95):
+        self.name = name
+        self.season = season
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.phi = phi
+        self.quantile = quantile
+
+    @staticmethod
+    def hourly_matrix(tasks, hours):
+        """
+        Coloca las series (ya horarias) de las tareas en una rejilla común que
+        termina en la última hora con datos de cualquiera de ellas.
+
+        Returns:
+            tuple: (valores (2, n, hours) con NaN donde no hay datos,
+                    horas observadas por serie (n,), última hora de la rejilla)
+        """
+        last = max(t.start + timedelta(hours=len(t.cpu) - 1) for t in tasks if len(t.cpu))
+        grid_start = last - timedelta(hours=hours - 1)
+
+        values = np.full((2, len(tasks), hours), np.nan)
+        for row, task in enumerate(tasks):
+            if not len(task.cpu):
+                continue
+            offset = int((task.start - grid_start).total_seconds() // 3600)
+            skip = max(-offset, 0)
+            offset = max(offset, 0)
+            length = min(len(task.cpu) - skip, hours - offset)
+            if length > 0:
+                values[0, row, offset:offset + length] = task.cpu[skip:skip + length]
+                values[1, row, offset:offset + length] = task.memory[skip:skip + length]
+        return values, (~np.isnan(values[0])).sum(axis=1), last
+
+    @staticmethod
+    def fill_gaps(values):
+        """Rellena huecos hacia delante y los iniciales con el primer valor observado"""
+        missing = np.isnan(values)
+        positions = np.where(missing, 0, np.arange(values.shape[-1]))
+        np.maximum.accumulate(positions, axis=-1, out=positions)
+        filled = np.take_along_axis(values, positions, axis=-1)
+        first = np.take_along_axis(values, np.argmax(~missing, axis=-1)[..., None], axis=-1)
+        return np.where(np.isnan(filled), first, filled)
+
+    def smooth(self, y, steps):
+        """
+        Ajusta todas las filas de `y` (m, horas) a la vez.
+
+        Returns:
+            tuple: (predicción (m, steps), semiancho de la banda (m,))
+        """
+        rows, hours = y.shape
+        seasonal_on = bool(self.season) and hours >= 2 * self.season
+
+        if seasonal_on:
+            season = self.season
+            level = y[:, :season].mean(axis=1)
+            trend = (y[:, season:2 * season].mean(axis=1) - level) / season
+            seasonal = y[:, :season] - level[:, None]
+        else:
+            level = y[:, 0].copy()
+            trend = np.zeros(rows)
+            seasonal = np.zeros((rows, 1))
+            season = 1
+
+        errors = np.empty((rows, hours))
+        for t in range(hours):
+            s = seasonal[:, t % season]
+            errors[:, t] = y[:, t] - (level + self.phi * trend + s)
+            new_level = self.alpha * (y[:, t] - s) + (1 - self.alpha) * (level + self.phi * trend)
+            trend = self.beta * (new_level - level) + (1 - self.beta) * self.phi * trend
+            if seasonal_on:
+                seasonal[:, t % season] = self.gamma * (y[:, t] - new_level) + (1 - self.gamma) * s
+            level = new_level
+
+        horizon = np.arange(1, steps + 1)
+        damped = np.cumsum(self.phi ** horizon)
+        forecast = (level[:, None] + damped[None, :] * trend[:, None]
+                    + seasonal[:, (hours + horizon - 1) % season])
+        # Banda: cuantil del error absoluto a un paso tras el calentamiento
+        warmup = min(season, hours - 1)
+        band = np.nanquantile(np.abs(errors[:, warmup:]), self.quantile, axis=1)
+        return forecast, band
+
+    def predict(self, tasks, workers=None):
+        started = time.monotonic()
+        results = [ForecastResult(t.kind, t.entity_id, t.name) for t in tasks]
+        if not any(len(t.cpu) for t in tasks):
+            for result in results:
+                result.skipped = True
+                result.error = "Sin datos"
+            return results
+
+        kind = tasks[0].kind
+        config = SARIMA_ORDERS[kind]
+        steps = tasks[0].steps
+        values, observed, last = self.hourly_matrix(tasks, config['history_days'] * 24)
+        enough = observed >= config['min_points']
+        if not enough.any():
+            for row, result in enumerate(results):
+                result.skipped = True
+                result.error = f"Datos insuficientes ({observed[row]}h < {config['min_points']}h)"
+            return results
+
+        forecast, band = self.smooth(self.fill_gaps(values[:, enough]).reshape(-1, values.shape[-1]), steps)
+        forecast = np.clip(forecast, 0, 100).reshape(2, -1, steps)
+        band = band.reshape(2, -1)
+
+        timestamps = [last + timedelta(hours=i + 1) for i in range(steps)]
+        elapsed = (time.monotonic() - started) / len(tasks)
+        column = 0
+        for row, result in enumerate(results):
+            result.elapsed = elapsed
+            result.backend = self.name
+            result.nobs = int(observed[row])
+            if not enough[row]:
+                result.skipped = True
+                result.error = f"Datos insuficientes ({observed[row]}h < {config['min_points']}h)"
+                continue
+            cpu = forecast[0, column]
+            result.timestamps = timestamps
+            result.cpu = cpu.tolist()
+            result.memory = forecast[1, column].tolist()
+            result.cpu_lower = np.clip(cpu - band[0, column], 0, 100).tolist()
+            result.cpu_upper = np.clip(cpu + band[0, column], 0, 100).tolist()
+            column += 1
+        return results
+
+
+FORECASTERS = {
+    forecaster.name: forecaster for forecaster in (
+        SarimaForecaster(),
+        SmoothingForecaster('holt_winters'),
+        SmoothingForecaster('ewma', season=None),
+    )
+}
+
+
+def get_forecaster(kind):
+    """Backend configurado para un tipo de entidad ('server' o 'vm')"""
+    from django.conf import settings
+
+    backends = dict(DEFAULT_BACKENDS)
+    backends.update(getattr(settings, 'FORECAST_BACKENDS', {}))
+    return FORECASTERS[backends[kind]]
+
+
+def run_cycle(servers=(), vms=(), steps=48, workers=None, force_refit=False, evaluate=True):
+    """
+    Ciclo completo: carga en bloque, ajuste con el backend de cada tipo y
+    escritura en lote.
+
+    Args:
+        evaluate (bool): evaluar al terminar las ejecuciones anteriores; los
+            fragmentos de Celery lo desactivan (lo hace una vez el planificador).
+
+    Returns:
+        ForecastCycle
+    """
+    started = time.monotonic()
+    run = ForecastRun.objects.create()
+    try:
+        results = []
+        for tasks in (load_server_tasks(servers, steps, force_refit=force_refit),
+                      load_vm_tasks(vms, steps, force_refit=force_refit)):
+            if tasks:
+                results.extend(get_forecaster(tasks[0].kind).predict(tasks, workers=workers))
+
+        cycle = ForecastCycle(results=results, run_id=run.pk)
+        cycle.saved = save_results(results, run=run)
+    except Exception:
+        ForecastRun.objects.filter(pk=run.pk).update(status='failed', finished_at=timezone.now())
+        raise
+    cycle.elapsed = time.monotonic() - started
+
+    # Error real de las ejecuciones anteriores cuyas horas ya tienen datos
+    if evaluate:
+        try:
+            from submodulos.logic.forecast_stats import evaluate_pending
+            evaluate_pending()
+        except Exception as e:
+            logger.warning(f"No se pudieron evaluar las predicciones anteriores: {e}")
+
+    for result in cycle.failures:
+        logger.warning(f"Predicción fallida para {result.kind} {result.name}: {result.error}")
+    logger.info(f"Ciclo de predicción: {cycle.summary()}")
+    return cycle
+
+
+def forecast_shards(server_ids, vm_ids, vm_shard_size=None):
+    """
+    Reparte las entidades en fragmentos para las tareas de Celery: un servidor
+    por fragmento (SARIMA, ajuste caro) y las VMs en bloques, porque el
+    suavizado vectorizado es más eficiente con muchas series a la vez.
+
+    Returns:
+        list: [(server_ids, vm_ids), ...]
+    """
+    from django.conf import settings
+
+    size = vm_shard_size or getattr(settings, 'FORECAST_VM_SHARD_SIZE', 200)
+    server_ids, vm_ids = list(server_ids), list(vm_ids)
+    shards = [([server_id], []) for server_id in server_ids]
+    shards += [([], vm_ids[i:i + size]) for i in range(0, len(vm_ids), size)]
+    return shards
+
+
+def complete_predictions(queryset):
+    """Filtra predicciones escritas por ejecuciones completas (o anteriores a ForecastRun)"""
+    return queryset.filter(Q(run__isnull=True) | Q(run__status='complete'))
+
+
+def _predict_one(task, label):
+    result = get_forecaster(task.kind).predict([task])[0]
+    if result.skipped:
+        print(f"{result.error} para {label}")
+        return result
+    if result.error:
+        print(f"Error generando predicciones para {label}: {result.error}")
+        return result
+    save_results([result])
+    print(f"Predicciones generadas para {label} ({task.steps} horas, {result.elapsed:.1f}s)")
+    return result
+
 
 def train_and_predict_server(server_id, steps=48):
     """
-    Entrena un modelo SARIMA para un servidor específico y genera predicciones.
-    
+    Entrena el modelo de un servidor específico y genera predicciones.
+
+    Para varios servidores a la vez usar run_cycle.
+
     Args:
         server_id (int): ID del ProxmoxServer.
         steps (int): Número de pasos (horas) a predecir. Default: 48 horas (2 días).
     """
     try:
         server = ProxmoxServer.objects.get(pk=server_id)
-        
-        # 1. Obtener datos históricos (últimos 30 días para entrenar)
-        start_date = timezone.now() - timedelta(days=30)
- 
-        # Corrigiendo modelo y campos: Usamos ServerMetric (singular) y created_at
-        # Nota: Usamos la relación ForeignKey directa 'server'
-        metrics = ServerMetric.objects.filter(
-            server=server, 
-            timestamp__gte=start_date
-        ).order_by('timestamp').values('timestamp', 'cpu_usage', 'ram_usage')
-        
-        if not metrics:
-            print(f"No hay métricas suficientes para el servidor {server.name} (nodo: {server.node_name})")
-            return
-
-        df = pd.DataFrame(metrics)
-        # Renombrar columnas para estandarizar
-        df.rename(columns={'ram_usage': 'memory_usage'}, inplace=True)
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-        
-        # Resamplear a promedios horarios para suavizar y reducir ruido
-        df_resampled = df.resample('h').mean().ffill()
-        
-        if len(df_resampled) < 24:
-             print(f"Datos insuficientes (menos de 24h) para entrenar modelo de servidor {server.name}")
-             return
-        
-        # 2. Entrenar Modelo CPU
-        # SARIMA(1, 1, 1)(1, 1, 1, 24) es un buen punto de partida genérico para datos horarios estacionales
-        model_cpu = SARIMAX(df_resampled['cpu_usage'], 
-                            order=(1, 1, 1), 
-                            seasonal_order=(1, 1, 1, 24),
-                            enforce_stationarity=False,
-                            enforce_invertibility=False)
-        results_cpu = model_cpu.fit(disp=False)
-        forecast_cpu = results_cpu.get_forecast(steps=steps)
-        predicted_cpu = forecast_cpu.predicted_mean
-        conf_int_cpu = forecast_cpu.conf_int()
-
-        # 3. Entrenar Modelo RAM
-        model_ram = SARIMAX(df_resampled['memory_usage'], 
-                            order=(1, 1, 1), 
-                            seasonal_order=(1, 1, 1, 24),
-                            enforce_stationarity=False,
-                            enforce_invertibility=False)
-        results_ram = model_ram.fit(disp=False)
-        forecast_ram = results_ram.get_forecast(steps=steps)
-        predicted_ram = forecast_ram.predicted_mean
-        
-        # 4. Guardar Predicciones
-        predictions_to_create = []
-        last_timestamp = df_resampled.index[-1]
-        
-        for i in range(steps):
-            future_time = last_timestamp + timedelta(hours=i+1)
-            
-            # Asegurar no negativos
-            cpu_val = max(0, predicted_cpu.iloc[i])
-            ram_val = max(0, predicted_ram.iloc[i])
-            
-            # Limpiar predicciones viejas para este timestamp si existen
-            ServerPrediction.objects.filter(server=server, timestamp=future_time).delete()
-            
-            predictions_to_create.append(
-                ServerPrediction(
-                    server=server,
-                    timestamp=future_time,
-                    predicted_cpu_usage=cpu_val,
-                    predicted_memory_usage=ram_val,
-                    confidence_lower=max(0, conf_int_cpu.iloc[i, 0]),
-                    confidence_upper=conf_int_cpu.iloc[i, 1]
-                )
-            )
-        
-        ServerPrediction.objects.bulk_create(predictions_to_create)
-        print(f"Predicciones generadas para {server.name} ({steps} horas)")
-        
+        task = load_server_tasks([server], steps)[0]
+        return _predict_one(task, f"servidor {server.name}")
     except Exception as e:
         print(f"Error generando predicciones para server {server_id}: {str(e)}")
 
+
 def train_and_predict_vm(vm_id, steps=48):
     """
     Genera predicciones para una VM específica para detección de anomalías.
     """
     try:
         vm = MaquinaVirtual.objects.get(pk=vm_id)
-        
-        # 1. Obtener datos históricos
-        start_date = timezone.now() - timedelta(days=14) 
-        
-        # Corrigiendo modelo: Usamos VMMetric (singular)
-        # Filtramos por vm_name = vm.nombre
-        metrics = VMMetric.objects.filter(
-            vm_name=vm.nombre, 
-            timestamp__gte=start_date
-        ).order_by('timestamp').values('timestamp', 'cpu_usage', 'ram_usage')
-        
-        if not metrics:
-            print(f"No hay métricas suficientes para la VM {vm.nombre}")
-            return
-
-        df = pd.DataFrame(metrics)
-        df.rename(columns={'ram_usage': 'memory_usage'}, inplace=True)
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-        
-        # Resamplear a promedios horarios
-        df_resampled = df.resample('h').mean().ffill()
-        
-        if len(df_resampled) < 12: # Mínimo datos para intentar algo
-             print(f"Datos insuficientes para entrenar modelo de VM {vm.nombre}")
-             return
-
-        # 2. Entrenar Modelo CPU
-        model_cpu = SARIMAX(df_resampled['cpu_usage'], 
-                            order=(1, 0, 1), 
-                            seasonal_order=(0, 0, 0, 0), 
-                            enforce_stationarity=False,
-                            enforce_invertibility=False)
-        results_cpu = model_cpu.fit(disp=False)
-        forecast_cpu = results_cpu.get_forecast(steps=steps)
-        predicted_cpu = forecast_cpu.predicted_mean
-
-        # 3. Entrenar Modelo RAM
-        model_ram = SARIMAX(df_resampled['memory_usage'], 
-                            order=(1, 0, 1),
-                            seasonal_order=(0, 0, 0, 0),
-                            enforce_stationarity=False,
-                            enforce_invertibility=False)
-        results_ram = model_ram.fit(disp=False)
-        forecast_ram = results_ram.get_forecast(steps=steps)
-        predicted_ram = forecast_ram.predicted_mean
-        
-        # 4. Guardar Predicciones
-        predictions_to_create = []
-        last_timestamp = df_resampled.index[-1]
-        
-        for i in range(steps):
-            future_time = last_timestamp + timedelta(hours=i+1)
-            
-            # Limpiar predicciones viejas
-            VMPrediction.objects.filter(vm=vm, timestamp=future_time).delete()
-            
-            predictions_to_create.append(
-                VMPrediction(
-                    vm=vm,
-                    timestamp=future_time,
-                    predicted_cpu_usage=max(0, predicted_cpu.iloc[i]),
-                    predicted_memory_usage=max(0, predicted_ram.iloc[i]),
-                    is_anomaly=False
-                )
-            )
-        
-        VMPrediction.objects.bulk_create(predictions_to_create)
-        print(f"Predicciones generadas para VM {vm.nombre}")
-        
+        task = load_vm_tasks([vm], steps)[0]
+        return _predict_one(task, f"VM {vm.nombre}")
     except Exception as e:
         print(f"Error generando predicciones para VM {vm_id}: {str(e)}")
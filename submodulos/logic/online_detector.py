@@ -0,0 +1,177 @@
+"""
+Detector de anomalías en línea para las métricas de VMs.
+
+Mantiene por serie (VM, métrica) una media y varianza con EWMA y puntúa cada
+muestra con un z-score antes de incorporarla: estado O(1) por serie, sin
+consultas a la BD en la ruta de ingesta. Las anomalías se acumulan en memoria
+y se escriben en lote (AgentLog y VMPrediction.is_anomaly) desde un
+comportamiento periódico del CerebroAgent, que también guarda el estado en
+DetectorCheckpoint para no perder la línea base al reiniciar.
+
+Configuración (settings):
+    ANOMALY_EWMA_ALPHA: peso de la muestra nueva en la media/varianza
+    ANOMALY_Z_THRESHOLD: |z| a partir del cual una muestra es anómala
+    ANOMALY_WARMUP: muestras necesarias antes de evaluar una serie
+    ANOMALY_MIN_STD: desviación mínima (puntos %) para series casi constantes
+    ANOMALY_COOLDOWN_SECONDS: silencio por serie tras emitir una anomalía
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULTS = {
+    'ANOMALY_EWMA_ALPHA': 0.05,
+    'ANOMALY_Z_THRESHOLD': 4.0,
+    'ANOMALY_WARMUP': 30,
+    'ANOMALY_MIN_STD': 2.0,
+    'ANOMALY_COOLDOWN_SECONDS': 300,
+}
+
+# Posiciones del estado de cada serie (lista para serializar en JSON)
+MEAN, VAR, COUNT, LAST_ALERT = range(4)
+
+
+def _setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+@dataclass
+class Anomaly:
+    vm_id: int
+    vm_name: str
+    node: str
+    metric: str
+    value: float
+    expected: float
+    zscore: float
+    timestamp: object
+
+
+class OnlineDetector:
+    """EWMA + z-score por serie; seguro para usar desde varios hilos"""
+
+    def __init__(self, name):
+        self.name = name
+        self.alpha = _setting('ANOMALY_EWMA_ALPHA')
+        self.threshold = _setting('ANOMALY_Z_THRESHOLD')
+        self.warmup = _setting('ANOMALY_WARMUP')
+        self.min_std = _setting('ANOMALY_MIN_STD')
+        self.cooldown = _setting('ANOMALY_COOLDOWN_SECONDS')
+        self.series = {}
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def update(self, key, value, now=None):
+        """
+        Puntúa una muestra y la incorpora a la serie.
+
+        Returns:
+            tuple: (z-score si la muestra es anómala o None, media esperada)
+        """
+        now = now or time.time()
+        with self._lock:
+            state = self.series.get(key)
+            if state is None:
+                self.series[key] = [value, 0.0, 1, 0.0]
+                return None, value
+
+            mean, var = state[MEAN], state[VAR]
+            zscore = (value - mean) / max(math.sqrt(var), self.min_std)
+
+            diff = value - mean
+            increment = self.alpha * diff
+            state[MEAN] = mean + increment
+            state[VAR] = (1 - self.alpha) * (var + diff * increment)
+            state[COUNT] += 1
+
+            if state[COUNT] <= self.warmup or abs(zscore) < self.threshold:
+                return None, mean
+            if now - state[LAST_ALERT] < self.cooldown:
+                return None, mean
+            state[LAST_ALERT] = now
+            return zscore, mean
+
+    def observe(self, vm_id, vm_name, node, metric, value):
+        """Actualiza la serie de una VM y encola la anomalía si la hay"""
+        series = vm_id if vm_id is not None else f"{vm_name}@{node}"
+        zscore, expected = self.update(f"{series}:{metric}", value)
+        if zscore is None:
+            return None
+        anomaly = Anomaly(vm_id, vm_name, node, metric, value, expected, zscore, timezone.now())
+        with self._lock:
+            self.pending.append(anomaly)
+        return anomaly
+
+    def drain(self):
+        with self._lock:
+            pending, self.pending = self.pending, []
+        return pending
+
+    # --- Persistencia ---
+
+    def load(self):
+        from submodulos.models import DetectorCheckpoint
+
+        checkpoint = DetectorCheckpoint.objects.filter(name=self.name).first()
+        if checkpoint:
+            with self._lock:
+                self.series = {key: list(state) for key, state in checkpoint.state.items()}
+        return len(self.series)
+
+    def checkpoint(self):
+        from submodulos.models import DetectorCheckpoint
+
+        with self._lock:
+            state = {key: list(values) for key, values in self.series.items()}
+        DetectorCheckpoint.objects.update_or_create(name=self.name, defaults={'state': state})
+        return len(state)
+
+    def flush(self, agent_name):
+        """Escribe las anomalías pendientes: un bulk_create de AgentLog y un UPDATE por VM"""
+        from submodulos.models import AgentLog, VMPrediction
+        from utils.live import publish_logs_on_commit
+
+        anomalies = self.drain()
+        if not anomalies:
+            return 0
+
+        logs = []
+        flagged = {}
+        for anomaly in anomalies:
+            label = 'CPU' if anomaly.metric == 'cpu' else 'RAM'
+            msg = (f"ANOMALIA DETECTADA en {anomaly.vm_name}: {label} Real {anomaly.value}% "
+                   f"vs Esperado {anomaly.expected:.2f}% (z={anomaly.zscore:.1f})")
+            print(msg)
+            logs.append(AgentLog(
+                agent_name=agent_name,
+                level="WARNING",
+                message=msg[:255],
+                details={
+                    "vm": anomaly.vm_name,
+                    "node": anomaly.node,
+                    "metric": anomaly.metric,
+                    "real": anomaly.value,
+                    "expected": round(anomaly.expected, 2),
+                    "zscore": round(anomaly.zscore, 2),
+                },
+            ))
+            if anomaly.vm_id is not None:
+                flagged.setdefault(anomaly.vm_id, anomaly.timestamp)
+
+        with transaction.atomic():
+            AgentLog.objects.bulk_create(logs)
+            # bulk_create no emite post_save: se publican aquí en el canal en vivo
+            publish_logs_on_commit(logs)
+            # Marca la predicción de la hora de la anomalía
+            for vm_id, moment in flagged.items():
+                VMPrediction.objects.filter(
+                    vm_id=vm_id,
+                    timestamp__range=(moment - timedelta(minutes=30), moment + timedelta(minutes=30))
+                ).update(is_anomaly=True)
+        return len(anomalies)
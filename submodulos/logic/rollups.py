@@ -0,0 +1,372 @@
+"""
+Agregación incremental (downsampling) de métricas en rollups de 1 minuto,
+1 hora y 1 día.
+
+Cada nivel se calcula a partir del anterior y solo sobre los datos nuevos
+desde su marca de agua (RollupWatermark):
+
+    ServerMetric/VMMetric --> 1m --> 1h --> 1d --> MetricsAggregation
+
+Los buckets se alinean en UTC y cada uno se calcula completo (los rangos
+procesados empiezan y terminan en un borde de bucket). Los promedios de los
+niveles superiores se ponderan por número de muestras.
+
+Las muestras que llegan después de su marca de agua (el buffer de escritura
+reintentó un lote más allá de ROLLUP_LAG_SECONDS) las anota el propio buffer
+(utils.write_buffer.late_since); la marca de agua de cada nivel retrocede
+hasta su bucket y esos buckets se recalculan.
+
+Los paneles de semana/mes y los modelos de predicción leen de aquí en lugar
+de recorrer las muestras en bruto (ver get_server_series / get_vm_series y
+submodulos.logic.timeseries).
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Max, Min, Sum
+from django.db.models.functions import Trunc
+
+from submodulos.models import (
+    MaquinaVirtual, MetricsAggregation, RollupWatermark, ServerMetric,
+    ServerMetricRollup, VMMetric, VMMetricRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+# Retraso respecto a "ahora" para no cerrar minutos que aún reciben muestras
+# (buffer de escritura, colector, reportes de agentes)
+DEFAULT_LAG_SECONDS = 120
+# Máximo de datos en bruto agregados por ejecución (recuperación gradual)
+DEFAULT_MAX_RAW_WINDOW = timedelta(hours=6)
+
+LEVELS = (('1m', 'minute'), ('1h', 'hour'), ('1d', 'day'))
+UTC = dt_timezone.utc
+
+
+def floor_to(moment, resolution):
+    moment = moment.astimezone(UTC).replace(second=0, microsecond=0)
+    if resolution in ('1h', '1d'):
+        moment = moment.replace(minute=0)
+    if resolution == '1d':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _get_watermark(name):
+    mark = RollupWatermark.objects.filter(name=name).first()
+    return mark.position if mark else None
+
+
+def _set_watermark(name, position):
+    RollupWatermark.objects.update_or_create(name=name, defaults={'position': position})
+
+
+def _weighted(field):
+    """Suma de field * sample_count (para promedios ponderados)"""
+    return Sum(ExpressionWrapper(F(field) * F('sample_count'), output_field=FloatField()))
+
+
+# --- Servidores ---
+
+SERVER_FIELDS = ['avg_cpu', 'max_cpu', 'avg_memory', 'max_memory', 'avg_disk', 'max_disk', 'sample_count']
+VM_FIELDS = ['avg_cpu', 'max_cpu', 'avg_memory', 'max_memory', 'sample_count']
+
+
+def _server_rows_from_raw(start, end):
+    return (
+        ServerMetric.objects
+        .filter(timestamp__gte=start, timestamp__lt=end, server__isnull=False)
+        .annotate(b=Trunc('timestamp', 'minute', tzinfo=UTC))
+        .values('server_id', 'b')
+        .annotate(
+            a_cpu=Avg('cpu_usage'), m_cpu=Max('cpu_usage'),
+            a_mem=Avg('ram_usage'), m_mem=Max('ram_usage'),
+            a_disk=Avg('disk_usage'), m_disk=Max('disk_usage'),
+            n=Count('id'),
+        )
+        .order_by()
+    )
+
+
+def _server_rows_from_rollup(source, kind, start, end):
+    return (
+        ServerMetricRollup.objects
+        .filter(resolution=source, bucket__gte=start, bucket__lt=end)
+        .annotate(b=Trunc('bucket', kind, tzinfo=UTC))
+        .values('server_id', 'b')
+        .annotate(
+            w_cpu=_weighted('avg_cpu'), m_cpu=Max('max_cpu'),
+            w_mem=_weighted('avg_memory'), m_mem=Max('max_memory'),
+            w_disk=_weighted('avg_disk'), m_disk=Max('max_disk'),
+            n=Sum('sample_count'),
+        )
+        .order_by()
+    )
+
+
+def _server_rollup(resolution, row):
+    n = row['n'] or 0
+    if 'w_cpu' in row:
+        avg = lambda key: (row[key] or 0) / n if n else 0.0
+        a_cpu, a_mem, a_disk = avg('w_cpu'), avg('w_mem'), avg('w_disk')
+    else:
+        a_cpu, a_mem, a_disk = row['a_cpu'], row['a_mem'], row['a_disk']
+    return ServerMetricRollup(
+        server_id=row['server_id'], resolution=resolution, bucket=row['b'],
+        avg_cpu=a_cpu or 0.0, max_cpu=row['m_cpu'] or 0.0,
+        avg_memory=a_mem or 0.0, max_memory=row['m_mem'] or 0.0,
+        avg_disk=a_disk or 0.0, max_disk=row['m_disk'] or 0.0,
+        sample_count=n,
+    )
+
+
+# --- VMs ---
+
+def _vm_rows_from_raw(start, end):
+    return (
+        VMMetric.objects
+        .filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(b=Trunc('timestamp', 'minute', tzinfo=UTC))
+        .values('server_origin', 'vm_name', 'b')
+        .annotate(
+            vm_ref=Max('vm_id'),
+            a_cpu=Avg('cpu_usage'), m_cpu=Max('cpu_usage'),
+            a_mem=Avg('ram_usage'), m_mem=Max('ram_usage'),
+            n=Count('id'),
+        )
+        .order_by()
+    )
+
+
+def _vm_rows_from_rollup(source, kind, start, end):
+    return (
+        VMMetricRollup.objects
+        .filter(resolution=source, bucket__gte=start, bucket__lt=end)
+        .annotate(b=Trunc('bucket', kind, tzinfo=UTC))
+        .values('server_origin', 'vm_name', 'b')
+        .annotate(
+            vm_ref=Max('vm_id'),
+            w_cpu=_weighted('avg_cpu'), m_cpu=Max('max_cpu'),
+            w_mem=_weighted('avg_memory'), m_mem=Max('max_memory'),
+            n=Sum('sample_count'),
+        )
+        .order_by()
+    )
+
+
+def _vm_rollup(resolution, row):
+    n = row['n'] or 0
+    if 'w_cpu' in row:
+        a_cpu = (row['w_cpu'] or 0) / n if n else 0.0
+        a_mem = (row['w_mem'] or 0) / n if n else 0.0
+    else:
+        a_cpu, a_mem = row['a_cpu'], row['a_mem']
+    return VMMetricRollup(
+        vm_id=row['vm_ref'], vm_name=row['vm_name'], server_origin=row['server_origin'],
+        resolution=resolution, bucket=row['b'],
+        avg_cpu=a_cpu or 0.0, max_cpu=row['m_cpu'] or 0.0,
+        avg_memory=a_mem or 0.0, max_memory=row['m_mem'] or 0.0,
+        sample_count=n,
+    )
+
+
+KINDS = {
+    'server': {
+        'raw': ServerMetric,
+        'rollup': ServerMetricRollup, 'fields': SERVER_FIELDS,
+        'unique': ['server', 'resolution', 'bucket'],
+        'from_raw': _server_rows_from_raw, 'from_rollup': _server_rows_from_rollup,
+        'build': _server_rollup,
+    },
+    'vm': {
+        'raw': VMMetric,
+        'rollup': VMMetricRollup, 'fields': VM_FIELDS + ['vm'],
+        'unique': ['server_origin', 'vm_name', 'resolution', 'bucket'],
+        'from_raw': _vm_rows_from_raw, 'from_rollup': _vm_rows_from_rollup,
+        'build': _vm_rollup,
+    },
+}
+
+
+def _save(spec, objs):
+    if not objs:
+        return
+    spec['rollup'].objects.bulk_create(
+        objs, batch_size=1000,
+        update_conflicts=True,
+        unique_fields=spec['unique'],
+        update_fields=spec['fields'],
+    )
+
+
+def _initial_position(spec, level_index):
+    """Primer bucket a procesar si el nivel nunca se ha ejecutado"""
+    resolution = LEVELS[level_index][0]
+    if level_index == 0:
+        first = spec['raw'].objects.order_by().aggregate(t=Min('timestamp'))['t']
+    else:
+        source = LEVELS[level_index - 1][0]
+        first = spec['rollup'].objects.filter(resolution=source).order_by().aggregate(t=Min('bucket'))['t']
+    return floor_to(first, resolution) if first else None
+
+
+def _rewind_for_late_rows(kind, spec):
+    """Retrocede las marcas de agua hasta las muestras insertadas con retraso"""
+    from utils.write_buffer import late_since
+
+    late = late_since(spec['raw'])
+    if late is None:
+        return
+    for resolution, _ in LEVELS:
+        name = f"{kind}:{resolution}"
+        position = _get_watermark(name)
+        target = floor_to(late, resolution)
+        if position is not None and target < position:
+            logger.info(f"Rollups {name}: muestras tardías, se recalcula desde {target:%Y-%m-%d %H:%M}")
+            _set_watermark(name, target)
+
+
+def rollup_kind(kind, now=None):
+    """
+    Procesa los tres niveles de un tipo ('server' o 'vm') desde sus marcas de agua.
+
+    Returns:
+        dict: {resolución: (desde, hasta, filas)} de los niveles que avanzaron.
+    """
+    spec = KINDS[kind]
+    now = now or datetime.now(UTC)
+    lag = timedelta(seconds=getattr(settings, 'ROLLUP_LAG_SECONDS', DEFAULT_LAG_SECONDS))
+    max_window = getattr(settings, 'ROLLUP_MAX_RAW_WINDOW', DEFAULT_MAX_RAW_WINDOW)
+    progress = {}
+
+    _rewind_for_late_rows(kind, spec)
+
+    upper = floor_to(now - lag, '1m')
+    for index, (resolution, trunc_kind) in enumerate(LEVELS):
+        name = f"{kind}:{resolution}"
+        start = _get_watermark(name) or _initial_position(spec, index)
+        if index == 0:
+            end = min(upper, floor_to(start + max_window, '1m')) if start else upper
+        else:
+            # Solo buckets completos del nivel anterior
+            end = floor_to(upper, resolution)
+        if start is None or end <= start:
+            upper = start or upper
+            continue
+
+        if index == 0:
+            rows = spec['from_raw'](start, end)
+        else:
+            rows = spec['from_rollup'](LEVELS[index - 1][0], trunc_kind, start, end)
+        objs = [spec['build'](resolution, row) for row in rows]
+
+        with transaction.atomic():
+            _save(spec, objs)
+            _set_watermark(name, end)
+        progress[resolution] = (start, end, len(objs))
+        upper = end
+
+    return progress
+
+
+def fill_daily_aggregations(start, end):
+    """Vuelca los rollups diarios de servidores en MetricsAggregation"""
+    daily = ServerMetricRollup.objects.filter(resolution='1d', bucket__gte=start, bucket__lt=end)
+    if not daily.exists():
+        return 0
+
+    # VMs activas por servidor y día (VMs con muestras ese día)
+    active = {}
+    for row in (
+        VMMetricRollup.objects.filter(resolution='1d', bucket__gte=start, bucket__lt=end, vm__isnull=False)
+        .values('vm__nodo__proxmox_server_id', 'bucket').annotate(n=Count('vm', distinct=True)).order_by()
+    ):
+        active[(row['vm__nodo__proxmox_server_id'], row['bucket'])] = row['n']
+    vm_totals = {
+        row['nodo__proxmox_server_id']: row['n']
+        for row in MaquinaVirtual.objects.values('nodo__proxmox_server_id').annotate(n=Count('vm_id')).order_by()
+    }
+
+    count = 0
+    for rollup in daily:
+        MetricsAggregation.objects.update_or_create(
+            server_id=rollup.server_id,
+            date=rollup.bucket.date(),
+            defaults={
+                'avg_cpu': rollup.avg_cpu, 'max_cpu': rollup.max_cpu,
+                'avg_memory': rollup.avg_memory, 'max_memory': rollup.max_memory,
+                'avg_disk': rollup.avg_disk, 'max_disk': rollup.max_disk,
+                'vm_count': vm_totals.get(rollup.server_id, 0),
+                'active_vm_count': active.get((rollup.server_id, rollup.bucket), 0),
+            }
+        )
+        count += 1
+    return count
+
+
+def purge_fine_rollups(now=None):
+    """Los rollups de 1 minuto solo se conservan unos días"""
+    days = getattr(settings, 'ROLLUP_1M_RETENTION_DAYS', 7)
+    cutoff = (now or datetime.now(UTC)) - timedelta(days=days)
+    deleted = 0
+    for model in (ServerMetricRollup, VMMetricRollup):
+        n, _ = model.objects.filter(resolution='1m', bucket__lt=cutoff).delete()
+        deleted += n
+    return deleted
+
+
+def run_rollups(now=None):
+    """Ejecución completa (tarea periódica)"""
+    summary = []
+    for kind in KINDS:
+        progress = rollup_kind(kind, now=now)
+        for resolution, (start, end, rows) in progress.items():
+            summary.append(f"{kind}:{resolution} {rows} buckets hasta {end:%Y-%m-%d %H:%M}")
+        if kind == 'server' and '1d' in progress:
+            start, end, _ = progress['1d']
+            fill_daily_aggregations(start, end)
+    purge_fine_rollups(now=now)
+    return summary
+
+
+# --- Lectura ---
+
+def pick_resolution(start, end=None):
+    """Resolución adecuada para un rango: <=1 día: 1m, <=31 días: 1h, más: 1d"""
+    span = (end or datetime.now(UTC)) - start
+    if span <= timedelta(days=1):
+        return '1m'
+    if span <= timedelta(days=31):
+        return '1h'
+    return '1d'
+
+
+def get_server_series(server, start, end=None, resolution=None):
+    """
+    Serie agregada de un servidor.
+
+    Returns:
+        list[dict]: {'timestamp', 'cpu_usage', 'memory_usage', 'disk_usage'} ordenada.
+    """
+    resolution = resolution or pick_resolution(start, end)
+    qs = ServerMetricRollup.objects.filter(server=server, resolution=resolution, bucket__gte=start)
+    if end:
+        qs = qs.filter(bucket__lt=end)
+    return [
+        {'timestamp': b, 'cpu_usage': cpu, 'memory_usage': mem, 'disk_usage': disk}
+        for b, cpu, mem, disk in qs.order_by('bucket').values_list('bucket', 'avg_cpu', 'avg_memory', 'avg_disk')
+    ]
+
+
+def get_vm_series(vm, start, end=None, resolution=None):
+    """Serie agregada de una VM: {'timestamp', 'cpu_usage', 'memory_usage'}"""
+    resolution = resolution or pick_resolution(start, end)
+    qs = VMMetricRollup.objects.filter(vm=vm, resolution=resolution, bucket__gte=start)
+    if end:
+        qs = qs.filter(bucket__lt=end)
+    return [
+        {'timestamp': b, 'cpu_usage': cpu, 'memory_usage': mem}
+        for b, cpu, mem in qs.order_by('bucket').values_list('bucket', 'avg_cpu', 'avg_memory')
+    ]
@@ -0,0 +1,135 @@
+"""
+Carga de series horarias alineadas para la predicción.
+
+Devuelve las series de muchas entidades como matrices NumPy sobre una rejilla
+horaria común (UTC), sin construir diccionarios por fila ni DataFrames:
+
+- Entidades con rollups de 1h: una consulta values_list recorrida con
+  iterator() (cursor de servidor en PostgreSQL).
+- Entidades sin rollups todavía: una consulta sobre las muestras en bruto con
+  la agregación horaria hecha en SQL (date_trunc + avg).
+
+Las horas sin datos quedan como NaN.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db.models import Avg
+from django.db.models.functions import Trunc
+
+from submodulos.models import ServerMetric, ServerMetricRollup, VMMetric, VMMetricRollup
+from submodulos.logic.rollups import floor_to
+
+UTC = dt_timezone.utc
+CHUNK_SIZE = 5000
+
+# tipo -> (rollup, clave en el rollup, modelo en bruto, clave en bruto, campo de RAM en bruto)
+SOURCES = {
+    'server': (ServerMetricRollup, 'server_id', ServerMetric, 'server_id', 'ram_usage'),
+    'vm': (VMMetricRollup, 'vm_id', VMMetric, 'vm_id', 'ram_usage'),
+}
+
+
+@dataclass
+class HourlyMatrix:
+    """Series horarias alineadas: fila i = entity_ids[i], columna j = start + j horas"""
+    entity_ids: list
+    start: datetime
+    cpu: np.ndarray      # (entidades, horas)
+    memory: np.ndarray   # (entidades, horas)
+
+    @property
+    def hours(self):
+        return self.cpu.shape[1]
+
+    def observed(self):
+        """Horas con datos por entidad"""
+        return (~np.isnan(self.cpu)).sum(axis=1)
+
+    def trimmed(self, row):
+        """
+        Serie de una entidad desde su primera hasta su última hora con datos.
+
+        Returns:
+            tuple: (inicio o None, cpu, memoria)
+        """
+        present = np.flatnonzero(~np.isnan(self.cpu[row]))
+        if not len(present):
+            return None, np.empty(0), np.empty(0)
+        first, last = present[0], present[-1] + 1
+        return (self.start + timedelta(hours=int(first)),
+                self.cpu[row, first:last].copy(),
+                self.memory[row, first:last].copy())
+
+
+def _fill(matrix, rows, index, start_epoch):
+    """Vuelca (entidad, hora, cpu, ram) en las matrices; devuelve las entidades vistas"""
+    seen = set()
+    hours = matrix.hours
+    for entity_id, bucket, cpu, memory in rows:
+        col = int((bucket.timestamp() - start_epoch) // 3600)
+        if 0 <= col < hours:
+            row = index[entity_id]
+            matrix.cpu[row, col] = cpu
+            matrix.memory[row, col] = memory
+            seen.add(entity_id)
+    return seen
+
+
+def load_hourly(kind, entity_ids, start, end=None):
+    """
+    Series horarias de CPU y RAM de varias entidades.
+
+    Args:
+        kind (str): 'server' o 'vm'.
+        entity_ids (list): IDs de ProxmoxServer o MaquinaVirtual.
+        start (datetime): inicio del histórico.
+        end (datetime): fin (exclusivo); por defecto ahora.
+
+    Returns:
+        HourlyMatrix
+    """
+    rollup_model, rollup_key, raw_model, raw_key, raw_memory = SOURCES[kind]
+    entity_ids = list(entity_ids)
+    start = floor_to(start, '1h')
+    end = end or datetime.now(UTC)
+    hours = max(int((floor_to(end, '1h') - start).total_seconds() // 3600) + 1, 0)
+
+    matrix = HourlyMatrix(
+        entity_ids=entity_ids,
+        start=start,
+        cpu=np.full((len(entity_ids), hours), np.nan),
+        memory=np.full((len(entity_ids), hours), np.nan),
+    )
+    if not entity_ids or not hours:
+        return matrix
+
+    index = {entity_id: row for row, entity_id in enumerate(entity_ids)}
+    start_epoch = start.timestamp()
+
+    rows = (
+        rollup_model.objects
+        .filter(**{f'{rollup_key}__in': entity_ids}, resolution='1h', bucket__gte=start, bucket__lt=end)
+        .order_by()
+        .values_list(rollup_key, 'bucket', 'avg_cpu', 'avg_memory')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    seen = _fill(matrix, rows, index, start_epoch)
+
+    missing = [entity_id for entity_id in entity_ids if entity_id not in seen]
+    if missing:
+        # Sin rollups todavía: promedios horarios calculados en SQL
+        rows = (
+            raw_model.objects
+            .filter(**{f'{raw_key}__in': missing}, timestamp__gte=start, timestamp__lt=end)
+            .annotate(hour=Trunc('timestamp', 'hour', tzinfo=UTC))
+            .values(raw_key, 'hour')
+            .annotate(cpu=Avg('cpu_usage'), memory=Avg(raw_memory))
+            .order_by()
+            .values_list(raw_key, 'hour', 'cpu', 'memory')
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        _fill(matrix, rows, index, start_epoch)
+
+    return matrix
@@ -1,85 +1,108 @@
-import csv
-import argparse
-from django.core.management.base import BaseCommand
-from submodulos.models import ServerPrediction, ServerMetric, ProxmoxServer
+from django.core.management.base import BaseCommand, CommandError
+from submodulos.logic.exports import (
+    COLUMNAR_FORMATS, DATASETS, export_rows, filtered_queryset, parse_bound, write_columnar, write_csv,
+)
 
 class Command(BaseCommand):
-    help = 'Exporta datos de predicciones y/o métricas históricas a CSV.'
+    help = 'Exporta datos de predicciones y/o métricas históricas a CSV, Parquet o Arrow.'
 
     def add_arguments(self, parser):
         parser.add_argument('--server', type=str, help='Nombre del servidor para filtrar')
         parser.add_argument('--output', type=str, default='predictions_export.csv', help='Ruta del archivo de salida')
         parser.add_argument('--include-history', action='store_true', help='Incluir métricas históricas (ServerMetric) en un archivo separado')
         parser.add_argument('--console', action='store_true', help='Imprimir tabla en la consola')
+        parser.add_argument('--start', type=str, help='Fecha inicial (YYYY-MM-DD o ISO)')
+        parser.add_argument('--end', type=str, help='Fecha final (YYYY-MM-DD incluida, o ISO)')
+        parser.add_argument('--gzip', action='store_true', help='Comprimir los archivos con gzip (.csv.gz)')
+        parser.add_argument('--format', choices=['csv', *COLUMNAR_FORMATS], default='csv',
+                            help='Formato de salida (parquet/arrow requieren pyarrow)')
+        parser.add_argument('--partition', action='store_true',
+                            help='Parquet/Arrow: escribir un directorio particionado por día y servidor')
 
     def handle(self, *args, **options):
         server_name = options['server']
         output_file = options['output']
         include_history = options['include_history']
         show_console = options['console']
+        compress = options['gzip']
+        export_format = options['format']
+        partition = options['partition']
 
-        # Exportar Predicciones
-        predictions = ServerPrediction.objects.all().order_by('-timestamp')
-        if server_name:
-            predictions = predictions.filter(server__name=server_name)
-            if not predictions.exists():
-                self.stdout.write(self.style.WARNING(f'No se encontraron predicciones para el servidor "{server_name}"'))
+        if export_format == 'csv':
+            if partition:
+                raise CommandError('--partition solo aplica a --format parquet/arrow')
+        else:
+            if compress:
+                raise CommandError('--gzip solo aplica a CSV (Parquet ya va comprimido)')
+            extension = COLUMNAR_FORMATS[export_format][0]
+            if output_file.endswith('.csv'):
+                output_file = output_file[:-len('.csv')] + ('' if partition else f'.{extension}')
 
-        if predictions.exists():
-            if show_console:
-                self.stdout.write(self.style.SUCCESS(f"\nPredicciones para {server_name if server_name else 'todos los servidores'}:"))
-                self.stdout.write("-" * 120)
-                self.stdout.write(f"{'Servidor':<20} | {'Fecha y Hora':<20} | {'CPU (%)':<10} | {'RAM (%)':<10} | {'Confianza':<15} | {'Creado':<20}")
-                self.stdout.write("-" * 120)
-                
-                for pred in predictions[:20]: # Mostrar solo las primeras 20 en consola para no saturar
-                    self.stdout.write(f"{pred.server.name:<20} | {pred.timestamp.strftime('%Y-%m-%d %H:%M'):<20} | {pred.predicted_cpu_usage:<10.2f} | {pred.predicted_memory_usage:<10.2f} | {pred.confidence_lower:.2f}-{pred.confidence_upper:.2f} | {pred.created_at.strftime('%H:%M:%S'):<20}")
-                
-                if predictions.count() > 20:
-                     self.stdout.write(f"... y {predictions.count() - 20} más.")
-                self.stdout.write("-" * 120 + "\n")
+        try:
+            filters = {
+                'start': parse_bound(options['start']),
+                'end': parse_bound(options['end'], end=True),
+                'server': server_name,
+            }
+        except ValueError as e:
+            raise CommandError(str(e))
 
-            with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['Server', 'Timestamp', 'Predicted CPU (%)', 'Predicted Memory (%)', 'Confidence Lower', 'Confidence Upper', 'Created At']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        if compress and not output_file.endswith('.gz'):
+            output_file += '.gz'
 
-                writer.writeheader()
-                for pred in predictions:
-                    writer.writerow({
-                        'Server': pred.server.name,
-                        'Timestamp': pred.timestamp,
-                        'Predicted CPU (%)': pred.predicted_cpu_usage,
-                        'Predicted Memory (%)': pred.predicted_memory_usage,
-                        'Confidence Lower': pred.confidence_lower,
-                        'Confidence Upper': pred.confidence_upper,
-                        'Created At': pred.created_at,
-                    })
-            if not show_console:
-                 self.stdout.write(self.style.SUCCESS(f'Predicciones exportadas exitosamente a "{output_file}"'))
+        # Exportar Predicciones
+        if show_console:
+            self.print_console(server_name, filters)
 
+        written = self.write('server_predictions', output_file, filters, export_format, compress, partition)
+        if not written:
+            if server_name:
+                self.stdout.write(self.style.WARNING(f'No se encontraron predicciones para el servidor "{server_name}"'))
+        elif not show_console:
+            self.stdout.write(self.style.SUCCESS(f'Predicciones exportadas exitosamente a "{output_file}" ({written} filas)'))
 
         # Exportar Histórico si se solicita
         if include_history:
-            history_file = output_file.replace('.csv', '_history.csv')
-            metrics = ServerMetric.objects.all()
-            if server_name:
-                metrics = metrics.filter(server__name=server_name)
-            
-            if metrics.exists():
-                with open(history_file, 'w', newline='', encoding='utf-8') as csvfile:
-                    fieldnames = ['Server', 'Timestamp', 'CPU Usage (%)', 'RAM Usage (%)', 'Disk Usage (%)', 'Uptime']
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    
-                    writer.writeheader()
-                    for metric in metrics:
-                        writer.writerow({
-                             'Server': metric.server.name if metric.server else 'Unknown',
-                             'Timestamp': metric.timestamp,
-                             'CPU Usage (%)': metric.cpu_usage,
-                             'RAM Usage (%)': metric.ram_usage,
-                             'Disk Usage (%)': metric.disk_usage,
-                             'Uptime': metric.uptime
-                        })
-                self.stdout.write(self.style.SUCCESS(f'Métricas históricas exportadas exitosamente a "{history_file}"'))
+            history_file = self.history_path(output_file, export_format, partition)
+            written = self.write('server_history', history_file, filters, export_format, compress, partition)
+            if written:
+                self.stdout.write(self.style.SUCCESS(f'Métricas históricas exportadas exitosamente a "{history_file}" ({written} filas)'))
             else:
-                 self.stdout.write(self.style.WARNING('No hay métricas históricas para exportar.'))
+                self.stdout.write(self.style.WARNING('No hay métricas históricas para exportar.'))
+
+    def write(self, name, path, filters, export_format, compress, partition):
+        header, rows = export_rows(name, **filters)
+        if export_format == 'csv':
+            return write_csv(path, header, rows, compress=compress)
+        try:
+            return write_columnar(path, name, rows, fmt=export_format, partition=partition)
+        except ImportError as e:
+            raise CommandError(str(e))
+
+    @staticmethod
+    def history_path(output_file, export_format, partition):
+        if partition:
+            return f"{output_file}_history"
+        marker = '.csv' if export_format == 'csv' else f".{COLUMNAR_FORMATS[export_format][0]}"
+        head, found, tail = output_file.rpartition(marker)
+        return f"{head}_history{marker}{tail}" if found else f"{output_file}_history"
+
+    def print_console(self, server_name, filters):
+        """Primeras 20 predicciones en una sola consulta (21 filas para saber si hay más)"""
+        fields = DATASETS['server_predictions'].fields
+        preview = list(filtered_queryset('server_predictions', **filters).values_list(*fields)[:21])
+        if not preview:
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"\nPredicciones para {server_name if server_name else 'todos los servidores'}:"))
+        self.stdout.write("-" * 120)
+        self.stdout.write(f"{'Servidor':<20} | {'Fecha y Hora':<20} | {'CPU (%)':<10} | {'RAM (%)':<10} | {'Confianza':<15} | {'Creado':<20}")
+        self.stdout.write("-" * 120)
+
+        for name, timestamp, cpu, memory, lower, upper, created_at in preview[:20]: # Mostrar solo las primeras 20 en consola para no saturar
+            confidence = f"{lower:.2f}-{upper:.2f}" if lower is not None and upper is not None else "-"
+            self.stdout.write(f"{name or 'Unknown':<20} | {timestamp.strftime('%Y-%m-%d %H:%M'):<20} | {cpu:<10.2f} | {memory:<10.2f} | {confidence:<15} | {created_at.strftime('%H:%M:%S'):<20}")
+
+        if len(preview) > 20:
+            self.stdout.write("... y más (ver el archivo exportado).")
+        self.stdout.write("-" * 120 + "\n")
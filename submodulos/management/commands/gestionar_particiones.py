@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from submodulos.partitioning import maintain
+
+
+class Command(BaseCommand):
+    help = 'Crea particiones futuras de métricas y aplica la retención configurada'
+
+    def handle(self, *args, **options):
+        summary = maintain()
+        if not summary:
+            self.stdout.write('Particiones al día, sin cambios.')
+        for line in summary:
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS('✅ Mantenimiento de particiones completado'))
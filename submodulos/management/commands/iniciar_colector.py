@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+import asyncio
+from submodulos.collector import CollectorService, collect_once
+
+
+class Command(BaseCommand):
+    help = 'Inicia el colector de métricas Proxmox (único proceso que sondea los clusters)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=None, help='Segundos entre sondeos')
+        parser.add_argument('--persist-interval', type=int, default=None,
+                            help='Segundos entre escrituras en las tablas de métricas')
+        parser.add_argument('--once', action='store_true', help='Ejecuta un único ciclo y termina')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            for line in collect_once(persist=True):
+                self.stdout.write(line)
+            return
+
+        service = CollectorService(
+            interval=options['interval'],
+            persist_interval=options['persist_interval']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'📡 COLECTOR INICIADO (cada {service.interval}s, persistencia cada {service.persist_interval}s)'
+        ))
+
+        async def main():
+            # systemctl stop envía SIGTERM: detener el bucle y vaciar el buffer de escritura
+            service.install_signal_handlers()
+            await service.run()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('\n🛑 Colector detenido.')
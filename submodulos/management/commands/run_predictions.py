@@ -1,31 +1,43 @@
 from django.core.management.base import BaseCommand
 from submodulos.models import ProxmoxServer, MaquinaVirtual
-from submodulos.logic.forecasting import train_and_predict_server, train_and_predict_vm
+from submodulos.logic.forecasting import run_cycle
 
 class Command(BaseCommand):
-    help = 'Generates SARIMA predictions for Servers and VMs'
+    help = 'Generates predictions for Servers (SARIMA) and VMs (FORECAST_BACKENDS)'
 
     def add_arguments(self, parser):
         parser.add_argument('--servers', action='store_true', help='Predict for Servers only')
         parser.add_argument('--vms', action='store_true', help='Predict for VMs only')
         parser.add_argument('--days', type=int, default=1, help='Days to predict ahead (default: 1 day / 24 hours)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes for model fitting (default: FORECAST_WORKERS or CPU count; 0 = inline)')
+        parser.add_argument('--refit', action='store_true',
+                            help='Ignore stored model parameters and refit every model from scratch')
 
     def handle(self, *args, **options):
         steps = options['days'] * 24
         run_all = not options['servers'] and not options['vms']
-        
+
+        servers = []
+        vms = []
         if run_all or options['servers']:
-            self.stdout.write("Starting Server predictions...")
-            servers = ProxmoxServer.objects.filter(is_active=True)
-            for server in servers:
-                self.stdout.write(f"Processing Server: {server.name}")
-                train_and_predict_server(server.pk, steps=steps)
-        
+            servers = list(ProxmoxServer.objects.filter(is_active=True))
         if run_all or options['vms']:
-            self.stdout.write("Starting VM predictions...")
-            vms = MaquinaVirtual.objects.filter(estado='running') # Solo VMs encendidas
-            for vm in vms:
-                self.stdout.write(f"Processing VM: {vm.nombre}")
-                train_and_predict_vm(vm.pk, steps=steps)
-                
-        self.stdout.write(self.style.SUCCESS('Prediction cycle completed.'))
+            vms = list(MaquinaVirtual.objects.filter(estado='running')) # Solo VMs encendidas
+
+        self.stdout.write(f"Starting predictions for {len(servers)} servers and {len(vms)} VMs...")
+        cycle = run_cycle(servers=servers, vms=vms, steps=steps, workers=options['workers'],
+                          force_refit=options['refit'])
+
+        for result in cycle.results:
+            label = f"{'Server' if result.kind == 'server' else 'VM'}: {result.name}"
+            if result.ok:
+                refits = [f"{metric}: {reason}" for metric, reason in result.refits.items() if reason]
+                mode = f"refit {', '.join(refits)}" if refits else "warm start"
+                self.stdout.write(f"  ✓ {label} ({result.elapsed:.1f}s, {mode})")
+            elif result.skipped:
+                self.stdout.write(f"  - {label}: {result.error}")
+            else:
+                self.stdout.write(self.style.ERROR(f"  ✗ {label} ({result.elapsed:.1f}s): {result.error}"))
+
+        self.stdout.write(self.style.SUCCESS(f'Prediction cycle completed: {cycle.summary()}'))
@@ -0,0 +1,31 @@
+# Los timestamps de métricas pasan de auto_now_add a default=timezone.now para
+# conservar la hora de captura cuando las filas se insertan por lotes
+# (utils.write_buffer). No modifica el esquema de la base de datos.
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0008_alter_servermetric_options_alter_vmmetric_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='localmetric',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='servermetric',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Registro'),
+        ),
+        migrations.AlterField(
+            model_name='vmmetric',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Registro'),
+        ),
+    ]
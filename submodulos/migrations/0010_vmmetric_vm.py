@@ -0,0 +1,18 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0009_metric_timestamps_default_now'),
+    ]
+
+    operations = [
+        # Columna nullable sin default: en PostgreSQL es un cambio solo de catálogo
+        migrations.AddField(
+            model_name='vmmetric',
+            name='vm',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='metrics', to='submodulos.maquinavirtual'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Asigna VMMetric.vm a partir del texto libre vm_name/server_origin.
+#
+# Se recorre la tabla por rangos de id y cada lote se actualiza en su propia
+# transacción (atomic = False) para no bloquear los insertos del colector
+# durante todo el backfill.
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+
+def backfill_vm(apps, schema_editor):
+    VMMetric = apps.get_model('submodulos', 'VMMetric')
+    MaquinaVirtual = apps.get_model('submodulos', 'MaquinaVirtual')
+
+    # (nombre, nodo) identifica la VM; si el nodo no coincide se usa la primera por nombre
+    by_node = {}
+    by_name = {}
+    for vm_id, nombre, nodo_nombre in MaquinaVirtual.objects.order_by('vm_id').values_list(
+        'vm_id', 'nombre', 'nodo__nombre'
+    ):
+        by_node.setdefault((nombre, nodo_nombre), vm_id)
+        by_name.setdefault(nombre, vm_id)
+    if not by_name:
+        return
+
+    pending = VMMetric.objects.filter(vm__isnull=True)
+    last_id = 0
+    while True:
+        rows = list(
+            pending.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'vm_name', 'server_origin')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        ids_by_vm = {}
+        for metric_id, vm_name, server_origin in rows:
+            vm_id = by_node.get((vm_name, server_origin)) or by_name.get(vm_name)
+            if vm_id is not None:
+                ids_by_vm.setdefault(vm_id, []).append(metric_id)
+
+        with transaction.atomic():
+            for vm_id, ids in ids_by_vm.items():
+                VMMetric.objects.filter(id__in=ids).update(vm_id=vm_id)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('submodulos', '0010_vmmetric_vm'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_vm, migrations.RunPython.noop),
+    ]
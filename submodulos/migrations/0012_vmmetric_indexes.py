@@ -0,0 +1,29 @@
+# Índices de series temporales de VMMetric creados con CREATE INDEX CONCURRENTLY
+# para no bloquear las escrituras sobre una tabla de millones de filas.
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('submodulos', '0011_backfill_vmmetric_vm'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='vmmetric',
+            index=models.Index(fields=['vm', 'timestamp'], name='vmmetric_vm_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='vmmetric',
+            index=models.Index(fields=['server_origin', 'timestamp'], name='vmmetric_origin_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='vmmetric',
+            index=models.Index(fields=['timestamp'], name='vmmetric_ts_idx'),
+        ),
+    ]
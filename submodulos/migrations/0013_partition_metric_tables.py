@@ -0,0 +1,248 @@
+# Convierte ServerMetric y VMMetric en tablas particionadas por rango de
+# `timestamp` (PostgreSQL).
+#
+# Para no copiar millones de filas, la tabla existente se renombra y se adjunta
+# como partición heredada FROM (MINVALUE) TO (<corte>); las particiones nuevas
+# (diarias o semanales) las crea y caduca submodulos.partitioning.
+#
+# - El corte es el inicio del periodo siguiente al de la fila más reciente
+#   (o al actual), calculado con la tabla ya bloqueada: todas las filas
+#   heredadas caen dentro del rango y lo que se escriba hasta el corte sigue
+#   yendo a la heredada.
+#
+# - La clave primaria pasa a ser (id, timestamp): PostgreSQL exige que incluya
+#   la columna de partición. El id lo sigue generando una secuencia propia.
+# - Los índices y FKs se definen sobre la tabla padre (vacía, instantáneo) y
+#   se propagan a las particiones. En la heredada se conservan los índices
+#   equivalentes (incluido el único (id, timestamp), que pasa a ser su clave
+#   primaria) y sus FKs, de modo que ATTACH PARTITION los adjunta en lugar de
+#   reconstruirlos. Los que faltan se crean antes con CREATE INDEX
+#   CONCURRENTLY, fuera de la transacción, sin bloquear las escrituras.
+# - Se añade una partición DEFAULT como red de seguridad si faltan particiones.
+#
+# Ventana de bloqueo: desde el RENAME hasta el final de la transacción la tabla
+# queda en ACCESS EXCLUSIVE (lock_timeout de 30s para obtenerlo). Dentro solo
+# hay cambios de catálogo y la comprobación de ATTACH PARTITION de que las
+# filas heredadas caen en su rango: una lectura secuencial de la tabla, sin
+# construir índices. Conviene ejecutarla en una ventana de poca escritura.
+#
+# No es reversible: deshacer exigiría reescribir la tabla.
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.migrations.exceptions import IrreversibleError
+
+# Índices de la tabla heredada creados CONCURRENTLY antes de particionar:
+# tabla -> [(nombre, columnas, único)] (los de series de VMMetric ya los creó 0012)
+LEGACY_INDEXES = {
+    'submodulos_servermetric': [
+        ('servermetric_id_ts_uniq', '"id", "timestamp"', True),
+        ('servermetric_server_ts_idx', '"server_id", "timestamp"', False),
+        ('servermetric_ts_idx', '"timestamp"', False),
+    ],
+    'submodulos_vmmetric': [
+        ('vmmetric_id_ts_uniq', '"id", "timestamp"', True),
+    ],
+}
+
+# tabla -> (índices [(nombre, columnas)], FKs [(columna, tabla_destino, columna_destino)],
+#           índice único (id, timestamp) de LEGACY_INDEXES)
+TABLES = {
+    'submodulos_servermetric': (
+        [
+            ('servermetric_server_ts_idx', '"server_id", "timestamp"'),
+            ('servermetric_ts_idx', '"timestamp"'),
+        ],
+        [('server_id', 'submodulos_proxmoxserver', 'id')],
+        'servermetric_id_ts_uniq',
+    ),
+    'submodulos_vmmetric': (
+        [
+            ('vmmetric_vm_ts_idx', '"vm_id", "timestamp"'),
+            ('vmmetric_origin_ts_idx', '"server_origin", "timestamp"'),
+            ('vmmetric_ts_idx', '"timestamp"'),
+        ],
+        [('vm_id', 'age_maquina_virtual', 'vm_id')],
+        'vmmetric_id_ts_uniq',
+    ),
+}
+
+
+def _period_start(moment, interval):
+    moment = moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        moment -= timedelta(days=moment.weekday())
+    return moment
+
+
+def _next_period(start, interval):
+    return start + timedelta(days=7 if interval == 'week' else 1)
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s",
+        [table]
+    )
+    return cursor.fetchone() is not None
+
+
+def create_legacy_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, indexes in LEGACY_INDEXES.items():
+            if _is_partitioned(cursor, table):
+                continue
+            for name, columns, unique in indexes:
+                cursor.execute(
+                    f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS '
+                    f'"{name}" ON "{table}" ({columns})'
+                )
+
+
+def partition_table(cursor, table, indexes, foreign_keys, unique_index, now, interval, premake):
+    legacy = f"{table}_legacy"
+
+    if _is_partitioned(cursor, table):
+        return
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+
+    # Corte tras el periodo de la fila más reciente: con la tabla ya bloqueada
+    # no entra ninguna fila que quede fuera del rango de la heredada
+    cursor.execute(f'SELECT MAX("timestamp") FROM "{legacy}"')
+    latest = cursor.fetchone()[0]
+    cutover = _next_period(_period_start(max(now, latest or now), interval), interval)
+
+    # Índices de la tabla original: los equivalentes a los de la tabla padre se
+    # conservan con otro nombre (ATTACH los reutiliza); el resto se eliminan
+    keep = {name for name, _ in indexes} | {unique_index}
+    cursor.execute(
+        "SELECT i.relname FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "JOIN pg_class t ON t.oid = x.indrelid "
+        "WHERE t.relname = %s AND NOT x.indisprimary",
+        [legacy]
+    )
+    for (index_name,) in cursor.fetchall():
+        if index_name in keep:
+            cursor.execute(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"')
+        else:
+            cursor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+    # Clave primaria (id) -> (id, timestamp) con el índice único ya construido.
+    # Las FKs se conservan: coinciden con las de la tabla padre y se adjuntan sin revalidar.
+    cursor.execute(
+        "SELECT conname FROM pg_constraint c JOIN pg_class t ON t.oid = c.conrelid "
+        "WHERE t.relname = %s AND c.contype = 'p'",
+        [legacy]
+    )
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE "{legacy}" DROP CONSTRAINT "{constraint}"')
+    cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s AND relkind = 'i'", [f"{unique_index}_legacy"])
+    if cursor.fetchone():
+        cursor.execute(
+            f'ALTER TABLE "{legacy}" ADD CONSTRAINT "{legacy}_pkey" '
+            f'PRIMARY KEY USING INDEX "{unique_index}_legacy"'
+        )
+
+    # Secuencia propia para el id (la original pertenece a la tabla heredada)
+    sequence = f"{table}_id_part_seq"
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{legacy}"')
+    max_id = cursor.fetchone()[0]
+    cursor.execute(f'CREATE SEQUENCE "{sequence}"')
+    cursor.execute("SELECT setval(%s, %s, %s)", [sequence, max(max_id, 1), max_id > 0])
+    cursor.execute(f'ALTER TABLE "{legacy}" ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    cursor.execute(f'ALTER TABLE "{legacy}" ALTER COLUMN id DROP DEFAULT')
+
+    # Tabla padre particionada con las mismas columnas
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) '
+        f'PARTITION BY RANGE ("timestamp")'
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{sequence}"\')')
+    cursor.execute(f'ALTER SEQUENCE "{sequence}" OWNED BY "{table}".id')
+    cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "timestamp")')
+    for index_name, columns in indexes:
+        cursor.execute(f'CREATE INDEX "{index_name}" ON "{table}" ({columns})')
+    for column, target, target_column in foreign_keys:
+        cursor.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_{column}_fk" '
+            f'FOREIGN KEY ("{column}") REFERENCES "{target}" ("{target_column}") '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+
+    # Datos existentes: partición heredada hasta el corte
+    cursor.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{legacy}" FOR VALUES FROM (MINVALUE) TO (%s)',
+        [cutover]
+    )
+
+    # Particiones iniciales y DEFAULT
+    start = cutover
+    for _ in range(premake + 1):
+        end = _next_period(start, interval)
+        cursor.execute(
+            f'CREATE TABLE "{table}_p{start.strftime("%Y%m%d")}" PARTITION OF "{table}" '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [start, end]
+        )
+        start = end
+    cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    interval = getattr(settings, 'METRICS_PARTITION_INTERVAL', 'day')
+    premake = getattr(settings, 'METRICS_PARTITION_PREMAKE', 7)
+    now = datetime.now(dt_timezone.utc)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SET LOCAL lock_timeout = '30s'")
+        for table, (indexes, foreign_keys, unique_index) in TABLES.items():
+            partition_table(cursor, table, indexes, foreign_keys, unique_index, now, interval, premake)
+
+
+def backwards(apps, schema_editor):
+    raise IrreversibleError(
+        "0013_partition_metric_tables no es reversible: volver a tablas sin particionar "
+        "exige reescribir ServerMetric y VMMetric"
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no admite transacción; el particionado sí va en una
+    atomic = False
+
+    dependencies = [
+        ('submodulos', '0012_vmmetric_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='servermetric',
+                    name='server',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=models.deletion.CASCADE, related_name='metrics', to='submodulos.proxmoxserver'),
+                ),
+                migrations.AddIndex(
+                    model_name='servermetric',
+                    index=models.Index(fields=['server', 'timestamp'], name='servermetric_server_ts_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='servermetric',
+                    index=models.Index(fields=['timestamp'], name='servermetric_ts_idx'),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_legacy_indexes, backwards, atomic=False),
+        migrations.RunPython(forwards, backwards, atomic=True),
+    ]
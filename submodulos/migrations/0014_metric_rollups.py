@@ -0,0 +1,70 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0013_partition_metric_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ServerMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minuto'), ('1h', '1 hora'), ('1d', '1 día')], max_length=2)),
+                ('bucket', models.DateTimeField(verbose_name='Inicio del Intervalo')),
+                ('avg_cpu', models.FloatField(default=0.0)),
+                ('max_cpu', models.FloatField(default=0.0)),
+                ('avg_memory', models.FloatField(default=0.0)),
+                ('max_memory', models.FloatField(default=0.0)),
+                ('avg_disk', models.FloatField(default=0.0)),
+                ('max_disk', models.FloatField(default=0.0)),
+                ('sample_count', models.IntegerField(default=0)),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_rollups', to='submodulos.proxmoxserver')),
+            ],
+            options={
+                'verbose_name': 'Agregado de Métrica de Servidor',
+                'verbose_name_plural': 'Agregados de Métricas de Servidores',
+                'ordering': ['bucket'],
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='srvrollup_res_bucket_idx')],
+                'unique_together': {('server', 'resolution', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VMMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vm_name', models.CharField(max_length=100)),
+                ('server_origin', models.CharField(max_length=50)),
+                ('resolution', models.CharField(choices=[('1m', '1 minuto'), ('1h', '1 hora'), ('1d', '1 día')], max_length=2)),
+                ('bucket', models.DateTimeField(verbose_name='Inicio del Intervalo')),
+                ('avg_cpu', models.FloatField(default=0.0)),
+                ('max_cpu', models.FloatField(default=0.0)),
+                ('avg_memory', models.FloatField(default=0.0)),
+                ('max_memory', models.FloatField(default=0.0)),
+                ('sample_count', models.IntegerField(default=0)),
+                ('vm', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='metric_rollups', to='submodulos.maquinavirtual')),
+            ],
+            options={
+                'verbose_name': 'Agregado de Métrica de VM',
+                'verbose_name_plural': 'Agregados de Métricas de VMs',
+                'ordering': ['bucket'],
+                'indexes': [
+                    models.Index(fields=['vm', 'resolution', 'bucket'], name='vmrollup_vm_res_bucket_idx'),
+                    models.Index(fields=['resolution', 'bucket'], name='vmrollup_res_bucket_idx'),
+                ],
+                'unique_together': {('server_origin', 'vm_name', 'resolution', 'bucket')},
+            },
+        ),
+    ]
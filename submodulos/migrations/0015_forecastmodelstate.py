@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0014_metric_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastModelState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('server', 'Servidor'), ('vm', 'Máquina Virtual')], max_length=10)),
+                ('entity_id', models.BigIntegerField()),
+                ('metric', models.CharField(choices=[('cpu', 'CPU'), ('memory', 'Memoria')], max_length=10)),
+                ('spec', models.CharField(max_length=100)),
+                ('params', models.JSONField()),
+                ('reference_mae', models.FloatField(blank=True, null=True, verbose_name='Error de Referencia')),
+                ('nobs', models.IntegerField(default=0)),
+                ('last_observation', models.DateTimeField(blank=True, null=True)),
+                ('fitted_at', models.DateTimeField(verbose_name='Último Ajuste')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado de Modelo de Predicción',
+                'verbose_name_plural': 'Estados de Modelos de Predicción',
+                'unique_together': {('kind', 'entity_id', 'metric')},
+            },
+        ),
+    ]
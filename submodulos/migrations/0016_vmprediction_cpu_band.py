@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0015_forecastmodelstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vmprediction',
+            name='cpu_lower',
+            field=models.FloatField(blank=True, null=True, verbose_name='CPU Mínima Esperada (%)'),
+        ),
+        migrations.AddField(
+            model_name='vmprediction',
+            name='cpu_upper',
+            field=models.FloatField(blank=True, null=True, verbose_name='CPU Máxima Esperada (%)'),
+        ),
+    ]
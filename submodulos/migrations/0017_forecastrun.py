@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0016_vmprediction_cpu_band'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('status', models.CharField(choices=[('running', 'En curso'), ('complete', 'Completa'), ('failed', 'Fallida')], default='running', max_length=10)),
+                ('entities', models.IntegerField(default=0)),
+                ('failures', models.IntegerField(default=0)),
+                ('predictions', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ejecución de Predicción',
+                'verbose_name_plural': 'Ejecuciones de Predicción',
+                'ordering': ['-started_at'],
+                'get_latest_by': 'started_at',
+                'indexes': [models.Index(fields=['status', 'started_at'], name='forecastrun_status_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='serverprediction',
+            name='run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='server_predictions', to='submodulos.forecastrun'),
+        ),
+        migrations.AddField(
+            model_name='vmprediction',
+            name='run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vm_predictions', to='submodulos.forecastrun'),
+        ),
+    ]
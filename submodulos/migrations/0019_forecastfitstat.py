@@ -0,0 +1,43 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0018_detectorcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastFitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('server', 'Servidor'), ('vm', 'Máquina Virtual')], max_length=10)),
+                ('entity_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('backend', models.CharField(max_length=20)),
+                ('ok', models.BooleanField(default=True)),
+                ('refit', models.BooleanField(default=False)),
+                ('fit_seconds', models.FloatField(default=0.0)),
+                ('nobs', models.IntegerField(default=0)),
+                ('aic', models.FloatField(blank=True, null=True)),
+                ('bic', models.FloatField(blank=True, null=True)),
+                ('mae_cpu', models.FloatField(blank=True, null=True)),
+                ('mape_cpu', models.FloatField(blank=True, null=True)),
+                ('mae_memory', models.FloatField(blank=True, null=True)),
+                ('mape_memory', models.FloatField(blank=True, null=True)),
+                ('evaluated_points', models.IntegerField(default=0)),
+                ('evaluated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fit_stats', to='submodulos.forecastrun')),
+            ],
+            options={
+                'verbose_name': 'Estadística de Ajuste',
+                'verbose_name_plural': 'Estadísticas de Ajuste',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['kind', 'entity_id', 'created_at'], name='fitstat_entity_idx'), models.Index(fields=['created_at'], name='fitstat_created_idx')],
+                'unique_together': {('run', 'kind', 'entity_id')},
+            },
+        ),
+    ]
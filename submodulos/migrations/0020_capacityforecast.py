@@ -0,0 +1,40 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submodulos', '0019_forecastfitstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacityForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capacidad_total', models.FloatField(default=0.0)),
+                ('usado', models.FloatField(default=0.0)),
+                ('asignado', models.FloatField(default=0.0)),
+                ('usage_level', models.FloatField(blank=True, null=True)),
+                ('usage_trend', models.FloatField(default=0.0)),
+                ('allocation_level', models.FloatField(blank=True, null=True)),
+                ('allocation_trend', models.FloatField(default=0.0)),
+                ('predicted_trend', models.FloatField(blank=True, null=True)),
+                ('samples', models.IntegerField(default=0)),
+                ('last_sample_at', models.DateTimeField(blank=True, null=True)),
+                ('hours_to_exhaustion', models.FloatField(blank=True, null=True)),
+                ('hours_to_overcommit', models.FloatField(blank=True, null=True)),
+                ('exhaustion_at', models.DateTimeField(blank=True, null=True, verbose_name='Agotamiento Previsto')),
+                ('limiting', models.CharField(blank=True, choices=[('uso', 'Uso observado'), ('prediccion', 'Predicción SARIMA'), ('asignacion', 'Asignación a VMs')], default='', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recurso', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_forecast', to='submodulos.recursofisico')),
+            ],
+            options={
+                'verbose_name': 'Proyección de Capacidad',
+                'verbose_name_plural': 'Proyecciones de Capacidad',
+                'ordering': ['exhaustion_at'],
+                'indexes': [models.Index(fields=['exhaustion_at'], name='capacity_exhaustion_idx')],
+            },
+        ),
+    ]
@@ -415,7 +415,7 @@ class MetricsAggregation(models.Model):
 
 # Modelo para métricas locales
 class LocalMetric(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     cpu_usage = models.FloatField()
     memory_usage = models.FloatField()
     disk_usage = models.FloatField()
@@ -434,18 +434,24 @@ class ServerMetric(models.Model):
     Tabla para guardar el historial de salud de los servidores Proxmox.
     Cada fila es una 'foto' del estado en un momento exacto.
     """
-    server = models.ForeignKey(ProxmoxServer, on_delete=models.CASCADE, null=True, blank=True, related_name='metrics')
+    # Sin índice propio: lo cubre el índice compuesto (server, timestamp)
+    server = models.ForeignKey(ProxmoxServer, on_delete=models.CASCADE, null=True, blank=True, related_name='metrics', db_index=False)
     # node_name eliminado porque no existe en la tabla real
     cpu_usage = models.FloatField(verbose_name="Uso CPU (%)")
     ram_usage = models.FloatField(verbose_name="Uso RAM (%)", db_column='memory_usage') # Mapear a columna real
     disk_usage = models.FloatField(verbose_name="Uso Disco (%)", default=0) # Nueva columna detectada
     uptime = models.IntegerField(verbose_name="Tiempo Encendido (seg)")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Registro")  # Hora de la muestra
 
     class Meta:
         verbose_name = "Métrica de Servidor"
         verbose_name_plural = "Métricas de Servidores"
         ordering = ['-timestamp'] # Lo más reciente primero
+        # Tabla particionada por timestamp (ver submodulos/partitioning.py)
+        indexes = [
+            models.Index(fields=['server', 'timestamp'], name='servermetric_server_ts_idx'),
+            models.Index(fields=['timestamp'], name='servermetric_ts_idx'),
+        ]
 
     def __str__(self):
         name = self.server.name if self.server else "Unknown Server"
@@ -455,27 +461,140 @@ class VMMetric(models.Model):
     """
     Tabla para guardar el historial de salud de las VMs.
     """
+    # VM registrada (None si la VM aún no existe en MaquinaVirtual).
+    # Sin índice propio: lo cubre el índice compuesto (vm, timestamp)
+    vm = models.ForeignKey(MaquinaVirtual, on_delete=models.SET_NULL, null=True, blank=True, related_name='metrics', db_index=False)
     vm_name = models.CharField(max_length=100, verbose_name="Nombre de VM")
     server_origin = models.CharField(max_length=50, verbose_name="Servidor Origen")
     cpu_usage = models.FloatField(verbose_name="Uso CPU (%)")
     ram_usage = models.FloatField(verbose_name="Uso RAM (%)")
     status = models.CharField(max_length=20, verbose_name="Estado")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Registro")  # Hora de la muestra
 
     class Meta:
         verbose_name = "Métrica de VM"
         verbose_name_plural = "Métricas de VMs"
         ordering = ['-timestamp']
+        # Tabla particionada por timestamp (ver submodulos/partitioning.py)
+        indexes = [
+            models.Index(fields=['vm', 'timestamp'], name='vmmetric_vm_ts_idx'),
+            models.Index(fields=['server_origin', 'timestamp'], name='vmmetric_origin_ts_idx'),
+            models.Index(fields=['timestamp'], name='vmmetric_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vm_name} ({self.server_origin}) - {self.timestamp.strftime('%H:%M:%S')}"
         
+ROLLUP_RESOLUTIONS = [
+    ('1m', '1 minuto'),
+    ('1h', '1 hora'),
+    ('1d', '1 día'),
+]
+
+
+class ServerMetricRollup(models.Model):
+    """
+    Agregados de ServerMetric por servidor y bucket temporal (UTC).
+    Los genera submodulos.logic.rollups de forma incremental.
+    """
+    server = models.ForeignKey(ProxmoxServer, on_delete=models.CASCADE, related_name='metric_rollups')
+    resolution = models.CharField(max_length=2, choices=ROLLUP_RESOLUTIONS)
+    bucket = models.DateTimeField(verbose_name="Inicio del Intervalo")
+    avg_cpu = models.FloatField(default=0.0)
+    max_cpu = models.FloatField(default=0.0)
+    avg_memory = models.FloatField(default=0.0)
+    max_memory = models.FloatField(default=0.0)
+    avg_disk = models.FloatField(default=0.0)
+    max_disk = models.FloatField(default=0.0)
+    sample_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('server', 'resolution', 'bucket')
+        indexes = [models.Index(fields=['resolution', 'bucket'], name='srvrollup_res_bucket_idx')]
+        verbose_name = 'Agregado de Métrica de Servidor'
+        verbose_name_plural = 'Agregados de Métricas de Servidores'
+        ordering = ['bucket']
+
+    def __str__(self):
+        return f"{self.server.name} [{self.resolution}] {self.bucket}"
+
+
+class VMMetricRollup(models.Model):
+    """
+    Agregados de VMMetric por VM (vm_name + server_origin) y bucket temporal (UTC).
+    """
+    vm = models.ForeignKey(MaquinaVirtual, on_delete=models.SET_NULL, null=True, blank=True, related_name='metric_rollups')
+    vm_name = models.CharField(max_length=100)
+    server_origin = models.CharField(max_length=50)
+    resolution = models.CharField(max_length=2, choices=ROLLUP_RESOLUTIONS)
+    bucket = models.DateTimeField(verbose_name="Inicio del Intervalo")
+    avg_cpu = models.FloatField(default=0.0)
+    max_cpu = models.FloatField(default=0.0)
+    avg_memory = models.FloatField(default=0.0)
+    max_memory = models.FloatField(default=0.0)
+    sample_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('server_origin', 'vm_name', 'resolution', 'bucket')
+        indexes = [
+            models.Index(fields=['vm', 'resolution', 'bucket'], name='vmrollup_vm_res_bucket_idx'),
+            models.Index(fields=['resolution', 'bucket'], name='vmrollup_res_bucket_idx'),
+        ]
+        verbose_name = 'Agregado de Métrica de VM'
+        verbose_name_plural = 'Agregados de Métricas de VMs'
+        ordering = ['bucket']
+
+    def __str__(self):
+        return f"{self.vm_name} ({self.server_origin}) [{self.resolution}] {self.bucket}"
+
+
+class RollupWatermark(models.Model):
+    """Marca hasta dónde (exclusivo) se ha agregado cada nivel de rollup"""
+    name = models.CharField(max_length=50, unique=True)  # p.ej. 'server:1m'
+    position = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} -> {self.position}"
+
+
+class ForecastRun(models.Model):
+    """
+    Ejecución del ciclo de predicción. Cada predicción apunta a la ejecución
+    que la escribió; la ejecución se marca completa en la misma transacción
+    en la que se escribe su horizonte.
+    """
+    STATUS_CHOICES = [
+        ('running', 'En curso'),
+        ('complete', 'Completa'),
+        ('failed', 'Fallida'),
+    ]
+
+    started_at = models.DateTimeField(default=timezone.now, verbose_name="Inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    entities = models.IntegerField(default=0)
+    failures = models.IntegerField(default=0)
+    predictions = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'started_at'], name='forecastrun_status_idx')]
+        verbose_name = 'Ejecución de Predicción'
+        verbose_name_plural = 'Ejecuciones de Predicción'
+        ordering = ['-started_at']
+        get_latest_by = 'started_at'
+
+    def __str__(self):
+        return f"Ejecución {self.pk} ({self.status}) - {self.started_at}"
+
+
 class ServerPrediction(models.Model):
     """
     Modelo para almacenar predicciones de uso de recursos de servidores Proxmox.
     Utilizado por el sistema SARIMA para planificación de capacidad.
     """
     server = models.ForeignKey(ProxmoxServer, on_delete=models.CASCADE, related_name='predictions')
+    run = models.ForeignKey(ForecastRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='server_predictions')
     timestamp = models.DateTimeField(verbose_name="Fecha Predicha")
     predicted_cpu_usage = models.FloatField(verbose_name="CPU Predicha (%)")
     predicted_memory_usage = models.FloatField(verbose_name="Memoria Predicha (%)")
@@ -500,9 +619,13 @@ class VMPrediction(models.Model):
     Utilizado para detección de anomalías.
     """
     vm = models.ForeignKey(MaquinaVirtual, on_delete=models.CASCADE, related_name='predictions')
+    run = models.ForeignKey(ForecastRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='vm_predictions')
     timestamp = models.DateTimeField(verbose_name="Fecha Predicha")
     predicted_cpu_usage = models.FloatField(verbose_name="CPU Predicha (%)")
     predicted_memory_usage = models.FloatField(verbose_name="Memoria Predicha (%)")
+    # Banda esperada de CPU: fuera de ella la muestra real se considera anómala
+    cpu_lower = models.FloatField(null=True, blank=True, verbose_name="CPU Mínima Esperada (%)")
+    cpu_upper = models.FloatField(null=True, blank=True, verbose_name="CPU Máxima Esperada (%)")
     is_anomaly = models.BooleanField(default=False, verbose_name="Es Anomalía")
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -517,6 +640,133 @@ class VMPrediction(models.Model):
     def __str__(self):
         return f"Predicción {self.vm.nombre} - {self.timestamp}"
 
+class ForecastModelState(models.Model):
+    """
+    Parámetros ajustados de un modelo SARIMA por (entidad, métrica).
+
+    El ciclo horario reutiliza estos parámetros para filtrar la serie con las
+    observaciones nuevas sin volver a optimizar; solo se reajusta cuando el
+    modelo caduca o el error reciente deriva (submodulos.logic.forecast_engine).
+    """
+    KINDS = [
+        ('server', 'Servidor'),
+        ('vm', 'Máquina Virtual'),
+    ]
+    METRICS = [
+        ('cpu', 'CPU'),
+        ('memory', 'Memoria'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    entity_id = models.BigIntegerField()  # ProxmoxServer.id o MaquinaVirtual.vm_id
+    metric = models.CharField(max_length=10, choices=METRICS)
+    spec = models.CharField(max_length=100)  # Órdenes SARIMA con los que se ajustó
+    params = models.JSONField()
+    reference_mae = models.FloatField(null=True, blank=True, verbose_name="Error de Referencia")
+    nobs = models.IntegerField(default=0)
+    last_observation = models.DateTimeField(null=True, blank=True)
+    fitted_at = models.DateTimeField(verbose_name="Último Ajuste")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'entity_id', 'metric')
+        verbose_name = 'Estado de Modelo de Predicción'
+        verbose_name_plural = 'Estados de Modelos de Predicción'
+
+    def __str__(self):
+        return f"{self.kind}:{self.entity_id} {self.metric} ({self.fitted_at})"
+
+class ForecastFitStat(models.Model):
+    """
+    Coste y precisión del ajuste de una entidad en una ejecución.
+
+    El coste (tiempo, observaciones, AIC/BIC) se guarda al escribir la
+    ejecución; el error real (MAE/MAPE) se calcula cuando llegan las métricas
+    de las horas predichas (submodulos.logic.forecast_stats).
+    """
+    run = models.ForeignKey(ForecastRun, on_delete=models.CASCADE, related_name='fit_stats')
+    kind = models.CharField(max_length=10, choices=ForecastModelState.KINDS)
+    entity_id = models.BigIntegerField()
+    name = models.CharField(max_length=100)
+    backend = models.CharField(max_length=20)
+    ok = models.BooleanField(default=True)
+    refit = models.BooleanField(default=False)  # False: se reutilizaron los parámetros guardados
+    fit_seconds = models.FloatField(default=0.0)
+    nobs = models.IntegerField(default=0)
+    aic = models.FloatField(null=True, blank=True)
+    bic = models.FloatField(null=True, blank=True)
+    mae_cpu = models.FloatField(null=True, blank=True)
+    mape_cpu = models.FloatField(null=True, blank=True)
+    mae_memory = models.FloatField(null=True, blank=True)
+    mape_memory = models.FloatField(null=True, blank=True)
+    evaluated_points = models.IntegerField(default=0)
+    evaluated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('run', 'kind', 'entity_id')
+        indexes = [
+            models.Index(fields=['kind', 'entity_id', 'created_at'], name='fitstat_entity_idx'),
+            models.Index(fields=['created_at'], name='fitstat_created_idx'),
+        ]
+        verbose_name = 'Estadística de Ajuste'
+        verbose_name_plural = 'Estadísticas de Ajuste'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.kind} {self.name} [{self.backend}] {self.fit_seconds:.2f}s"
+
+
+class DetectorCheckpoint(models.Model):
+    """Estado serializado del detector de anomalías en línea (submodulos.logic.online_detector)"""
+    name = models.CharField(max_length=50, unique=True)  # p.ej. 'cerebro:vm'
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.updated_at})"
+
+class CapacityForecast(models.Model):
+    """
+    Proyección de agotamiento de un recurso físico (CPU, RAM o almacenamiento
+    de un nodo). Se actualiza en cada sincronización con Proxmox
+    (submodulos.logic.capacity_planner): nivel y tendencia suavizados del uso
+    y de lo asignado a las VMs, más la tendencia de las predicciones SARIMA
+    del servidor.
+    """
+    LIMITS = [
+        ('uso', 'Uso observado'),
+        ('prediccion', 'Predicción SARIMA'),
+        ('asignacion', 'Asignación a VMs'),
+    ]
+
+    recurso = models.OneToOneField(RecursoFisico, on_delete=models.CASCADE, related_name='capacity_forecast')
+    capacidad_total = models.FloatField(default=0.0)
+    usado = models.FloatField(default=0.0)
+    asignado = models.FloatField(default=0.0)
+    # Holt con intervalos irregulares: tendencias en unidades del recurso por hora
+    usage_level = models.FloatField(null=True, blank=True)
+    usage_trend = models.FloatField(default=0.0)
+    allocation_level = models.FloatField(null=True, blank=True)
+    allocation_trend = models.FloatField(default=0.0)
+    predicted_trend = models.FloatField(null=True, blank=True)
+    samples = models.IntegerField(default=0)
+    last_sample_at = models.DateTimeField(null=True, blank=True)
+    hours_to_exhaustion = models.FloatField(null=True, blank=True)
+    hours_to_overcommit = models.FloatField(null=True, blank=True)
+    exhaustion_at = models.DateTimeField(null=True, blank=True, verbose_name="Agotamiento Previsto")
+    limiting = models.CharField(max_length=20, choices=LIMITS, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['exhaustion_at'], name='capacity_exhaustion_idx')]
+        verbose_name = 'Proyección de Capacidad'
+        verbose_name_plural = 'Proyecciones de Capacidad'
+        ordering = ['exhaustion_at']
+
+    def __str__(self):
+        return f"{self.recurso} → {self.exhaustion_at or 'sin agotamiento previsto'}"
+
 class AgentLog(models.Model):
     LEVELS = [
         ('INFO', 'Información'),
@@ -0,0 +1,265 @@
+"""
+Particionado por rango de tiempo y retención de las tablas de métricas.
+
+ServerMetric y VMMetric son tablas particionadas por `timestamp` en
+PostgreSQL (migración 0013). Este módulo crea por adelantado las particiones
+futuras y elimina (o separa) las caducadas según la retención configurada:
+borrar una partición es instantáneo y no deja la tabla hinchada como un DELETE.
+
+LocalMetric y AgentLog no están particionadas (volumen bajo): su retención se
+aplica con borrados por lotes de id.
+
+Configuración (settings):
+    METRICS_PARTITION_INTERVAL: 'day' o 'week'
+    METRICS_PARTITION_PREMAKE: particiones futuras a mantener creadas
+    METRICS_RETENTION_DAYS: días de retención por modelo
+    METRICS_RETENTION_MODE: 'drop' (borrar) o 'detach' (separar y conservar la tabla)
+
+Uso: python manage.py gestionar_particiones  /  tarea maintain_metric_partitions
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_MODELS = ('servermetric', 'vmmetric')
+UNPARTITIONED_MODELS = ('localmetric', 'agentlog')
+
+DEFAULT_RETENTION_DAYS = {
+    'servermetric': 90,
+    'vmmetric': 30,
+    'localmetric': 30,
+    'agentlog': 90,
+}
+DEFAULT_INTERVAL = 'day'
+DEFAULT_PREMAKE = 7
+DELETE_BATCH_SIZE = 5000
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def get_interval():
+    interval = getattr(settings, 'METRICS_PARTITION_INTERVAL', DEFAULT_INTERVAL)
+    if interval not in ('day', 'week'):
+        raise ValueError(f"METRICS_PARTITION_INTERVAL no válido: {interval}")
+    return interval
+
+
+def get_retention_days(model_name):
+    retention = dict(DEFAULT_RETENTION_DAYS)
+    retention.update(getattr(settings, 'METRICS_RETENTION_DAYS', {}))
+    return retention.get(model_name)
+
+
+def period_start(moment, interval):
+    """Inicio (UTC) del periodo que contiene `moment`"""
+    moment = moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        moment -= timedelta(days=moment.weekday())
+    return moment
+
+
+def next_period(start, interval):
+    return start + timedelta(days=7 if interval == 'week' else 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start.strftime('%Y%m%d')}"
+
+
+def _table_name(model_name):
+    from django.apps import apps
+    return apps.get_model('submodulos', model_name)._meta.db_table
+
+
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def _parse_bound(value):
+    """Convierte un límite de pg_get_expr en datetime (None para MINVALUE/MAXVALUE)"""
+    value = value.strip()
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def list_partitions(table):
+    """
+    Particiones de una tabla.
+
+    Returns:
+        list[tuple]: (nombre, desde, hasta); los límites son None para
+        MINVALUE/MAXVALUE y ambos None para la partición DEFAULT.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s ORDER BY c.relname",
+            [table]
+        )
+        partitions = []
+        for name, bound in cursor.fetchall():
+            match = _BOUND_RE.search(bound or '')
+            if not match:
+                partitions.append((name, None, None))
+                continue
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+        return partitions
+
+
+def _create_partition(table, name, start, end):
+    """
+    Crea la partición [start, end). Si la DEFAULT ya tiene filas de ese rango
+    (el mantenimiento no corrió a tiempo), PostgreSQL rechazaría el CREATE: se
+    separa la DEFAULT, se crea la partición, se le mueven esas filas y se
+    vuelve a adjuntar, todo en una transacción.
+    """
+    default = f"{table}_default"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s AND relkind = 'r'", [default])
+        has_default = cursor.fetchone() is not None
+        if has_default:
+            cursor.execute(
+                f'SELECT 1 FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1',
+                [start, end]
+            )
+            has_default = cursor.fetchone() is not None
+        if not has_default:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [start, end]
+            )
+            return
+
+        logger.warning(f"{default} tiene filas de {start:%Y-%m-%d}, se mueven a {name}")
+        cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end]
+        )
+        cursor.execute(
+            f'INSERT INTO "{name}" SELECT * FROM "{default}" '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [start, end]
+        )
+        cursor.execute(
+            f'DELETE FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [start, end]
+        )
+        cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+
+
+def ensure_partitions(table, now=None, premake=None, interval=None):
+    """Crea las particiones desde el periodo actual hasta `premake` periodos en el futuro"""
+    interval = interval or get_interval()
+    premake = premake if premake is not None else getattr(settings, 'METRICS_PARTITION_PREMAKE', DEFAULT_PREMAKE)
+    start = period_start(now or datetime.now(dt_timezone.utc), interval)
+
+    # Rangos ya cubiertos (la partición DEFAULT no cuenta)
+    covered = [(lower, upper) for _, lower, upper in list_partitions(table) if upper is not None]
+    created = []
+    for _ in range(premake + 1):
+        end = next_period(start, interval)
+        # Se omite si el periodo ya está cubierto (p.ej. por la partición heredada)
+        overlaps = any((lower is None or lower < end) and start < upper for lower, upper in covered)
+        if not overlaps:
+            name = partition_name(table, start)
+            _create_partition(table, name, start, end)
+            created.append(name)
+        start = end
+    return created
+
+
+def expire_partitions(table, retention_days, now=None, mode=None):
+    """Elimina (o separa) las particiones cuyo rango termina antes del límite de retención"""
+    mode = mode or getattr(settings, 'METRICS_RETENTION_MODE', 'drop')
+    cutoff = (now or datetime.now(dt_timezone.utc)) - timedelta(days=retention_days)
+
+    expired = []
+    for name, _, upper in list_partitions(table):
+        if upper is None or upper > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+            if mode == 'drop':
+                cursor.execute(f'DROP TABLE "{name}"')
+        expired.append(name)
+    return expired
+
+
+def purge_rows(model, retention_days, now=None, batch_size=DELETE_BATCH_SIZE):
+    """Borra filas caducadas de una tabla no particionada en lotes por rango de id"""
+    cutoff = (now or datetime.now(dt_timezone.utc)) - timedelta(days=retention_days)
+    # Los ids crecen con el tiempo: la última fila caducada marca el límite
+    boundary = (
+        model.objects.filter(timestamp__lt=cutoff)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    if boundary is None:
+        return 0
+
+    first = model.objects.order_by('id').values_list('id', flat=True).first()
+    deleted = 0
+    low = first - 1
+    while low < boundary:
+        high = min(low + batch_size, boundary)
+        count, _ = model.objects.filter(id__gt=low, id__lte=high, timestamp__lt=cutoff).delete()
+        deleted += count
+        low = high
+    return deleted
+
+
+def maintain(now=None):
+    """
+    Ciclo completo de mantenimiento: particiones futuras, particiones
+    caducadas y retención de las tablas no particionadas.
+
+    Returns:
+        list[str]: resumen de las acciones realizadas.
+    """
+    from django.apps import apps
+
+    summary = []
+    for model_name in PARTITIONED_MODELS:
+        table = _table_name(model_name)
+        if not is_partitioned(table):
+            summary.append(f"{table}: no particionada, se omite")
+            continue
+        created = ensure_partitions(table, now=now)
+        if created:
+            summary.append(f"{table}: creadas {', '.join(created)}")
+        retention = get_retention_days(model_name)
+        if retention:
+            expired = expire_partitions(table, retention, now=now)
+            if expired:
+                summary.append(f"{table}: caducadas {', '.join(expired)}")
+
+    for model_name in UNPARTITIONED_MODELS:
+        retention = get_retention_days(model_name)
+        if not retention:
+            continue
+        model = apps.get_model('submodulos', model_name)
+        deleted = purge_rows(model, retention, now=now)
+        if deleted:
+            summary.append(f"{model._meta.db_table}: {deleted} filas eliminadas")
+
+    for line in summary:
+        logger.info(f"Particiones: {line}")
+    return summary
@@ -10,8 +10,14 @@ class ProxmoxService:
     Servicio para interactuar con la API de Proxmox VE
     """
     
-    def __init__(self):
-        """Inicializa la conexión con Proxmox usando los ajustes de settings.py"""
+    def __init__(self, proxmox=None):
+        """
+        Inicializa la conexión con Proxmox usando los ajustes de settings.py,
+        o reutiliza una conexión ya autenticada si se proporciona.
+        """
+        if proxmox is not None:
+            self.proxmox = proxmox
+            return
         try:
             self.proxmox = ProxmoxAPI(
                 host=settings.PROXMOX['host'],
@@ -110,13 +116,14 @@ class ProxmoxService:
             logger.error(f"Error al detener VM {vmid}: {str(e)}")
             return False
     
-    def get_cluster_resources(self, resource_type=None):
+    def get_cluster_resources(self, resource_type=None, raise_errors=False):
         """
         Obtiene recursos del cluster (VMs, contenedores, almacenamiento, etc.)
         
         Args:
             resource_type (str, optional): Filtrar por tipo de recurso 
-                (qemu, lxc, storage, node, etc.)
+                (vm, storage, node, etc.)
+            raise_errors (bool): Propagar el error en lugar de devolver una lista vacía.
         
         Returns:
             list: Lista de recursos
@@ -128,6 +135,8 @@ class ProxmoxService:
             return self.proxmox.cluster.resources.get(**params)
         except Exception as e:
             logger.error(f"Error al obtener recursos del cluster: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
 # Instancia singleton para usar en toda la aplicación
@@ -0,0 +1,22 @@
+"""
+Señales de submodulos.
+
+Cada AgentLog nuevo se publica en el canal de eventos en vivo (utils.live)
+cuando se confirma la transacción. Las inserciones con bulk_create no emiten
+señales: quien las hace publica las filas por su cuenta.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from submodulos.models import AgentLog
+
+
+@receiver(post_save, sender=AgentLog, dispatch_uid='agentlog_live_event')
+def publish_agent_log(sender, instance, created, **kwargs):
+    if not created:
+        return
+    from utils.live import agent_log_payload, publish
+
+    payload = agent_log_payload(instance)
+    transaction.on_commit(lambda: publish('agent_log', payload))
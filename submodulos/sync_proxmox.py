@@ -8,6 +8,7 @@ from .models import (
     ProxmoxServer, Nodo, SistemaOperativo, MaquinaVirtual,
     TipoRecurso, RecursoFisico, AsignacionRecursosInicial
 )
+from submodulos.logic.capacity_planner import refresh_after_sync
 
 class ProxmoxSynchronizer:
     def __init__(self, proxmox_server_id=None):
@@ -61,6 +62,10 @@ class ProxmoxSynchronizer:
         
         # 3. Finalmente las máquinas
         self.sync_vms()
+
+        # 4. Proyección de capacidad con la muestra recién sincronizada
+        server = self.server
+        transaction.on_commit(lambda: refresh_after_sync(server))
         
         return {
             'status': 'success',
@@ -6,10 +6,14 @@ import psutil
 import logging
 
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta, datetime
 import logging
 
+from utils.write_buffer import get_buffer
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -68,15 +72,15 @@ def collect_local_metrics():
         
         logger.info(f"Métricas obtenidas - CPU: {cpu_percent}%, Memoria: {memory.percent}%, Disco: {disk.percent}%")
         
-        # Guardar en la base de datos
-        metric = LocalMetric.objects.create(
+        # Encolar en el buffer de escritura (se inserta por lotes)
+        get_buffer(LocalMetric).add(LocalMetric(
             cpu_usage=cpu_percent,
             memory_usage=memory.percent,
             disk_usage=disk.percent
-        )
+        ))
         
-        logger.info(f"Métricas locales guardadas con ID: {metric.id}")
-        return f"Métricas locales guardadas correctamente - CPU: {cpu_percent}%, Memoria: {memory.percent}%, Disco: {disk.percent}%"
+        logger.info("Métricas locales encoladas para guardado")
+        return f"Métricas locales encoladas para guardado - CPU: {cpu_percent}%, Memoria: {memory.percent}%, Disco: {disk.percent}%"
     except Exception as e:
         logger.error(f"Error al recopilar métricas locales: {str(e)}", exc_info=True)
         return f"Error al recopilar métricas locales: {str(e)}"
@@ -92,109 +96,115 @@ def collect_local_metrics_hybrid():
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         
-        # Guardar en la base de datos
-        metric = LocalMetric.objects.create(
+        # Encolar en el buffer de escritura (se inserta por lotes)
+        get_buffer(LocalMetric).add(LocalMetric(
             cpu_usage=cpu_percent,
             memory_usage=memory.percent,
             disk_usage=disk.percent
-        )
+        ))
         
-        logger.info(f"Métricas híbridas guardadas con ID: {metric.id}")
-        return "Métricas híbridas guardadas correctamente"
+        logger.info("Métricas híbridas encoladas para guardado")
+        return "Métricas híbridas encoladas para guardado"
     except Exception as e:
         logger.error(f"Error al recopilar métricas híbridas: {str(e)}", exc_info=True)
         return f"Error al recopilar métricas híbridas: {str(e)}"
     
 @shared_task
 def monitor_all_proxmox_servers():
-    """Monitorea todos los servidores Proxmox configurados"""
-    from utils.proxmox_manager import proxmox_manager
-    from submodulos.models import ServerMetric, ProxmoxServer
-    
-    results = []
-    
-    # Obtener todos los nodos configurados
-    active_nodes = proxmox_manager.get_all_nodes()
-    
-    for node_key, node_config in active_nodes.items():
-        try:
-            # Conectar al servidor
-            proxmox = proxmox_manager.get_connection(node_key)
-            nodes = proxmox.nodes.get()
-            
-            # Obtener o crear el registro del servidor en BD
-            server, created = ProxmoxServer.objects.get_or_create(
-                hostname=node_config['host'],
-                defaults={
-                    'name': node_config.get('name', node_key),
-                    'username': node_config['user'],
-                    'password': node_config['password'],
-                    'verify_ssl': node_config.get('verify_ssl', False),
-                    'is_active': True
-                }
-            )
-            
-            for node in nodes:
-                node_name = node['node']
-                node_status = proxmox.nodes(node_name).status.get()
-                
-                # Guardar métricas del NODO
-                ServerMetric.objects.create(
-                    node_name=node_config.get('name', node_name), # Usar node_name en lugar de server= object
-                    cpu_usage=node_status.get('cpu', 0) * 100,
-                    ram_usage=(node_status['memory']['used'] / node_status['memory']['total']) * 100,
-                    uptime=node_status.get('uptime', 0),
-                    # disk_usage no existe en el modelo ServerMetric del servidor
-                    # created_at se llena automatico con auto_now_add
-                )
-                
-                # --- NUEVO: Recolectar métricas de las VMs en este nodo ---
-                try:
-                    # 1. Qeme/KVM
-                    for vm in proxmox.nodes(node_name).qemu.get():
-                        if vm.get('status') == 'running':
-                            _save_vm_metric(vm, node_name, 'qemu')
-                    
-                    # 2. LXC Containers
-                    for ct in proxmox.nodes(node_name).lxc.get():
-                         if ct.get('status') == 'running':
-                            _save_vm_metric(ct, node_name, 'lxc')
-                            
-                except Exception as vm_e:
-                    logger.error(f"Error recolectando VMs en {node_name}: {vm_e}")
-
-                results.append(f"✓ {node_config['name']} - {node_name}")
-                
-        except Exception as e:
-            logger.error(f"Error monitoreando {node_key}: {str(e)}")
-            results.append(f"✗ {node_config.get('name', node_key)}: {str(e)}")
-    
-    return f"Monitoreo completado: {', '.join(results)}"
+    """
+    Monitorea todos los servidores Proxmox configurados.
+
+    El sondeo lo realiza el colector (submodulos.collector); esta tarea solo
+    ejecuta un ciclo propio si el colector no ha dado señales de vida.
+    """
+    from submodulos.collector import collector_is_alive, collect_once
+
+    if collector_is_alive():
+        return "Monitoreo omitido: el colector está activo"
+
+    logger.warning("Colector inactivo, ejecutando ciclo de recolección desde Celery")
+    results = collect_once(persist=True)
+    # Las métricas van al buffer de escritura: se insertan en segundo plano
+    return f"Monitoreo completado, métricas encoladas: {', '.join(results)}"
+
+
+@shared_task
+def maintain_metric_partitions():
+    """Crea particiones futuras y elimina las caducadas según la retención"""
+    from submodulos.partitioning import maintain
 
-def _save_vm_metric(vm_data, node_name, vm_type):
-    """Auxiliar para guardar métricas de VM/CT"""
-    from submodulos.models import MaquinaVirtual, VMMetric
-    
-    # Usamos VMMetric (el modelo simple compatible con lo que pidió el usuario)
-    # y buscamos/creamos la VM solo referencialmente por nombre
     try:
-        # Calcular porcentajes
-        max_cpu = vm_data.get('cpus', 1)
-        current_cpu = vm_data.get('cpu', 0) # usually normalized 0-1 or 0-cpus
-        # Proxmox manda 'cpu' como 0.5 (50% de 1 core) o similar.
-        # Para display simple 0-100%:
-        cpu_pct = current_cpu * 100
-        
-        max_mem = vm_data.get('maxmem', 1)
-        cur_mem = vm_data.get('mem', 0)
-        ram_pct = (cur_mem / max_mem) * 100 if max_mem > 0 else 0
-        
-        VMMetric.objects.create(
-            vm_name=vm_data.get('name', f"VM-{vm_data.get('vmid')}"),
-            server_origin=node_name,
-            cpu_usage=cpu_pct,
-            ram_usage=ram_pct,
-            status=vm_data.get('status', 'unknown')
-        )
+        summary = maintain()
+        return f"Particiones: {', '.join(summary) if summary else 'sin cambios'}"
+    except Exception as e:
+        logger.error(f"Error en mantenimiento de particiones: {str(e)}", exc_info=True)
+        return f"Error en mantenimiento de particiones: {str(e)}"
+
+
+@shared_task
+def rollup_metrics():
+    """Agrega las métricas nuevas en rollups de 1m/1h/1d y MetricsAggregation"""
+    from submodulos.logic.rollups import run_rollups
+
+    try:
+        summary = run_rollups()
+        return f"Rollups: {', '.join(summary) if summary else 'sin datos nuevos'}"
+    except Exception as e:
+        logger.error(f"Error generando rollups: {str(e)}", exc_info=True)
+        return f"Error generando rollups: {str(e)}"
+
+
+# --- Predicción (cola 'forecasting', ver CELERY_TASK_ROUTES) ---
+
+@shared_task(ignore_result=True)
+def schedule_forecasts(steps=48, force_refit=False):
+    """
+    Evalúa las ejecuciones anteriores y encola un fragmento de predicción por
+    servidor y por bloque de VMs en la cola 'forecasting'.
+    """
+    from submodulos.models import ProxmoxServer, MaquinaVirtual
+    from submodulos.logic.forecasting import forecast_shards
+    from submodulos.logic.forecast_stats import evaluate_pending
+
+    try:
+        evaluate_pending()
     except Exception as e:
-        logger.error(f"Error guardando metric VM {vm_data.get('vmid')}: {e}")
\ No newline at end of file
+        logger.warning(f"No se pudieron evaluar las predicciones anteriores: {e}")
+
+    shards = forecast_shards(
+        ProxmoxServer.objects.filter(is_active=True).values_list('id', flat=True),
+        # Solo predecimos para VMs monitoreadas para ahorrar recursos
+        MaquinaVirtual.objects.filter(is_monitored=True).values_list('vm_id', flat=True),
+    )
+    for server_ids, vm_ids in shards:
+        forecast_shard.delay(server_ids, vm_ids, steps=steps, force_refit=force_refit)
+    return f"Predicción: {len(shards)} fragmentos encolados"
+
+
+@shared_task(
+    acks_late=True,
+    soft_time_limit=getattr(settings, 'FORECAST_TASK_SOFT_TIME_LIMIT', 15 * 60),
+    time_limit=getattr(settings, 'FORECAST_TASK_TIME_LIMIT', 20 * 60),
+)
+def forecast_shard(server_ids, vm_ids, steps=48, force_refit=False):
+    """
+    Ajusta y guarda un fragmento en su propia ForecastRun. El ajuste se hace
+    en el proceso del worker (workers=0): la concurrencia la da el worker de
+    la cola 'forecasting' y sus procesos no pueden crear un pool propio.
+    """
+    from submodulos.models import ProxmoxServer, MaquinaVirtual
+    from submodulos.logic.forecasting import run_cycle
+
+    try:
+        cycle = run_cycle(
+            servers=list(ProxmoxServer.objects.filter(id__in=server_ids)),
+            vms=list(MaquinaVirtual.objects.filter(vm_id__in=vm_ids)),
+            steps=steps,
+            workers=0,
+            force_refit=force_refit,
+            evaluate=False,
+        )
+        return cycle.details()
+    except SoftTimeLimitExceeded:
+        logger.error(f"Fragmento de predicción fuera de tiempo (servidores={server_ids}, {len(vm_ids)} VMs)")
+        raise
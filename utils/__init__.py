@@ -5,10 +5,11 @@ Utilidades para SentinelNexus
 Contiene herramientas y helpers para la gestión de múltiples nodos Proxmox
 """
 
-from .proxmox_manager import proxmox_manager, get_active_proxmox_nodes, get_proxmox_node, get_proxmox_connection
+from .proxmox_manager import proxmox_manager, connection_registry, get_active_proxmox_nodes, get_proxmox_node, get_proxmox_connection
 
 __all__ = [
     'proxmox_manager',
+    'connection_registry',
     'get_active_proxmox_nodes', 
     'get_proxmox_node',
     'get_proxmox_connection'
@@ -0,0 +1,138 @@
+# utils/delta.py
+"""
+Respuestas incrementales para las APIs que sondean los dashboards.
+
+Cada respuesta completa lleva un `version` (hash corto de su estado) y ese
+estado se guarda en la caché compartida durante DELTA_BASE_TTL segundos. En
+el siguiente sondeo el cliente envía `?since=<version>` y recibe solo lo que
+cambió respecto a ese estado:
+
+- Diccionarios: solo las claves modificadas (las eliminadas valen None).
+- Series temporales: los puntos nuevos y cuántos descartar del final
+  (`series_delta`), en lugar de la ventana completa.
+- Listas de entidades (VMs): las entradas cambiadas, con solo sus campos
+  modificados, y los ids eliminados (`entries_delta`).
+
+Si la versión pedida ya caducó, o con `?full=1`, se responde completo. El
+estado se indexa por su propio hash, así que clientes en versiones distintas
+comparten las mismas entradas.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'delta'
+DEFAULT_BASE_TTL = 600   # Segundos que se conserva cada versión como base de deltas
+
+
+def _key(scope, version):
+    return f"{KEY_PREFIX}:{scope}:{version}"
+
+
+def state_version(state):
+    """Hash estable del estado (independiente del orden de las claves)"""
+    body = json.dumps(state, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(body.encode(), digest_size=8).hexdigest()
+
+
+def remember(scope, state):
+    """Guarda el estado como posible base de deltas y devuelve su versión"""
+    version = state_version(state)
+    try:
+        cache.set(_key(scope, version), state, timeout=getattr(settings, 'DELTA_BASE_TTL', DEFAULT_BASE_TTL))
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la versión {version} de {scope}: {e}")
+    return version
+
+
+def requested_base(request, scope):
+    """
+    Estado de referencia que pide el cliente con ?since=.
+
+    Returns:
+        tuple: (since, estado) o (since, None) si hay que responder completo.
+    """
+    since = request.GET.get('since')
+    if not since or request.GET.get('full') in ('1', 'true'):
+        return since, None
+    try:
+        return since, cache.get(_key(scope, since))
+    except Exception as e:
+        logger.warning(f"No se pudo leer la versión {since} de {scope}: {e}")
+        return since, None
+
+
+def diff(old, new):
+    """Claves de `new` que difieren de `old` (recursivo en diccionarios; None = eliminada)"""
+    changes = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff(previous, value)
+            if nested:
+                changes[key] = nested
+        elif key not in old or previous != value:
+            changes[key] = value
+    for key in old:
+        if key not in new:
+            changes[key] = None
+    return changes
+
+
+def series_delta(old, new, index='timestamps'):
+    """
+    Cambios de una ventana de series paralelas ({'timestamps': [...], 'cpu': [...], ...}).
+
+    El cliente descarta `drop` puntos del final, añade los de `append` y
+    conserva los últimos `size`.
+
+    Returns:
+        dict o None si las ventanas no se solapan (hay que enviar la serie completa).
+    """
+    old_index, new_index = old.get(index) or [], new.get(index) or []
+    if not old_index or not new_index or new_index[0] not in old_index:
+        return None
+    offset = old_index.index(new_index[0])
+    overlap = len(old_index) - offset
+    if new_index[:overlap] != old_index[offset:] or set(old) != set(new):
+        return None
+
+    # Primer punto del solape que cambió (el último de RRD se sigue consolidando)
+    first = overlap
+    for i in range(overlap):
+        if any(old[name][offset + i] != new[name][i] for name in new):
+            first = i
+            break
+    return {
+        'drop': overlap - first,
+        'append': {name: values[first:] for name, values in new.items()},
+        'size': len(new_index),
+    }
+
+
+def entries_delta(old, new, key='id'):
+    """Entradas nuevas o modificadas (solo sus campos cambiados) y claves eliminadas"""
+    previous = {entry[key]: entry for entry in old}
+    changed = []
+    for entry in new:
+        changes = diff(previous.get(entry[key], {}), entry)
+        if changes:
+            changes[key] = entry[key]
+            changed.append(changes)
+
+    current = [entry[key] for entry in new]
+    present = set(current)
+    delta = {
+        'changed': changed,
+        'removed': [k for k in previous if k not in present],
+    }
+    # El cliente conserva su orden y añade las nuevas al final; si no coincide, se envía el orden
+    expected = [k for k in previous if k in present] + [k for k in current if k not in previous]
+    if expected != current:
+        delta['order'] = current
+    return delta
@@ -0,0 +1,138 @@
+# utils/fanout.py
+"""
+Ejecución concurrente de consultas a múltiples servidores Proxmox.
+
+Las vistas multi-servidor recorrían los ProxmoxServer uno tras otro, de modo
+que un host caído bloqueaba la página durante todo su timeout. `fan_out`
+lanza la consulta de cada servidor en un pool de hilos acotado y compartido,
+espera como máximo el plazo indicado y devuelve resultados parciales: los
+servidores que fallan o no responden a tiempo quedan marcados como offline.
+
+`afan_out` es la variante para vistas async: las consultas son corrutinas
+(utils.proxmox_async) y se esperan en el propio bucle, sin hilos.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import connections
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_DEADLINE = 12  # segundos por servidor
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool de hilos del proceso (se recrea tras un fork de gunicorn/Celery)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                max_workers = getattr(settings, 'FANOUT_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fanout')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+class FanOutResult:
+    """Resultado de la consulta a un elemento (servidor o nodo)"""
+
+    def __init__(self, item, value=None, error=None, timed_out=False, elapsed=0.0):
+        self.item = item
+        self.value = value
+        self.error = error
+        self.timed_out = timed_out
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+    @property
+    def error_message(self):
+        if self.timed_out:
+            return "Tiempo de espera agotado"
+        return str(self.error) if self.error is not None else None
+
+
+def _run(func, item):
+    """Ejecuta la consulta en el hilo del pool y libera su conexión a BD"""
+    started = time.monotonic()
+    try:
+        return func(item), None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+    finally:
+        # Cada hilo del pool abre su propia conexión a la BD
+        connections.close_all()
+
+
+def fan_out(items, func, deadline=None):
+    """
+    Ejecuta func(item) para todos los elementos en paralelo.
+
+    Args:
+        items: Elementos a consultar (p.ej. ProxmoxServer o claves de nodo).
+        func: Función que recibe un elemento y devuelve su resultado.
+        deadline (float): Segundos máximos de espera desde el lanzamiento.
+            La latencia total queda acotada por el servidor sano más lento.
+
+    Returns:
+        list[FanOutResult]: en el mismo orden que `items`.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if deadline is None:
+        deadline = getattr(settings, 'FANOUT_DEADLINE', DEFAULT_DEADLINE)
+
+    executor = get_executor()
+    futures = [executor.submit(_run, func, item) for item in items]
+    wait(futures, timeout=deadline)
+
+    results = []
+    for item, future in zip(items, futures):
+        if not future.done():
+            # El hilo sigue en segundo plano hasta su propio timeout HTTP
+            future.cancel()
+            logger.warning(f"Consulta a {item} sin respuesta tras {deadline}s, marcado offline")
+            results.append(FanOutResult(item, timed_out=True, elapsed=deadline))
+            continue
+        value, error, elapsed = future.result()
+        results.append(FanOutResult(item, value=value, error=error, elapsed=elapsed))
+    return results
+
+
+async def afan_out(items, func, deadline=None):
+    """
+    Versión asíncrona de fan_out: func(item) devuelve una corrutina.
+
+    Returns:
+        list[FanOutResult]: en el mismo orden que `items`.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if deadline is None:
+        deadline = getattr(settings, 'FANOUT_DEADLINE', DEFAULT_DEADLINE)
+
+    async def run(item):
+        started = time.monotonic()
+        try:
+            value = await asyncio.wait_for(func(item), timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"Consulta a {item} sin respuesta tras {deadline}s, marcado offline")
+            return FanOutResult(item, timed_out=True, elapsed=deadline)
+        except Exception as e:
+            return FanOutResult(item, error=e, elapsed=time.monotonic() - started)
+        return FanOutResult(item, value=value, elapsed=time.monotonic() - started)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
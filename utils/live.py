@@ -0,0 +1,219 @@
+# utils/live.py
+"""
+Eventos en vivo para los dashboards (Server-Sent Events).
+
+Los dashboards sondeaban /api/metrics/, /api/vms/metrics/ y el parcial de
+logs de agentes con temporizadores, repitiendo el mismo trabajo por cliente.
+Ahora los productores publican cada novedad una sola vez:
+
+- El colector, un evento 'snapshot' por cluster y ciclo.
+- AgentLog, un evento 'agent_log' por fila nueva (señal post_save y flush
+  del detector de anomalías, que usa bulk_create).
+
+`publish` serializa el evento una vez y lo envía por Redis pub/sub (canal
+LIVE_EVENTS_CHANNEL). En cada proceso ASGI un único `Broadcaster` mantiene
+una suscripción y reparte la trama SSE ya construida a las colas de los
+clientes conectados (vista live_events). Cada cliente recibe al conectar el
+último evento de cada clave, así que no tiene que esperar al siguiente ciclo.
+"""
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = 'sentinel:live'
+DEFAULT_QUEUE_SIZE = 100   # Tramas pendientes por cliente antes de descartar las más antiguas
+KEEPALIVE_SECONDS = 15
+RECONNECT_SECONDS = 5
+
+
+def get_channel():
+    return getattr(settings, 'LIVE_EVENTS_CHANNEL', DEFAULT_CHANNEL)
+
+
+def _redis_url():
+    return getattr(settings, 'LIVE_EVENTS_REDIS_URL', None) or settings.CACHES['default']['LOCATION']
+
+
+# --- Productores (código síncrono: colector, agentes, señales) ---
+
+def publish(event, data, key=''):
+    """
+    Publica un evento para todos los dashboards conectados.
+
+    Args:
+        event (str): tipo de evento SSE ('snapshot', 'agent_log').
+        data: contenido serializable a JSON.
+        key (str): identifica el último valor que se reenvía a los clientes
+            nuevos (p.ej. el servidor de un snapshot); vacío si no aplica.
+    """
+    try:
+        from django_redis import get_redis_connection
+
+        body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+        # JSON no contiene saltos de línea sin escapar: formato "evento\nclave\njson"
+        get_redis_connection('default').publish(get_channel(), f"{event}\n{key}\n{body}")
+    except Exception as e:
+        logger.warning(f"No se pudo publicar el evento en vivo '{event}': {e}")
+
+
+def snapshot_payload(snapshot):
+    """Resumen de un ClusterSnapshot con los campos que pintan los dashboards"""
+    return {
+        'server': snapshot.server_key,
+        'collected_at': snapshot.collected_at,
+        'nodes': [
+            {
+                'name': node.name,
+                'status': node.status,
+                'cpu': round(node.cpu, 2),
+                'mem': round(node.mem_percent, 2),
+                'disk': round(node.disk_percent, 2),
+                'uptime': node.uptime,
+            }
+            for node in snapshot.nodes
+        ],
+        'vms': [
+            {
+                'node': guest.node,
+                'vmid': guest.vmid,
+                'name': guest.name,
+                'type': guest.type,
+                'status': guest.status,
+                'cpu': round(guest.cpu, 2),
+                'mem': round(guest.mem_percent, 2),
+                'disk': round(guest.disk / (1024 ** 3), 2),
+                'net_in': round(guest.netin / (1024 ** 2), 2),
+                'net_out': round(guest.netout / (1024 ** 2), 2),
+            }
+            for guest in snapshot.guests if not guest.template
+        ],
+    }
+
+
+def agent_log_payload(log):
+    return {
+        'id': log.pk,
+        'timestamp': log.timestamp,
+        'agent_name': log.agent_name,
+        'level': log.level,
+        'message': log.message,
+        'details': log.details,
+    }
+
+
+def publish_logs_on_commit(logs):
+    """
+    Publica AgentLog creados con bulk_create (que no emite post_save) al
+    confirmarse la transacción en curso, o al momento si no hay ninguna.
+    """
+    from django.db import transaction
+
+    payloads = [agent_log_payload(log) for log in logs]
+
+    def publish_all():
+        for payload in payloads:
+            publish('agent_log', payload)
+    transaction.on_commit(publish_all)
+
+
+# --- Consumidor (proceso ASGI) ---
+
+class Broadcaster:
+    """Una suscripción a Redis por proceso, repartida a las colas de los clientes"""
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.clients = set()
+        self.latest = {}      # (evento, clave) -> trama
+        self._task = None
+        self._loop = None
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._listen())
+
+    def subscribe(self):
+        """Cola de tramas SSE de un cliente nuevo, con el último valor de cada clave"""
+        self._ensure_running()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for frame in list(self.latest.values())[-self.queue_size:]:
+            queue.put_nowait(frame)
+        self.clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.clients.discard(queue)
+
+    def dispatch(self, message):
+        """Construye la trama una vez y la entrega a todos los clientes"""
+        if isinstance(message, bytes):
+            message = message.decode()
+        try:
+            event, key, body = message.split('\n', 2)
+        except ValueError:
+            return
+        frame = f"event: {event}\ndata: {body}\n\n".encode()
+        if key:
+            self.latest.pop((event, key), None)
+            self.latest[(event, key)] = frame
+        for queue in list(self.clients):
+            if queue.full():
+                # Cliente lento: se descarta su trama más antigua, no se bloquea al resto
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(frame)
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        channel = get_channel()
+        while True:
+            client = None
+            try:
+                client = aioredis.from_url(_redis_url())
+                pubsub = client.pubsub()
+                await pubsub.subscribe(channel)
+                logger.info(f"Eventos en vivo: suscrito a {channel}")
+                async for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self.dispatch(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Suscripción de eventos en vivo interrumpida: {e}")
+            finally:
+                if client is not None:
+                    try:
+                        await client.close()
+                    except Exception:
+                        pass
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def stream(self, queue, keepalive=KEEPALIVE_SECONDS):
+        """
+        Tramas SSE para StreamingHttpResponse (comentario de keepalive si no hay eventos).
+
+        Django >= 5.0 cancela el generador cuando el cliente se desconecta; el
+        finally retira entonces su cola de `clients`.
+        """
+        try:
+            yield f"retry: {RECONNECT_SECONDS * 1000}\n\n".encode()
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,220 @@
+# utils/proxmox_async.py
+"""
+Cliente asíncrono (httpx) de la API de Proxmox para las vistas async.
+
+Las vistas de solo lectura del dashboard se sirven por ASGI: mientras esperan
+a Proxmox no ocupan un hilo, así que unos pocos workers atienden cientos de
+llamadas lentas en paralelo. Este módulo es el equivalente async del
+registro de proxmox_manager:
+
+- Un `AsyncProxmoxClient` por servidor con su pool keep-alive y su ticket
+  PVE; el login de un servidor se hace una sola vez aunque lleguen N
+  peticiones a la vez, y el ticket se renueva antes de caducar usando el
+  propio ticket (sin volver a enviar la contraseña).
+- Los clientes se guardan por bucle de eventos: httpx no puede compartir
+  conexiones entre bucles (bajo WSGI Django crea uno por petición async).
+  Al apagarse un bucle (shutdown_asyncgens, que ejecutan asyncio.run,
+  uvicorn y asgiref) se cierran sus clientes.
+
+La configuración de cada servidor es la de proxmox_manager (BD o settings).
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import weakref
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_TICKET_RENEW_SECONDS = 3600   # Los tickets de PVE caducan a las 2 horas
+DEFAULT_POOL_MAXSIZE = 20
+
+
+class ProxmoxAPIError(Exception):
+    """Respuesta de error de la API de Proxmox"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+
+class AsyncProxmoxClient:
+    """Sesión autenticada con un servidor Proxmox sobre httpx.AsyncClient"""
+
+    def __init__(self, key, config, timeout=DEFAULT_TIMEOUT):
+        import httpx
+
+        host = config['host']
+        if ':' not in host:
+            host = f"{host}:{config.get('port', '8006')}"
+        user = config['user']
+        if '@' not in user:
+            user = f"{user}@pam"
+
+        self.key = key
+        self.fingerprint = _fingerprint(config)
+        self._user = user
+        self._password = config['password']
+        self._ticket = None
+        self._ticket_at = None
+        self._lock = asyncio.Lock()
+        maxsize = getattr(settings, 'PROXMOX_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE)
+        self._client = httpx.AsyncClient(
+            base_url=f"https://{host}/api2/json",
+            verify=config.get('verify_ssl', False),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=maxsize, max_keepalive_connections=maxsize),
+        )
+
+    async def _request_ticket(self, password):
+        response = await self._client.post(
+            '/access/ticket', data={'username': self._user, 'password': password})
+        if response.is_error:
+            return response
+        data = response.json()['data']
+        self._ticket = data['ticket']
+        self._client.cookies.set('PVEAuthCookie', data['ticket'])
+        self._client.headers['CSRFPreventionToken'] = data['CSRFPreventionToken']
+        self._ticket_at = time.monotonic()
+        return response
+
+    async def _login(self):
+        """Login completo con usuario/contraseña"""
+        from proxmoxer import AuthenticationError
+
+        logger.info(f"Conectando (async) a nodo {self.key} como {self._user}")
+        response = await self._request_ticket(self._password)
+        if response.status_code == 401:
+            raise AuthenticationError(f"Credenciales rechazadas por {self.key}")
+        if response.is_error:
+            raise ProxmoxAPIError(response.status_code, response.reason_phrase)
+
+    async def _renew(self):
+        """
+        Renueva el ticket PVE enviando el ticket vigente como contraseña, igual
+        que el registro de proxmox_manager. Si falla, login completo.
+        """
+        try:
+            response = await self._request_ticket(self._ticket)
+            if not response.is_error:
+                logger.debug(f"Ticket renovado (async) para nodo {self.key}")
+                return
+            reason = f"{response.status_code} {response.reason_phrase}"
+        except Exception as e:
+            reason = e
+        logger.info(f"No se pudo renovar el ticket de {self.key} ({reason}), iniciando sesión de nuevo")
+        await self._login()
+
+    async def _ensure_ticket(self, force=False):
+        """
+        Args:
+            force (bool): el servidor rechazó el ticket; login completo sin intentar renovarlo.
+        """
+        renew_age = getattr(settings, 'PROXMOX_TICKET_RENEW_SECONDS', DEFAULT_TICKET_RENEW_SECONDS)
+        ticket_at = self._ticket_at
+        if not force and ticket_at is not None and time.monotonic() - ticket_at < renew_age:
+            return
+        async with self._lock:
+            # Otra corrutina pudo renovarlo mientras se esperaba el candado
+            if self._ticket_at != ticket_at:
+                return
+            if ticket_at is None or force:
+                await self._login()
+            else:
+                await self._renew()
+
+    async def get(self, path, **params):
+        """GET a la API; devuelve el campo `data` de la respuesta"""
+        await self._ensure_ticket()
+        response = await self._client.get(path, params=params or None)
+        if response.status_code == 401:
+            # Ticket revocado o caducado antes de tiempo: un reintento con login nuevo
+            await self._ensure_ticket(force=True)
+            response = await self._client.get(path, params=params or None)
+        if response.is_error:
+            raise ProxmoxAPIError(response.status_code, f"{response.reason_phrase}: {path}")
+        return response.json().get('data')
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def _fingerprint(config):
+    """Huella de las credenciales para detectar cambios de configuración"""
+    raw = '|'.join(str(config.get(k, '')) for k in ('host', 'port', 'user', 'password', 'verify_ssl'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# Bucle de eventos -> {(clave de servidor, timeout): cliente}
+_clients = weakref.WeakKeyDictionary()
+# Bucle de eventos -> generador centinela que cierra sus clientes al apagarse
+_closers = weakref.WeakKeyDictionary()
+
+
+async def _close_on_shutdown(clients):
+    """
+    Generador asíncrono centinela: queda suspendido en el `yield` y el bucle
+    lo cierra en shutdown_asyncgens(); entonces se cierran sus clientes.
+    """
+    try:
+        yield
+    finally:
+        for client in list(clients.values()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Error cerrando el cliente de {client.key}: {e}")
+        clients.clear()
+
+
+async def _loop_clients():
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients[loop] = {}
+        closer = _closers[loop] = _close_on_shutdown(clients)
+        await closer.__anext__()
+    return clients
+
+
+async def get_client(node_key, timeout=DEFAULT_TIMEOUT):
+    """Cliente del servidor `node_key` (misma clave que proxmox_manager.get_connection)"""
+    from asgiref.sync import sync_to_async
+    from utils.proxmox_manager import proxmox_manager
+
+    config = proxmox_manager.get_node_config(node_key)
+    if not config:
+        # El servidor pudo darse de alta después de cargar el manager (consulta a BD)
+        config = (await sync_to_async(proxmox_manager.reload_nodes)()).get(node_key)
+    if not config:
+        raise ValueError(f"Nodo '{node_key}' no encontrado o no configurado")
+
+    key = proxmox_manager._registry_key(node_key, config)
+    clients = await _loop_clients()
+    # El timeout es del AsyncClient: cada timeout distinto tiene su cliente
+    client = clients.get((key, timeout))
+    if client is None or client.fingerprint != _fingerprint(config):
+        if client is not None:
+            await client.aclose()
+        client = clients[(key, timeout)] = AsyncProxmoxClient(key, config, timeout=timeout)
+    return client
+
+
+async def api_get(node_key, path, **params):
+    """Atajo: GET `path` en el servidor `node_key`"""
+    client = await get_client(node_key)
+    return await client.get(path, **params)
+
+
+async def invalidate(node_key):
+    """Descarta los clientes de un servidor en este bucle (p.ej. tras un error)"""
+    from utils.proxmox_manager import proxmox_manager
+
+    config = proxmox_manager.get_node_config(node_key) or {}
+    key = proxmox_manager._registry_key(node_key, config)
+    clients = await _loop_clients()
+    for client_key in [k for k in clients if k[0] == key]:
+        await clients.pop(client_key).aclose()
@@ -0,0 +1,276 @@
+# utils/proxmox_cache.py
+"""
+Caché compartida (Redis, vía settings.CACHES) para lecturas de Proxmox.
+
+Cada entrada se indexa por (servidor, nodo, tipo de recurso) y guarda el
+valor junto con el instante hasta el que se considera fresco:
+
+- Fresca: se devuelve directamente.
+- Caducada pero dentro de la ventana de tolerancia: se devuelve al instante
+  y se lanza un único refresco en segundo plano (stale-while-revalidate).
+- Ausente: la carga un único proceso/hilo (single-flight con un candado en
+  Redis); el resto espera su resultado en lugar de consultar también a Proxmox.
+
+Así N pestañas sondeando /api/metrics/ generan como mucho una llamada
+upstream por recurso e intervalo.
+
+Para los tipos con TTL de fallo (p.ej. 'guest_ip': una VM sin guest agent
+falla siempre) el error también se guarda, durante ese TTL: las lecturas
+lanzan CachedLoadError sin volver a consultar a Proxmox.
+
+`acached_read` aplica la misma lógica a las vistas async con cargadores
+asíncronos (utils.proxmox_async): solo las operaciones de Redis pasan por
+un hilo, la espera a Proxmox no.
+"""
+from django.conf import settings
+from django.core.cache import cache
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'proxmox'
+
+# TTL (segundos) por tipo de recurso
+DEFAULT_TTLS = {
+    'snapshot': 5,       # Inventario del cluster (/cluster/resources)
+    'node_status': 5,    # /nodes/<node>/status
+    'rrd': 30,           # Series RRD (resolución de 1 minuto)
+    'guest_ip': 300,     # IPs reportadas por el guest agent
+}
+# TTL (segundos) de los fallos de carga por tipo; los tipos ausentes no los guardan
+DEFAULT_FAILURE_TTLS = {
+    'guest_ip': 60,      # VM sin guest agent: no se pregunta en cada sondeo
+}
+DEFAULT_STALE_SECONDS = 60
+LOCK_SECONDS = 30
+WAIT_SECONDS = 10
+
+
+class CachedLoadError(Exception):
+    """Fallo de carga reciente guardado en caché (no se ha consultado a Proxmox)"""
+
+
+def cache_key(server, node, kind, *extra):
+    """Clave de caché para (servidor, nodo, tipo)"""
+    parts = [KEY_PREFIX, str(server), str(node or '-'), kind]
+    parts.extend(str(e) for e in extra)
+    return ':'.join(parts)
+
+
+def get_ttl(kind):
+    ttls = dict(DEFAULT_TTLS)
+    ttls.update(getattr(settings, 'PROXMOX_CACHE_TTLS', {}))
+    return ttls.get(kind, 5)
+
+
+def get_failure_ttl(kind):
+    ttls = dict(DEFAULT_FAILURE_TTLS)
+    ttls.update(getattr(settings, 'PROXMOX_CACHE_FAILURE_TTLS', {}))
+    return ttls.get(kind)
+
+
+def _stale_seconds():
+    return getattr(settings, 'PROXMOX_CACHE_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+
+
+def _store(key, value, ttl):
+    """Guarda el valor con su marca de frescura; la entrada vive ttl + ventana stale"""
+    now = time.time()
+    entry = {'value': value, 'stored_at': now, 'fresh_until': now + ttl}
+    try:
+        cache.set(key, entry, timeout=ttl + _stale_seconds())
+    except Exception as e:
+        logger.warning(f"No se pudo escribir en caché {key}: {e}")
+    return entry
+
+
+def _store_failure(key, error, ttl):
+    """Guarda un fallo de carga; caduca a los ttl segundos, sin ventana stale"""
+    now = time.time()
+    entry = {'value': None, 'failed': str(error) or type(error).__name__, 'stored_at': now, 'fresh_until': now + ttl}
+    try:
+        cache.set(key, entry, timeout=ttl)
+    except Exception as e:
+        logger.warning(f"No se pudo escribir en caché {key}: {e}")
+
+
+def _value(entry):
+    """Valor de una entrada; las de fallo lanzan CachedLoadError"""
+    if entry.get('failed') is not None:
+        raise CachedLoadError(entry['failed'])
+    return entry['value']
+
+
+def _get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        logger.warning(f"No se pudo leer la caché {key}: {e}")
+        return None
+
+
+def _acquire(key):
+    """Candado single-flight (SETNX en Redis)"""
+    try:
+        return cache.add(f"{key}:lock", 1, timeout=LOCK_SECONDS)
+    except Exception:
+        # Sin caché disponible no hay coordinación posible: cargar directamente
+        return True
+
+
+def _release(key):
+    try:
+        cache.delete(f"{key}:lock")
+    except Exception:
+        pass
+
+
+def _load(key, loader, ttl, failure_ttl=None):
+    """Ejecuta la carga upstream, la publica (o su fallo) y libera el candado"""
+    try:
+        value = loader()
+        _store(key, value, ttl)
+        return value
+    except Exception as e:
+        if failure_ttl:
+            _store_failure(key, e, failure_ttl)
+        raise
+    finally:
+        _release(key)
+
+
+def _background_refresh(key, loader, ttl):
+    try:
+        _load(key, loader, ttl)
+    except Exception as e:
+        # Se mantiene el valor anterior hasta que expire la ventana stale
+        logger.warning(f"Refresco en segundo plano fallido para {key}: {e}")
+
+
+def cached_read(server, node, kind, loader, *extra, ttl=None):
+    """
+    Lee un recurso de Proxmox a través de la caché compartida.
+
+    Args:
+        server: ID del servidor (o clave de nodo de proxmox_manager).
+        node: Nombre del nodo Proxmox (None para recursos de cluster).
+        kind: Tipo de recurso ('snapshot', 'node_status', 'rrd', ...).
+        loader: Función sin argumentos que consulta Proxmox.
+        *extra: Componentes adicionales de la clave (timeframe, vmid...).
+        ttl: TTL en segundos (por defecto el configurado para `kind`).
+
+    Raises:
+        CachedLoadError: la última carga falló y su fallo sigue en caché.
+    """
+    if ttl is None:
+        ttl = get_ttl(kind)
+    key = cache_key(server, node, kind, *extra)
+
+    entry = _get(key)
+    if entry is not None:
+        if entry.get('failed') is None and entry['fresh_until'] <= time.time() and _acquire(key):
+            # Servir el dato anterior y refrescar una sola vez en segundo plano
+            from utils.fanout import get_executor
+            get_executor().submit(_background_refresh, key, loader, ttl)
+        return _value(entry)
+
+    if _acquire(key):
+        return _load(key, loader, ttl, failure_ttl=get_failure_ttl(kind))
+
+    # Otro proceso está cargando este recurso: esperar su resultado
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = _get(key)
+        if entry is not None:
+            return _value(entry)
+
+    logger.warning(f"Timeout esperando carga de {key}, consultando directamente")
+    return loader()
+
+
+# Refrescos async en curso (referencia fuerte para que no se recojan a medias)
+_background_tasks = set()
+
+
+async def _abackground_refresh(key, loader, ttl):
+    from asgiref.sync import sync_to_async
+    try:
+        value = await loader()
+        await sync_to_async(_store, thread_sensitive=False)(key, value, ttl)
+    except Exception as e:
+        logger.warning(f"Refresco en segundo plano fallido para {key}: {e}")
+    finally:
+        await sync_to_async(_release, thread_sensitive=False)(key)
+
+
+async def acached_read(server, node, kind, loader, *extra, ttl=None):
+    """
+    Versión asíncrona de cached_read.
+
+    Args:
+        loader: Función sin argumentos que devuelve una corrutina que consulta Proxmox.
+        (resto igual que cached_read)
+    """
+    import asyncio
+    from asgiref.sync import sync_to_async
+
+    def in_thread(func):
+        return sync_to_async(func, thread_sensitive=False)
+
+    if ttl is None:
+        ttl = get_ttl(kind)
+    key = cache_key(server, node, kind, *extra)
+
+    entry = await in_thread(_get)(key)
+    if entry is not None:
+        if entry.get('failed') is None and entry['fresh_until'] <= time.time() and await in_thread(_acquire)(key):
+            task = asyncio.get_running_loop().create_task(_abackground_refresh(key, loader, ttl))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return _value(entry)
+
+    if await in_thread(_acquire)(key):
+        failure_ttl = get_failure_ttl(kind)
+        try:
+            value = await loader()
+            await in_thread(_store)(key, value, ttl)
+            return value
+        except Exception as e:
+            if failure_ttl:
+                await in_thread(_store_failure)(key, e, failure_ttl)
+            raise
+        finally:
+            await in_thread(_release)(key)
+
+    # Otro proceso está cargando este recurso: esperar su resultado sin bloquear el bucle
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await in_thread(_get)(key)
+        if entry is not None:
+            return _value(entry)
+
+    logger.warning(f"Timeout esperando carga de {key}, consultando directamente")
+    return await loader()
+
+
+def publish(server, node, kind, value, *extra, ttl=None):
+    """Publica un valor ya obtenido (p.ej. por el colector) en la caché compartida"""
+    if ttl is None:
+        ttl = get_ttl(kind)
+    _store(cache_key(server, node, kind, *extra), value, ttl)
+
+
+def peek(server, node, kind, *extra):
+    """Devuelve el valor en caché (fresco o caducado) sin consultar Proxmox, o None"""
+    entry = _get(cache_key(server, node, kind, *extra))
+    return entry['value'] if entry is not None and entry.get('failed') is None else None
+
+
+def invalidate(server, node, kind, *extra):
+    try:
+        cache.delete(cache_key(server, node, kind, *extra))
+    except Exception:
+        pass
@@ -1,10 +1,159 @@
  # utils/proxmox_manager.py
 from django.conf import settings
 from proxmoxer import ProxmoxAPI, AuthenticationError
+from requests.adapters import HTTPAdapter
+import hashlib
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Los tickets de PVE caducan a las 2 horas; se renuevan antes con margen
+DEFAULT_TICKET_RENEW_SECONDS = 3600
+# Conexiones keep-alive por servidor compartidas entre hilos del proceso
+DEFAULT_POOL_MAXSIZE = 20
+
+
+class _RegistryEntry:
+    """Conexión autenticada de un servidor y su estado de renovación"""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+        self.proxmox = None
+        self.renewed_at = 0.0
+
+
+class ProxmoxConnectionRegistry:
+    """
+    Registro de conexiones Proxmox compartido por todo el proceso.
+
+    Guarda una única instancia de ProxmoxAPI por servidor y timeout (clave =
+    ID del servidor; la sesión se crea con un timeout fijo, así que quien
+    pide otro recibe su propia conexión) con su sesión HTTPS keep-alive y su
+    ticket ya autenticado, de modo que las vistas, tareas de Celery y agentes
+    no repitan el login en cada llamada. El ticket se renueva antes de caducar usando el propio
+    ticket (sin volver a enviar la contraseña) y las sesiones se descartan
+    tras un fork para no compartir sockets entre procesos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _fingerprint(config):
+        """Huella de las credenciales para detectar cambios de configuración"""
+        raw = '|'.join(str(config.get(k, '')) for k in ('host', 'port', 'user', 'password', 'verify_ssl'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _check_fork(self):
+        """Descarta las conexiones heredadas del proceso padre (gunicorn/Celery prefork)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._entries = {}
+                    self._pid = os.getpid()
+
+    def get(self, key, config, timeout=30):
+        """
+        Devuelve la conexión compartida para `key`, creándola o renovando su
+        ticket si es necesario. El login de un mismo servidor se serializa
+        para que N hilos concurrentes provoquen un único inicio de sesión.
+        """
+        self._check_fork()
+        fingerprint = self._fingerprint(config)
+
+        with self._lock:
+            entry = self._entries.get((key, timeout))
+            if entry is None or entry.fingerprint != fingerprint:
+                entry = _RegistryEntry(fingerprint)
+                self._entries[(key, timeout)] = entry
+
+        renew_age = getattr(settings, 'PROXMOX_TICKET_RENEW_SECONDS', DEFAULT_TICKET_RENEW_SECONDS)
+        with entry.lock:
+            if entry.proxmox is None:
+                entry.proxmox = self._login(key, config, timeout)
+                entry.renewed_at = time.monotonic()
+            elif time.monotonic() - entry.renewed_at >= renew_age:
+                self._renew(key, entry, config, timeout)
+            return entry.proxmox
+
+    def invalidate(self, key):
+        """Elimina las conexiones de un servidor (p.ej. tras un error de autenticación)"""
+        with self._lock:
+            self._entries = {k: e for k, e in self._entries.items() if k[0] != key}
+
+    def clear(self):
+        """Elimina todas las conexiones registradas"""
+        with self._lock:
+            self._entries = {}
+
+    def _login(self, key, config, timeout):
+        """Login completo con usuario/contraseña y verificación de la conexión"""
+        # Asegurar formato correcto del usuario
+        user = config['user']
+        if '@' not in user:
+            user = f"{user}@pam"
+
+        # Especificar puerto si no está incluido
+        host = config['host']
+        port = config.get('port', '8006')
+        if ':' not in host:
+            host = f"{host}:{port}"
+
+        logger.info(f"Conectando a nodo {key}: {host} como {user}")
+
+        proxmox = ProxmoxAPI(
+            host,
+            user=user,
+            password=config['password'],
+            verify_ssl=config.get('verify_ssl', False),
+            timeout=timeout
+        )
+
+        # Probar la conexión (solo en el login, no en cada reutilización)
+        proxmox.version.get()
+        self._tune_session(proxmox)
+        logger.info(f"Conexión exitosa con nodo {key}")
+        return proxmox
+
+    def _renew(self, key, entry, config, timeout):
+        """
+        Renueva el ticket PVE reutilizando el ticket vigente. Si el backend de
+        proxmoxer no lo permite (o falla), se hace un login completo.
+        """
+        auth = getattr(getattr(entry.proxmox, '_backend', None), 'auth', None)
+        renew = getattr(auth, '_get_new_tokens', None)
+        try:
+            if renew is None:
+                raise AttributeError("El backend no soporta renovación de ticket")
+            renew()
+            logger.debug(f"Ticket renovado para nodo {key}")
+        except Exception as e:
+            logger.info(f"No se pudo renovar el ticket de {key} ({e}), iniciando sesión de nuevo")
+            entry.proxmox = self._login(key, config, timeout)
+        entry.renewed_at = time.monotonic()
+
+    @staticmethod
+    def _tune_session(proxmox):
+        """Amplía el pool keep-alive de la sesión HTTPS para uso concurrente"""
+        try:
+            session = proxmox._backend.get_session()
+        except Exception:
+            return
+        maxsize = getattr(settings, 'PROXMOX_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+        session.mount('https://', adapter)
+
+
+# Registro global de conexiones del proceso
+connection_registry = ProxmoxConnectionRegistry()
+
+
 class ProxmoxManager:
     """
     Clase para gestionar múltiples conexiones a nodos Proxmox
@@ -72,47 +221,53 @@ class ProxmoxManager:
         """Verifica si un nodo está activo"""
         return node_key in self.active_nodes
     
-    def get_connection(self, node_key):
+    def reload_nodes(self):
+        """Recarga la configuración de nodos (p.ej. tras dar de alta un servidor)"""
+        self.active_nodes = self._get_active_nodes()
+        return self.active_nodes
+
+    @staticmethod
+    def _registry_key(node_key, node_config):
+        """Clave del registro: ID del servidor en BD (el mismo servidor se indexa también por hostname)"""
+        db_id = node_config.get('db_id')
+        return str(db_id) if db_id is not None else str(node_key)
+
+    def get_connection(self, node_key, timeout=30):
         """
-        Establece una conexión con un nodo específico de Proxmox
+        Obtiene la conexión compartida con un nodo específico de Proxmox.
+        Reutiliza la sesión autenticada del registro del proceso.
         """
         node_config = self.get_node_config(node_key)
+        if not node_config:
+            # El servidor pudo darse de alta después de cargar el manager
+            node_config = self.reload_nodes().get(node_key)
         if not node_config:
             raise ValueError(f"Nodo '{node_key}' no encontrado o no configurado")
         
         try:
-            # Asegurar formato correcto del usuario
-            user = node_config['user']
-            if '@' not in user:
-                user = f"{user}@pam"
-            
-            # Especificar puerto si no está incluido
-            host = node_config['host']
-            port = node_config.get('port', '8006')
-            if ':' not in host:
-                host = f"{host}:{port}"
-                
-            logger.info(f"Conectando a nodo {node_key}: {host} como {user}")
-            
-            proxmox = ProxmoxAPI(
-                host,
-                user=user,
-                password=node_config['password'],
-                verify_ssl=node_config.get('verify_ssl', False),
-                timeout=30
-            )
-            
-            # Probar la conexión
-            proxmox.version.get()
-            logger.info(f"Conexión exitosa con nodo {node_key}")
-            return proxmox
-            
+            return connection_registry.get(self._registry_key(node_key, node_config), node_config, timeout=timeout)
         except AuthenticationError as e:
             logger.error(f"Error de autenticación en nodo {node_key}: {str(e)}")
             raise AuthenticationError(f"Error de autenticación en {node_key}: {str(e)}")
         except Exception as e:
             logger.error(f"Error al conectar con nodo {node_key}: {str(e)}")
             raise Exception(f"Error al conectar con {node_key}: {str(e)}")
+
+    def get_server_connection(self, server, timeout=30):
+        """Obtiene la conexión compartida a partir de un registro ProxmoxServer"""
+        config = {
+            'host': server.hostname,
+            'user': server.username,
+            'password': server.password,
+            'verify_ssl': server.verify_ssl,
+            'port': '8006',
+        }
+        return connection_registry.get(str(server.id), config, timeout=timeout)
+
+    def invalidate_connection(self, node_key):
+        """Descarta la conexión compartida de un nodo para forzar un nuevo login"""
+        node_config = self.get_node_config(node_key) or {}
+        connection_registry.invalidate(self._registry_key(node_key, node_config))
     
     def get_connection_url(self, node_key):
         """Construye la URL de conexión para un nodo"""
@@ -137,6 +292,7 @@ class ProxmoxManager:
                 'message': 'Conexión exitosa'
             }
         except Exception as e:
+            self.invalidate_connection(node_key)
             return {
                 'success': False,
                 'error': str(e),
@@ -0,0 +1,245 @@
+# utils/write_buffer.py
+"""
+Buffer de escritura por micro-lotes para tablas de métricas.
+
+Las tareas Celery, el colector y los agentes SPADE insertaban una fila por
+muestra, cada una en su propia transacción. Un WriteBuffer acumula las
+instancias en memoria y las vuelca con bulk_create cada N filas o T ms desde
+un hilo de fondo.
+
+- Vaciado al terminar: atexit y la señal worker_process_shutdown de Celery
+  (sentinelnexus/celery.py) llaman a flush_all().
+- Contrapresión: la cola está acotada; si la BD va lenta y se llena, el
+  productor espera y, si aun así no hay hueco, vuelca él mismo el lote.
+- Reintentos: si la BD no está disponible (OperationalError/InterfaceError)
+  el lote vuelve al frente y se reintenta con espera exponencial. Solo se
+  descartan filas cuando lo pendiente supera WRITE_BUFFER_MAX_PENDING, y se
+  cuentan en `dropped`. Un lote con datos inválidos se descarta (reintentarlo
+  no lo arregla y bloquearía al resto).
+- Filas tardías: tras un fallo, el timestamp más antiguo de lo que se inserta
+  hasta vaciar el buffer se anota en la caché (`late_since`) para que los
+  rollups (submodulos.logic.rollups) recalculen esos buckets.
+
+Las muestras conservan su hora de captura porque los timestamps de las
+métricas usan default=timezone.now (no auto_now_add).
+"""
+from collections import deque
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_DELAY_MS = 1000
+DEFAULT_MAX_PENDING = 10000
+PUT_TIMEOUT = 5  # segundos que espera un productor con la cola llena
+RETRY_BASE_SECONDS = 1
+RETRY_MAX_SECONDS = 60
+LATE_KEY_PREFIX = 'write_buffer:late'
+
+
+class WriteBuffer:
+    """Acumula instancias de un modelo y las inserta en lotes"""
+
+    def __init__(self, model, max_rows=None, max_delay_ms=None, max_pending=None):
+        self.model = model
+        self.max_rows = max_rows or getattr(settings, 'WRITE_BUFFER_MAX_ROWS', DEFAULT_MAX_ROWS)
+        self.max_delay = (max_delay_ms or getattr(settings, 'WRITE_BUFFER_MAX_DELAY_MS', DEFAULT_MAX_DELAY_MS)) / 1000
+        max_pending = max_pending or getattr(settings, 'WRITE_BUFFER_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._retry = deque()         # Filas de lotes fallidos, se insertan antes que la cola
+        self._retry_at = 0.0          # No reintentar antes de este instante (monotonic)
+        self._backoff = 0.0
+        self.dropped = 0              # Filas descartadas por superar la capacidad o ser inválidas
+        self._recovering = False      # Hubo un fallo y aún quedan filas retrasadas por insertar
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name=f"write-buffer-{self.model._meta.model_name}",
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def add(self, instance):
+        """Encola una instancia (sin guardar) para su inserción"""
+        self._ensure_thread()
+        try:
+            self._queue.put(instance, timeout=PUT_TIMEOUT)
+        except queue.Full:
+            # La BD no da abasto: el productor vuelca el lote y reintenta
+            logger.warning(f"Buffer de {self.model.__name__} lleno, volcado síncrono")
+            self.flush()
+            try:
+                self._queue.put_nowait(instance)
+            except queue.Full:
+                # BD caída y capacidad agotada: la muestra no cabe
+                self._count_dropped(1, "buffer lleno")
+        if self._queue.qsize() >= self.max_rows:
+            self._wake.set()
+
+    def extend(self, instances):
+        for instance in instances:
+            self.add(instance)
+
+    def pending(self):
+        return self._queue.qsize() + len(self._retry)
+
+    def _count_dropped(self, rows, reason):
+        self.dropped += rows
+        logger.error(f"Descartadas {rows} filas de {self.model.__name__} ({reason}); total descartadas: {self.dropped}")
+
+    def _drain(self, limit):
+        batch = []
+        while self._retry and len(batch) < limit:
+            batch.append(self._retry.popleft())
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _requeue(self, batch):
+        """Devuelve un lote fallido al frente, acotado por la capacidad del buffer"""
+        self._retry.extendleft(reversed(batch))
+        overflow = self.pending() - self.max_pending
+        if overflow > 0:
+            # Se descartan las más antiguas
+            for _ in range(min(overflow, len(self._retry))):
+                self._retry.popleft()
+            self._count_dropped(min(overflow, len(batch)), "capacidad superada mientras la BD no responde")
+        self._backoff = min(max(self._backoff * 2, RETRY_BASE_SECONDS), RETRY_MAX_SECONDS)
+        self._retry_at = time.monotonic() + self._backoff
+        self._recovering = True
+
+    def _note_late(self, batch):
+        """Anota el timestamp más antiguo de un lote insertado con retraso"""
+        timestamps = [ts for ts in (getattr(obj, 'timestamp', None) for obj in batch) if ts is not None]
+        if not timestamps:
+            return
+        from django.core.cache import cache
+
+        earliest = min(timestamps)
+        key = f"{LATE_KEY_PREFIX}:{self.model._meta.db_table}"
+        try:
+            previous = cache.get(key)
+            if previous is None or earliest < previous:
+                cache.set(key, earliest, timeout=None)
+        except Exception as e:
+            logger.warning(f"No se pudo anotar filas tardías de {self.model.__name__}: {e}")
+
+    def flush(self, force=False):
+        """
+        Inserta todo lo pendiente; devuelve el número de filas escritas.
+
+        Args:
+            force (bool): reintentar aunque no haya vencido la espera tras un fallo (apagado).
+        """
+        written = 0
+        with self._flush_lock:
+            if self._retry and not force and time.monotonic() < self._retry_at:
+                return 0
+            while True:
+                batch = self._drain(self.max_rows)
+                if not batch:
+                    break
+                try:
+                    self.model.objects.bulk_create(batch)
+                    written += len(batch)
+                    self._backoff = 0.0
+                    if self._recovering:
+                        self._note_late(batch)
+                except (OperationalError, InterfaceError) as e:
+                    logger.warning(
+                        f"BD no disponible insertando {len(batch)} filas de {self.model.__name__}, "
+                        f"reintento en {max(self._backoff * 2, RETRY_BASE_SECONDS):.0f}s: {e}"
+                    )
+                    self._requeue(batch)
+                    break
+                except Exception as e:
+                    self._count_dropped(len(batch), f"lote inválido: {e}")
+            if not self._retry and not self._queue.qsize():
+                self._recovering = False
+        return written
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.max_delay)
+            self._wake.clear()
+            if self.pending():
+                self.flush()
+                # El hilo de fondo mantiene su propia conexión a la BD
+                close_old_connections()
+
+    def close(self):
+        self._stopping.set()
+        self._wake.set()
+        return self.flush(force=True)
+
+
+_buffers = {}
+_buffers_pid = None
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(model):
+    """Buffer del proceso para un modelo (se recrean tras un fork de Celery/gunicorn)"""
+    global _buffers, _buffers_pid
+    key = model._meta.label
+    with _buffers_lock:
+        if _buffers_pid != os.getpid():
+            _buffers = {}
+            _buffers_pid = os.getpid()
+        if key not in _buffers:
+            _buffers[key] = WriteBuffer(model)
+        return _buffers[key]
+
+
+def late_since(model):
+    """
+    Timestamp más antiguo insertado con retraso en la tabla de `model` desde
+    la última consulta (None si no hubo); la anotación se consume.
+    """
+    from django.core.cache import cache
+
+    key = f"{LATE_KEY_PREFIX}:{model._meta.db_table}"
+    try:
+        earliest = cache.get(key)
+        if earliest is not None:
+            cache.delete(key)
+        return earliest
+    except Exception as e:
+        logger.warning(f"No se pudo leer filas tardías de {model.__name__}: {e}")
+        return None
+
+
+def flush_all():
+    """Vuelca todos los buffers del proceso (apagado de workers/agentes)"""
+    if _buffers_pid != os.getpid():
+        return 0
+    written = 0
+    for buffer in list(_buffers.values()):
+        # Apagado: último intento aunque haya una espera de reintento en curso
+        written += buffer.flush(force=True)
+    if written:
+        logger.info(f"Buffers de escritura volcados: {written} filas")
+    return written
+
+
+atexit.register(flush_all)